@@ -0,0 +1,72 @@
+"""Peak memory of analysing a project at once and in batches of files.
+
+Each analysis runs in its own process, so that the peak resident set size of one does
+not hide the one of the other. The batched analysis writes its markers to a temporary
+file, as ``codelinks analyse`` does with ``batch_size``.
+
+Run with ``python benchmarks/bench_batch_memory.py [files] [units per file] [batch size]``.
+"""
+
+import logging
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.config import SourceAnalyseConfig
+
+UNIT = (
+    "// @need-ids: REQ_{0}, REQ_{0}_b\n"
+    "int func_{0}(int a) {{\n"
+    "    // a plain comment\n"
+    "    return a + {0};  // @Function {0}, IMPL_{0}, impl, [REQ_{0}]\n"
+    "}}\n"
+)
+
+
+def analyse(src_dir: Path, batch_size: int) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    analyse_config = SourceAnalyseConfig(
+        src_files=sorted(src_dir.glob("*.cpp")),
+        src_dir=src_dir,
+        get_oneline_needs=True,
+        batch_size=batch_size,
+    )
+    src_analyse = SourceAnalyse(analyse_config)
+    start = time.perf_counter()
+    if batch_size:
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+            src_analyse.run_batches(spool)
+    else:
+        src_analyse.run()
+    duration = time.perf_counter() - start
+    peak_rss = (src_analyse.process_peak_rss or 0) / (1 << 20)
+    print(
+        f"batch size {batch_size:>5}: {duration * 1000:8.2f} ms, "
+        f"process peak RSS {peak_rss:7.1f} MiB"
+    )
+
+
+def main(num_files: int = 200, units: int = 300, batch_size: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = Path(tmp_dir)
+        for file_idx in range(num_files):
+            (src_dir / f"src_{file_idx}.cpp").write_text(
+                "".join(UNIT.format(file_idx * units + idx) for idx in range(units))
+            )
+        print(f"{num_files} files, {num_files * units * 3} comments")
+        for size in (0, batch_size):
+            subprocess.run(  # noqa: S603  # runs this script
+                [sys.executable, __file__, "--analyse", str(src_dir), str(size)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--analyse"]:
+        analyse(Path(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main(*(int(arg) for arg in sys.argv[1:4]))
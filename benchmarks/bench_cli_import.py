@@ -0,0 +1,41 @@
+"""Time of importing the CLI, which every ``codelinks`` command pays.
+
+Each import runs in a fresh interpreter, the best of the runs is reported to be robust
+against a busy machine.
+
+Run with ``python benchmarks/bench_cli_import.py [runs]``.
+"""
+
+import statistics
+import subprocess
+import sys
+
+IMPORT_SCRIPT = """
+import time
+
+start = time.perf_counter()
+import sphinx_codelinks.cmd
+print(time.perf_counter() - start)
+"""
+
+
+def import_cli() -> float:
+    result = subprocess.run(  # noqa: S603  # the script is fixed
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout)
+
+
+def main(runs: int = 5) -> None:
+    durations = [import_cli() for _ in range(runs)]
+    print(
+        f"import sphinx_codelinks.cmd: {min(durations) * 1000:8.2f} ms (best), "
+        f"{statistics.median(durations) * 1000:8.2f} ms (median)"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,88 @@
+"""Time of extracting the markers from the comments of parsed files.
+
+Parsing is excluded, the time covers the extraction of all three kinds of markers from
+the comments and the conversion of the markers to dicts for the JSON output.
+
+Besides the marked comments, each unit of the generated sources has ``plain`` comments
+without any marker, as most comments of real code bases are.
+
+Run with ``python benchmarks/bench_extraction.py [files] [units per file] [plain]``.
+"""
+
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.config import SourceAnalyseConfig
+
+UNIT = (
+    "// @need-ids: REQ_{0}, REQ_{0}_b\n"
+    "int func_{0}(int a) {{\n"
+    "    // a plain comment\n"
+    "    /* a plain block comment\n"
+    "     * of func_{0}\n"
+    "     */\n"
+    "    return a + {0};  // @Function {0}, IMPL_{0}, impl, [REQ_{0}]\n"
+    "{1}"
+    "}}\n"
+    "/*\n"
+    "@rst\n"
+    ".. impl:: Implementation {0}\n"
+    "   :id: RST_{0}\n"
+    "@endrst\n"
+    "*/\n"
+)
+REPEAT = 10
+
+
+PLAIN = "    // plain comment {0}: the value is not checked here\n    a += {0};\n"
+
+
+def main(num_files: int = 10, units: int = 300, plain: int = 10) -> None:
+    plain_comments = "".join(PLAIN.format(idx) for idx in range(plain))
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = Path(tmp_dir)
+        src_files = []
+        for file_idx in range(num_files):
+            src_path = src_dir / f"src_{file_idx}.cpp"
+            src_path.write_text(
+                "".join(
+                    UNIT.format(file_idx * units + idx, plain_comments)
+                    for idx in range(units)
+                )
+            )
+            src_files.append(src_path)
+        analyse_config = SourceAnalyseConfig(
+            src_files=src_files,
+            src_dir=src_dir,
+            get_need_id_refs=True,
+            get_oneline_needs=True,
+            get_rst=True,
+        )
+
+        durations = []
+        for _ in range(REPEAT):
+            src_analyse = SourceAnalyse(analyse_config)
+            src_analyse.create_src_objects()
+            start = time.perf_counter()
+            src_analyse.extract_marked_content()
+            src_analyse.merge_marked_content()
+            for marker in src_analyse.all_marked_content:
+                marker.to_dict()
+            durations.append(time.perf_counter() - start)
+
+    print(
+        f"{len(src_analyse.src_comments)} comments, "
+        f"{len(src_analyse.all_marked_content)} markers"
+    )
+    print(f"extraction: {statistics.median(durations) * 1000:8.2f} ms (median)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
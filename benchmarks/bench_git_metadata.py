@@ -0,0 +1,70 @@
+"""Time of looking up the git metadata of many projects of one repository.
+
+Each lookup locates the git root of a project directory and reads the remote URL
+and the current commit, as ``SourceAnalyse`` does when it is created. The lookups
+are timed with the metadata shared across them and with the cache cleared before
+each lookup, which reads the git files every time. The branch of the repository is
+in ``packed-refs``.
+
+Run with ``python benchmarks/bench_git_metadata.py [projects] [lookups per project]``.
+"""
+
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+from sphinx_codelinks.analyse import utils
+
+REPEAT = 5
+DEPTH = 6
+
+
+def write_repository(repo_dir: Path, num_projects: int) -> list[Path]:
+    git_dir = repo_dir / ".git"
+    git_dir.mkdir(parents=True)
+    (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+    (git_dir / "config").write_text(
+        '[core]\n\tbare = false\n[remote "origin"]\n'
+        "\turl = https://github.com/owner/repo.git\n"
+    )
+    (git_dir / "packed-refs").write_text(
+        "# pack-refs with: peeled fully-peeled sorted\n"
+        + "".join(f"{idx:040x} refs/tags/v{idx}\n" for idx in range(200))
+        + f"{'a' * 40} refs/heads/main\n"
+    )
+    project_dirs = []
+    for idx in range(num_projects):
+        project_dir = repo_dir.joinpath(*(f"level_{level}" for level in range(DEPTH)))
+        project_dir = project_dir / f"project_{idx}"
+        project_dir.mkdir(parents=True)
+        project_dirs.append(project_dir)
+    return project_dirs
+
+
+def look_up(project_dirs: list[Path], lookups: int, cached: bool) -> float:
+    utils.clear_git_cache()
+    start = time.perf_counter()
+    for _ in range(lookups):
+        for project_dir in project_dirs:
+            if not cached:
+                utils.clear_git_cache()
+            git_root = utils.locate_git_root(project_dir)
+            if git_root is not None:
+                utils.get_remote_url(git_root)
+                utils.get_current_rev(git_root)
+    return time.perf_counter() - start
+
+
+def main(num_projects: int = 25, lookups: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        project_dirs = write_repository(Path(tmp_dir) / "repo", num_projects)
+        print(f"{num_projects} projects, {num_projects * lookups} lookups")
+        for name, cached in (("uncached", False), ("cached", True)):
+            durations = [look_up(project_dirs, lookups, cached) for _ in range(REPEAT)]
+            print(f"{name:>8}: {statistics.median(durations) * 1000:8.2f} ms (median)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,112 @@
+"""Time of an incremental build after a source file was edited.
+
+Each file of a project is traced by the directive of its own document. After a full
+build, a plain comment is added to one file, which does not change its markers, and
+the documents are built again. The documents read by the incremental build are
+counted, only those whose markers changed are read.
+
+Run with ``python benchmarks/bench_incremental_build.py [files] [units per file]``.
+"""
+
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+UNIT = (
+    "// @Function {0}, IMPL_{0}, impl\n"
+    "int func_{0}(int a) {{\n"
+    "    return a + {0};\n"
+    "}}\n"
+)
+REPEAT = 3
+
+
+class ReadCounter:
+    def __init__(self) -> None:
+        self.docnames: list[str] = []
+
+    def count(self, _app: Sphinx, _env: BuildEnvironment, docnames: list[str]) -> None:
+        self.docnames.extend(docnames)
+
+
+def write_project(doc_dir: Path, num_files: int, units: int) -> None:
+    (doc_dir / "src").mkdir()
+    docnames = []
+    for file_idx in range(num_files):
+        first = file_idx * units
+        (doc_dir / "src" / f"src_{file_idx}.cpp").write_text(
+            "".join(UNIT.format(first + idx) for idx in range(units))
+        )
+        (doc_dir / f"doc_{file_idx}.rst").write_text(
+            f"Doc {file_idx}\n======\n\n"
+            f".. src-trace::\n   :project: src\n   :file: src_{file_idx}.cpp\n"
+        )
+        docnames.append(f"doc_{file_idx}")
+    (doc_dir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "src"\n'
+        "gitignore = false\n"
+    )
+    (doc_dir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+        "suppress_warnings = ['codelinks']\n"
+    )
+    (doc_dir / "index.rst").write_text(
+        "Index\n=====\n\n.. toctree::\n\n" + "".join(f"   {d}\n" for d in docnames)
+    )
+
+
+def build(doc_dir: Path, out_dir: Path, freshenv: bool) -> tuple[float, int]:
+    counter = ReadCounter()
+    app = Sphinx(
+        str(doc_dir),
+        str(doc_dir),
+        str(out_dir / "html"),
+        str(out_dir / "doctrees"),
+        "html",
+        status=None,
+        warning=None,
+        freshenv=freshenv,
+    )
+    app.connect("env-before-read-docs", counter.count)
+    start = time.perf_counter()
+    app.build()
+    return time.perf_counter() - start, len(counter.docnames)
+
+
+def main(num_files: int = 50, units: int = 20) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        doc_dir = Path(tmp_dir) / "doc"
+        doc_dir.mkdir()
+        write_project(doc_dir, num_files, units)
+        out_dir = Path(tmp_dir) / "build"
+        full_duration, _ = build(doc_dir, out_dir, freshenv=True)
+        edited = doc_dir / "src" / "src_0.cpp"
+        durations = []
+        num_read = 0
+        for idx in range(REPEAT):
+            with edited.open("a") as src_file:
+                src_file.write(f"// a plain comment {idx}\n")
+            duration, num_read = build(doc_dir, out_dir, freshenv=False)
+            durations.append(duration)
+
+    print(f"{num_files} documents, {num_files * units} needs")
+    print(f"       full build: {full_duration * 1000:9.2f} ms")
+    print(
+        f"incremental build: {statistics.median(durations) * 1000:9.2f} ms (median), "
+        f"{num_read} documents read"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,61 @@
+"""Latency of re-analysing a one-line edit in a large C++ file.
+
+Compares a full parse and comment extraction against the incremental re-parse of
+:class:`sphinx_codelinks.analyse.incremental.TreeCache`.
+
+Run with ``python benchmarks/bench_incremental_parse.py [lines]``.
+"""
+
+from pathlib import Path
+import sys
+import time
+
+from sphinx_codelinks.analyse import utils
+from sphinx_codelinks.analyse.incremental import TreeCache
+from sphinx_codelinks.source_discover.config import CommentType
+
+UNIT = (
+    "// @need-ids: REQ_{0}\n"
+    "int func_{0}(int a) {{\n"
+    "    /* block comment of func_{0} */\n"
+    "    return a + {0};\n"
+    "}}\n"
+)
+REPEAT = 20
+
+
+def main(num_lines: int = 20_000) -> None:
+    units = num_lines // UNIT.count("\n")
+    lines = "".join(UNIT.format(idx) for idx in range(units)).splitlines(keepends=True)
+    parser, query = utils.init_tree_sitter(CommentType.cpp)
+    filepath = Path("bench.cpp")
+
+    def edited(step: int) -> bytes:
+        # a one-line edit of a comment in the middle of the file
+        edited_lines = list(lines)
+        edited_lines[len(lines) // 2] = f"// @need-ids: REQ_EDIT_{step}\n"
+        return "".join(edited_lines).encode()
+
+    full = []
+    for step in range(REPEAT):
+        src_string = edited(step)
+        start = time.perf_counter()
+        utils.extract_comments(src_string, parser, query)
+        full.append(time.perf_counter() - start)
+
+    tree_cache = TreeCache(max_files=1)
+    tree_cache.extract_comments(filepath, edited(-1), parser, query)
+    incremental = []
+    for step in range(REPEAT):
+        src_string = edited(step)
+        start = time.perf_counter()
+        tree_cache.extract_comments(filepath, src_string, parser, query)
+        incremental.append(time.perf_counter() - start)
+
+    print(f"{len(lines)} lines, median of {REPEAT} runs")
+    print(f"full parse:        {sorted(full)[REPEAT // 2] * 1000:8.2f} ms")
+    print(f"incremental parse: {sorted(incremental)[REPEAT // 2] * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
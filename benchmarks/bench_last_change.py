@@ -0,0 +1,92 @@
+"""Time of finding the last commit which changed each file of a project.
+
+A repository has a history in which each commit changes a few of the files. The last
+commits are found with a single ``git log`` for all files, and with one ``git log -1``
+per file for comparison.
+
+Run with ``python benchmarks/bench_last_change.py [files] [commits]``.
+"""
+
+from pathlib import Path
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from sphinx_codelinks.analyse import utils
+
+REPEAT = 3
+FILES_PER_COMMIT = 5
+
+
+def git(git_path: str, repo: Path, *args: str) -> str:
+    result = subprocess.run(  # noqa: S603
+        [
+            git_path,
+            "-c",
+            "user.name=Benchmark",
+            "-c",
+            "user.email=benchmark@example.com",
+            *args,
+        ],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout
+
+
+def write_repository(git_path: str, repo: Path, num_files: int, commits: int) -> None:
+    src_dir = repo / "src"
+    src_dir.mkdir(parents=True)
+    git(git_path, repo, "init", "-q")
+    for idx in range(num_files):
+        (src_dir / f"src_{idx}.cpp").write_text(f"// @Function {idx}, IMPL_{idx}\n")
+    git(git_path, repo, "add", ".")
+    git(git_path, repo, "commit", "-q", "-m", "Add the files")
+    for commit in range(commits):
+        for offset in range(FILES_PER_COMMIT):
+            src_file = src_dir / f"src_{(commit * 7 + offset) % num_files}.cpp"
+            with src_file.open("a") as file:
+                file.write(f"int f_{commit}_{offset};\n")
+        git(git_path, repo, "commit", "-q", "-am", f"Change {commit}")
+
+
+def per_file(git_path: str, repo: Path, src_files: list[Path]) -> float:
+    start = time.perf_counter()
+    for src_file in src_files:
+        git(git_path, repo, "log", "-1", "--format=%H", "--", str(src_file))
+    return time.perf_counter() - start
+
+
+def batched(repo: Path, src_files: list[Path]) -> float:
+    utils.clear_git_cache()
+    start = time.perf_counter()
+    utils.get_last_change_revs(repo, src_files)
+    return time.perf_counter() - start
+
+
+def main(num_files: int = 200, commits: int = 100) -> None:
+    git_path = shutil.which("git")
+    if git_path is None:
+        print("git is not installed")
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        repo = Path(tmp_dir).resolve() / "repo"
+        write_repository(git_path, repo, num_files, commits)
+        src_files = sorted((repo / "src").iterdir())
+        per_file_durations = [
+            per_file(git_path, repo, src_files) for _ in range(REPEAT)
+        ]
+        batched_durations = [batched(repo, src_files) for _ in range(REPEAT)]
+
+    print(f"{num_files} files, {commits + 1} commits")
+    print(f"per file: {statistics.median(per_file_durations) * 1000:9.2f} ms (median)")
+    print(f" batched: {statistics.median(batched_durations) * 1000:9.2f} ms (median)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,99 @@
+"""Size and time of writing and loading the marked content in layout 1 and 2.
+
+The markers are generated as analyse dumps them for a repository with a remote:
+several markers per function, each with the full file path, remote url and scope.
+Loading streams the markers with ``load_marked_objs``, as ``write rst`` does.
+
+Run with ``python benchmarks/bench_layout.py [files] [functions per file]``.
+"""
+
+from collections.abc import Callable, Iterator
+import json
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+from typing import TextIO
+
+from sphinx_codelinks.marked_content import dump_layout_2, load_marked_objs
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+URL = "https://github.com/useblocks/sphinx-codelinks/blob/951e40e7845f06d5cfc4ca20ebb984308fdaf985/"
+SCOPE = "int func_{0}(int a) {{\n" + "    a = a * {0} + 1;\n" * 8 + "    return a;\n}}"
+MARKERS_PER_FUNCTION = 3
+REPEAT = 5
+
+
+def iter_markers(num_files: int, functions: int) -> Iterator[MarkedObjType]:
+    for file_idx in range(num_files):
+        filepath = (
+            f"/home/user/git/project/src/module_{file_idx % 10}/source_{file_idx}.cpp"
+        )
+        for func_idx in range(functions):
+            scope = SCOPE.format(file_idx * functions + func_idx)
+            for marker_idx in range(MARKERS_PER_FUNCTION):
+                row = func_idx * 12 + marker_idx
+                yield {
+                    "filepath": filepath,
+                    "remote_url": f"{URL}{filepath[25:]}#L{row + 1}",
+                    "source_map": {
+                        "start": {"row": row, "column": 4},
+                        "end": {"row": row, "column": 30},
+                    },
+                    "tagged_scope": scope,
+                    "need_ids": [f"REQ_{func_idx}_{marker_idx}"],
+                    "marker": "@need-ids:",
+                    "type": "need-id-refs",  # type: ignore[typeddict-item]  # dumped value
+                    "need": None,
+                    "rst": None,
+                }
+
+
+def dump_layout_1(fp: TextIO, markers: list[MarkedObjType]) -> None:
+    # as AnalyseProjects.dump_markers writes it
+    fp.write('{"project": [')
+    fp.write(", ".join(json.dumps(marker) for marker in markers))
+    fp.write("]}")
+
+
+def measure(func: Callable[[], object]) -> float:
+    durations = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main(num_files: int = 100, functions: int = 50) -> None:
+    markers = list(iter_markers(num_files, functions))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        for layout in (1, 2):
+            jsonpath = Path(tmp_dir) / f"marked_content_{layout}.json"
+
+            def write(layout: int = layout, jsonpath: Path = jsonpath) -> None:
+                with jsonpath.open("w") as f:
+                    if layout == 1:
+                        dump_layout_1(f, markers)
+                    else:
+                        dump_layout_2(f, [("project", markers)])
+
+            def load(jsonpath: Path = jsonpath) -> None:
+                for _ in load_marked_objs(jsonpath):
+                    pass
+
+            results[layout] = (measure(write), measure(load), jsonpath.stat().st_size)
+
+    print(f"{num_files} files, {len(markers)} markers")
+    for layout, (write_duration, load_duration, size) in results.items():
+        print(
+            f"layout {layout}: {size / (1 << 20):6.2f} MiB, "
+            f"write {write_duration * 1000:8.2f} ms, "
+            f"load {load_duration * 1000:8.2f} ms (median)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
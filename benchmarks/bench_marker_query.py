@@ -0,0 +1,92 @@
+"""Time of getting the marked comments of comment-heavy files.
+
+The generated headers are fully Doxygen-documented, so nearly all of their comments
+are plain. The analysis runs with the query of all comments, whose comments are
+filtered in Python (the fallback), and with the query restricted to the markers,
+where tree-sitter drops the plain comments itself. Reading the files is included.
+
+Run with ``python benchmarks/bench_marker_query.py [files] [units per file]``.
+"""
+
+from contextlib import ExitStack
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from sphinx_codelinks.analyse import utils
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.config import SourceAnalyseConfig
+from sphinx_codelinks.source_discover.config import CommentType
+
+UNIT = (
+    "/**\n"
+    " * @brief Compute the value {0}.\n"
+    " *\n"
+    " * @param a The input value.\n"
+    " * @param b The offset, which must not be negative.\n"
+    " * @return The computed value.\n"
+    " */\n"
+    "inline int func_{0}(int a, int b) {{\n"
+    "    /// the offset is applied first\n"
+    "    a += b;  ///< adjusted input\n"
+    "    return a * {0};  //!< scaled result\n"
+    "}}\n"
+)
+MARKED_UNIT = "// @need-ids: REQ_{0}\n"
+MARKED_EVERY = 20
+REPEAT = 10
+
+
+def main(num_files: int = 10, units: int = 300) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = Path(tmp_dir)
+        src_files = []
+        for file_idx in range(num_files):
+            src_path = src_dir / f"src_{file_idx}.hpp"
+            src_path.write_text(
+                "".join(
+                    (MARKED_UNIT if idx % MARKED_EVERY == 0 else "")
+                    + UNIT.format(file_idx * units + idx)
+                    for idx in range(units)
+                )
+            )
+            src_files.append(src_path)
+        analyse_config = SourceAnalyseConfig(src_files=src_files, src_dir=src_dir)
+        _, query = utils.get_language_query(CommentType.cpp)
+
+        results = {}
+        for name, fallback in (("all comments", True), ("markers", False)):
+            with ExitStack() as stack:
+                if fallback:
+                    stack.enter_context(
+                        mock.patch.object(utils, "get_marker_query", return_value=query)
+                    )
+                durations = []
+                for _ in range(REPEAT):
+                    src_analyse = SourceAnalyse(analyse_config)
+                    start = time.perf_counter()
+                    src_analyse.create_src_objects()
+                    src_analyse.extract_marked_content()
+                    durations.append(time.perf_counter() - start)
+            results[name] = (
+                statistics.median(durations),
+                len(src_analyse.src_comments),
+                len(src_analyse.need_id_refs),
+            )
+
+    print(f"{num_files} files, {num_files * units} documented functions")
+    for name, (duration, num_comments, num_markers) in results.items():
+        print(
+            f"{name:>12}: {duration * 1000:8.2f} ms (median), "
+            f"{num_comments} comments, {num_markers} markers"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,88 @@
+"""Time of ordering the extracted markers of all files by file and row.
+
+The markers are extracted once. The merge of the markers of each file is compared with
+sorting all markers by their path and row, which ``merge_marked_content`` did before.
+
+Run with ``python benchmarks/bench_merge.py [files] [units per file]``.
+"""
+
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.analyse.models import MarkedRst, NeedIdRefs, OneLineNeed
+from sphinx_codelinks.config import SourceAnalyseConfig
+
+UNIT = (
+    "// @need-ids: REQ_{0}, REQ_{0}_b\n"
+    "int func_{0}(int a) {{\n"
+    "    return a + {0};  // @Function {0}, IMPL_{0}, impl, [REQ_{0}]\n"
+    "}}\n"
+    "/* @rst\n"
+    ".. impl:: Implementation {0}\n"
+    "@endrst */\n"
+)
+REPEAT = 10
+
+
+def _get_row(marker: NeedIdRefs | OneLineNeed | MarkedRst) -> int:
+    return marker.source_map["start"]["row"]
+
+
+def sort_all(src_analyse: SourceAnalyse) -> None:
+    markers: list[NeedIdRefs | OneLineNeed | MarkedRst] = [
+        *src_analyse.need_id_refs,
+        *sorted(src_analyse.oneline_needs, key=_get_row),
+        *src_analyse.marked_rst,
+    ]
+    markers.sort(key=lambda marker: (marker.filepath, _get_row(marker)))
+
+
+def main(num_files: int = 200, units: int = 100) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = Path(tmp_dir)
+        src_files = []
+        for file_idx in range(num_files):
+            src_path = src_dir / f"dir_{file_idx % 10}" / f"src_{file_idx}.cpp"
+            src_path.parent.mkdir(exist_ok=True)
+            src_path.write_text(
+                "".join(UNIT.format(file_idx * units + idx) for idx in range(units))
+            )
+            src_files.append(src_path)
+        src_analyse = SourceAnalyse(
+            SourceAnalyseConfig(
+                src_files=src_files,
+                src_dir=src_dir,
+                get_need_id_refs=True,
+                get_oneline_needs=True,
+                get_rst=True,
+            )
+        )
+        src_analyse.create_src_objects()
+        src_analyse.extract_marked_content()
+
+    sort_durations = []
+    merge_durations = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        sort_all(src_analyse)
+        sort_durations.append(time.perf_counter() - start)
+
+        src_analyse.all_marked_content.clear()
+        start = time.perf_counter()
+        src_analyse.merge_marked_content()
+        merge_durations.append(time.perf_counter() - start)
+
+    print(f"{num_files} files, {len(src_analyse.all_marked_content)} markers")
+    print(f"sort all: {statistics.median(sort_durations) * 1000:8.2f} ms (median)")
+    print(f"   merge: {statistics.median(merge_durations) * 1000:8.2f} ms (median)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
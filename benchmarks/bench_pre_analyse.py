@@ -0,0 +1,130 @@
+"""Time of reading documents with many src-trace directives.
+
+A document traces each file of several projects with its own directive. It is built
+with the projects analysed before reading and with each directive analysing its file
+while it is read. The pre-analysis is the time from ``env-before-read-docs`` until the
+documents are read, the read time the one of reading them.
+
+Run with ``python benchmarks/bench_pre_analyse.py [projects] [files per project] [units per file]``.
+"""
+
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+UNIT = (
+    "// @Function {0}, IMPL_{0}, impl\n"
+    "int func_{0}(int a) {{\n"
+    "    // a plain comment\n"
+    "    return a + {0};\n"
+    "}}\n"
+)
+REPEAT = 3
+
+
+class PhaseTimer:
+    def __init__(self) -> None:
+        self.start = 0.0
+        self.read_start = 0.0
+        self.read_end = 0.0
+
+    def before_pre_analysis(
+        self, _app: Sphinx, _env: BuildEnvironment, _docnames: list[str]
+    ) -> None:
+        self.start = time.perf_counter()
+
+    def before_read(
+        self, _app: Sphinx, _env: BuildEnvironment, _docnames: list[str]
+    ) -> None:
+        self.read_start = time.perf_counter()
+
+    def after_read(self, _app: Sphinx, _env: BuildEnvironment) -> None:
+        self.read_end = time.perf_counter()
+
+
+def write_project(doc_dir: Path, num_projects: int, num_files: int, units: int) -> None:
+    toml_lines = ["[codelinks]"]
+    directives = []
+    for project_idx in range(num_projects):
+        project = f"project_{project_idx}"
+        src_dir = doc_dir / project
+        src_dir.mkdir()
+        for file_idx in range(num_files):
+            first = (project_idx * num_files + file_idx) * units
+            (src_dir / f"src_{file_idx}.cpp").write_text(
+                "".join(UNIT.format(first + idx) for idx in range(units))
+            )
+            directives.append(
+                f".. src-trace::\n   :project: {project}\n   :file: src_{file_idx}.cpp\n"
+            )
+        toml_lines.extend(
+            (
+                f"[codelinks.projects.{project}.source_discover]",
+                f'src_dir = "{project}"',
+                "gitignore = false",
+            )
+        )
+    (doc_dir / "src_trace.toml").write_text("\n".join(toml_lines) + "\n")
+    (doc_dir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+        "suppress_warnings = ['codelinks']\n"
+    )
+    (doc_dir / "index.rst").write_text("Index\n=====\n\n" + "\n".join(directives))
+
+
+def build(doc_dir: Path, out_dir: Path, pre_analyse: bool) -> tuple[float, float]:
+    timer = PhaseTimer()
+    app = Sphinx(
+        str(doc_dir),
+        str(doc_dir),
+        str(out_dir / "html"),
+        str(out_dir / "doctrees"),
+        "html",
+        confoverrides={"src_trace_pre_analyse": pre_analyse},  # type: ignore[misc]
+        status=None,
+        warning=None,
+        freshenv=True,
+    )
+    app.connect("env-before-read-docs", timer.before_pre_analysis, priority=0)
+    app.connect("env-before-read-docs", timer.before_read, priority=1000)
+    app.connect("env-updated", timer.after_read, priority=0)
+    app.build()
+    return timer.read_start - timer.start, timer.read_end - timer.read_start
+
+
+def main(num_projects: int = 4, num_files: int = 25, units: int = 20) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        doc_dir = Path(tmp_dir) / "doc"
+        doc_dir.mkdir()
+        write_project(doc_dir, num_projects, num_files, units)
+        print(
+            f"{num_projects} projects, {num_projects * num_files} directives, "
+            f"{num_projects * num_files * units} needs"
+        )
+        for name, pre_analyse in (("in directives", False), ("pre-analysed", True)):
+            pre_durations = []
+            read_durations = []
+            for _ in range(REPEAT):
+                pre_duration, read_duration = build(
+                    doc_dir, Path(tmp_dir) / "build", pre_analyse
+                )
+                pre_durations.append(pre_duration)
+                read_durations.append(read_duration)
+            print(
+                f"{name:>13}: pre-analysis "
+                f"{statistics.median(pre_durations) * 1000:8.2f} ms, "
+                f"read {statistics.median(read_durations) * 1000:8.2f} ms (median)"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
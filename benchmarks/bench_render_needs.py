@@ -0,0 +1,130 @@
+"""Time of a src-trace directive rendering the needs of a large file.
+
+A single directive renders all needs of one file with local and remote URLs. The
+documents are read with the dummy builder, which writes nothing. The time of the
+directive is measured, and separately the time spent in ``add_need`` of sphinx-needs,
+which the directive calls once per need. The project is analysed before reading.
+
+Run with ``python benchmarks/bench_render_needs.py [needs]``.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx_needs.api import add_need  # type: ignore[import-untyped]
+
+from sphinx_codelinks.sphinx_extension.directives import src_trace
+from sphinx_codelinks.sphinx_extension.directives.src_trace import (
+    SourceTracingDirective,
+)
+
+UNIT = (
+    "// @Function {0}, IMPL_{0}, impl\n"
+    "int func_{0}(int a) {{\n"
+    "    return a + {0};\n"
+    "}}\n"
+)
+REPEAT = 3
+
+DirectiveRun = Callable[[SourceTracingDirective], list[nodes.Node]]
+
+
+class DirectiveTimer:
+    def __init__(self) -> None:
+        self.run_duration = 0.0
+        self.add_need_duration = 0.0
+
+    def time_run(self, run: DirectiveRun) -> DirectiveRun:
+        def timed_run(directive: SourceTracingDirective) -> list[nodes.Node]:
+            start = time.perf_counter()
+            rendered_needs = run(directive)
+            self.run_duration += time.perf_counter() - start
+            return rendered_needs
+
+        return timed_run
+
+    def timed_add_need(self, **kwargs: object) -> list[nodes.Node]:
+        start = time.perf_counter()
+        need_nodes: list[nodes.Node] = add_need(**kwargs)
+        self.add_need_duration += time.perf_counter() - start
+        return need_nodes
+
+
+def write_project(doc_dir: Path, num_needs: int) -> None:
+    (doc_dir / "src").mkdir()
+    (doc_dir / "src" / "needs.cpp").write_text(
+        "".join(UNIT.format(idx) for idx in range(num_needs))
+    )
+    (doc_dir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        "set_local_url = true\n"
+        "set_remote_url = true\n"
+        "[codelinks.projects.src]\n"
+        'remote_url_pattern = "https://example.com/blob/{commit}/{path}#L{line}"\n'
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "src"\n'
+        "gitignore = false\n"
+    )
+    (doc_dir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+        "suppress_warnings = ['codelinks']\n"
+    )
+    (doc_dir / "index.rst").write_text(
+        "Index\n=====\n\n.. src-trace::\n   :project: src\n   :file: needs.cpp\n"
+    )
+
+
+def build(doc_dir: Path, out_dir: Path) -> tuple[float, float]:
+    timer = DirectiveTimer()
+    with (
+        mock.patch.object(
+            SourceTracingDirective,
+            "run",
+            timer.time_run(SourceTracingDirective.run),
+        ),
+        mock.patch.object(src_trace, "add_need", timer.timed_add_need),
+    ):
+        app = Sphinx(
+            str(doc_dir),
+            str(doc_dir),
+            str(out_dir),
+            str(out_dir / ".doctrees"),
+            "dummy",
+            status=None,
+            warning=None,
+            freshenv=True,
+        )
+        app.build()
+    return timer.run_duration, timer.add_need_duration
+
+
+def main(num_needs: int = 5000) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        doc_dir = Path(tmp_dir) / "doc"
+        doc_dir.mkdir()
+        write_project(doc_dir, num_needs)
+        run_durations = []
+        add_need_durations = []
+        for _ in range(REPEAT):
+            run_duration, add_need_duration = build(doc_dir, Path(tmp_dir) / "build")
+            run_durations.append(run_duration)
+            add_need_durations.append(add_need_duration)
+
+    run = statistics.median(run_durations)
+    add_need = statistics.median(add_need_durations)
+    print(f"1 directive, {num_needs} needs")
+    print(f"directive: {run * 1000:9.2f} ms (median)")
+    print(f" add_need: {add_need * 1000:9.2f} ms (median)")
+    print(f"     rest: {(run - add_need) * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
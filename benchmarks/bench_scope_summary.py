@@ -0,0 +1,77 @@
+"""Size of the written markers and time of writing them per tagged scope format.
+
+Each generated class has a marker on every method, so the text of a method is written
+once per marker in it and the text of the class once per marker on it.
+
+Run with ``python benchmarks/bench_scope_summary.py [files] [classes per file]``.
+"""
+
+import json
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.config import SourceAnalyseConfig, TaggedScopeFormat
+from sphinx_codelinks.source_discover.config import CommentType
+
+METHOD = (
+    "    # @Method {0}_{1}, IMPL_{0}_{1}, impl, [REQ_{0}]\n"
+    "    def method_{1}(self, value):\n"
+    '        """Update the state {1} of the value."""\n'
+    "        self.state_{1} = value * {1}\n"
+    "        return self.state_{1}\n"
+    "\n"
+)
+CLASS = "# @need-ids: REQ_{0}\nclass Unit{0}:\n" + "".join(
+    METHOD.replace("{1}", str(idx)) for idx in range(10)
+)
+REPEAT = 5
+
+
+def main(num_files: int = 20, classes: int = 20) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = Path(tmp_dir)
+        src_files = []
+        for file_idx in range(num_files):
+            src_path = src_dir / f"src_{file_idx}.py"
+            src_path.write_text(
+                "\n".join(
+                    CLASS.format(file_idx * classes + idx) for idx in range(classes)
+                )
+            )
+            src_files.append(src_path)
+
+        results = {}
+        for scope_format in TaggedScopeFormat:
+            analyse_config = SourceAnalyseConfig(
+                src_files=src_files,
+                src_dir=src_dir,
+                comment_type=CommentType.python,
+                get_oneline_needs=True,
+                tagged_scope_format=scope_format,
+            )
+            durations = []
+            for _ in range(REPEAT):
+                src_analyse = SourceAnalyse(analyse_config)
+                src_analyse.run()
+                start = time.perf_counter()
+                size = sum(
+                    len(json.dumps(marker.to_dict()))
+                    for marker in src_analyse.all_marked_content
+                )
+                durations.append(time.perf_counter() - start)
+            results[scope_format.value] = (statistics.median(durations), size)
+
+    print(f"{num_files} files, {len(src_analyse.all_marked_content)} markers")
+    for name, (duration, size) in results.items():
+        print(f"{name:>12}: {duration * 1000:8.2f} ms (median), {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,107 @@
+"""Time of dumping and loading a marker file with each JSON backend.
+
+The markers are dumped one by one to a file, as ``codelinks analyse`` writes
+``marked_content.json``, and loaded again line by line, as the markers of a project
+analysed in batches are read back. ``json (before)`` is the standard library with its
+default settings, ``json`` and ``orjson`` are the backends of ``serialize``.
+orjson is only measured if it is installed.
+
+Run with ``python benchmarks/bench_serialize.py [markers]``.
+"""
+
+from collections.abc import Callable
+from itertools import cycle, islice
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from sphinx_codelinks import serialize
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+DISTINCT_MARKERS = 1000
+
+
+def get_markers() -> list[MarkedObjType]:
+    markers: list[MarkedObjType] = []
+    for idx in range(DISTINCT_MARKERS):
+        row = idx * 7
+        markers.append(
+            {
+                "filepath": f"/home/user/git/project/src/module_{idx % 10}/source_{idx // 10}.cpp",
+                "remote_url": f"https://github.com/org/project/blob/951e40e/src/source_{idx // 10}.cpp#L{row + 1}",
+                "source_map": {
+                    "start": {"row": row, "column": 4},
+                    "end": {"row": row, "column": 30},
+                },
+                "tagged_scope": f"int func_{idx}(int a) {{\n    return a * {idx};\n}}",
+                "need_ids": [f"REQ_{idx}", f"REQ_{idx}_b"],
+                "marker": "@need-ids:",
+                "type": "need-id-refs",  # type: ignore[typeddict-item]  # dumped value
+                "need": None,
+                "rst": None,
+            }
+        )
+    return markers
+
+
+def dumps_before(obj: object) -> str:
+    return json.dumps(obj)
+
+
+def loads_before(text: str) -> object:
+    return json.loads(text)  # type: ignore[misc]  # any JSON value
+
+
+def measure(
+    dumps: Callable[[object], str],
+    loads: Callable[[str], object],
+    markers: list[MarkedObjType],
+    num_markers: int,
+    jsonpath: Path,
+) -> tuple[float, float]:
+    start = time.perf_counter()
+    with jsonpath.open("w", encoding=serialize.ENCODING) as f:
+        for marker in islice(cycle(markers), num_markers):
+            f.write(dumps(marker))
+            f.write("\n")
+    dump_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with jsonpath.open("r", encoding=serialize.ENCODING) as f:
+        for line in f:
+            loads(line)
+    return dump_duration, time.perf_counter() - start
+
+
+def main(num_markers: int = 1_000_000) -> None:
+    markers = get_markers()
+    has_orjson = serialize.get_backend() == "orjson"
+
+    print(f"{num_markers} markers")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonpath = Path(tmp_dir) / "markers.jsonl"
+        results = {
+            "json (before)": measure(
+                dumps_before, loads_before, markers, num_markers, jsonpath
+            )
+        }
+        with mock.patch.object(serialize, "orjson", None):
+            results["json"] = measure(
+                serialize.dumps, serialize.loads, markers, num_markers, jsonpath
+            )
+        if has_orjson:
+            results["orjson"] = measure(
+                serialize.dumps, serialize.loads, markers, num_markers, jsonpath
+            )
+        size = jsonpath.stat().st_size
+
+    print(f"{size / (1 << 20):.1f} MiB")
+    for name, (dump_duration, load_duration) in results.items():
+        print(f"{name:>14}: dump {dump_duration:6.2f} s, load {load_duration:6.2f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,109 @@
+"""Time of a sharded analysis on several nodes compared to a single node.
+
+The shards are analysed one after the other, the time of the analysis on parallel
+nodes is the one of the slowest shard, followed by the merge of their outputs. The
+merged marked content is checked to be the same as the one of the single node.
+
+Run with ``python benchmarks/bench_shard.py [files] [shards]``.
+"""
+
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from typer.testing import CliRunner
+
+from sphinx_codelinks.cmd import app
+
+UNIT = (
+    "// @Function {0}, IMPL_{0}, impl, [REQ_{0}]\n"
+    "int func_{0}(int a) {{\n"
+    "    // @need-ids: REQ_{0}\n"
+    "    return a + {0};\n"
+    "}}\n"
+)
+UNITS_PER_FILE = 40
+
+runner = CliRunner()
+
+
+def write_project(root: Path, num_files: int) -> Path:
+    src_dir = root / "src"
+    for file_idx in range(num_files):
+        module_dir = src_dir / f"module_{file_idx % 10}"
+        module_dir.mkdir(parents=True, exist_ok=True)
+        # a few files are much larger than the others
+        units = UNITS_PER_FILE * (10 if file_idx % 25 == 0 else 1)
+        first = file_idx * UNITS_PER_FILE * 10
+        (module_dir / f"src_{file_idx}.cpp").write_text(
+            "".join(UNIT.format(first + idx) for idx in range(units))
+        )
+    config_file = root / "codelinks.toml"
+    config_file.write_text(
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "src"\n'
+        "gitignore = false\n"
+        "[codelinks.projects.src.analyse]\n"
+        "get_oneline_needs = true\n"
+    )
+    return config_file
+
+
+def invoke(*args: str) -> float:
+    start = time.perf_counter()
+    result = runner.invoke(app, list(args))
+    duration = time.perf_counter() - start
+    if result.exit_code != 0:
+        raise RuntimeError(result.output)
+    return duration
+
+
+def main(num_files: int = 400, num_shards: int = 4) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        config_file = write_project(root, num_files)
+        single_dir = root / "single"
+        single_dir.mkdir()
+        single = invoke("analyse", str(config_file), "-q", "-o", str(single_dir))
+
+        print(f"{num_files} files, {num_shards} shards")
+        print(f"single node: {single * 1000:9.2f} ms")
+        merged = single_dir / "marked_content.json"
+        for strategy in ("hash", "size"):
+            shard_dirs = []
+            durations = []
+            for idx in range(1, num_shards + 1):
+                shard_dir = root / f"{strategy}_{idx}"
+                shard_dir.mkdir()
+                shard_dirs.append(str(shard_dir))
+                durations.append(
+                    invoke(
+                        "analyse",
+                        str(config_file),
+                        "-q",
+                        "-o",
+                        str(shard_dir),
+                        "--shard",
+                        f"{idx}/{num_shards}",
+                        "--shard-by",
+                        strategy,
+                    )
+                )
+            merge_dir = root / f"{strategy}_merged"
+            merge = invoke("merge", *shard_dirs, "-q", "-o", str(merge_dir))
+            same = (
+                merge_dir / "marked_content.json"
+            ).read_bytes() == merged.read_bytes()
+            print(
+                f"{strategy:>11}: {max(durations) * 1000:9.2f} ms slowest shard "
+                f"(fastest {min(durations) * 1000:.2f} ms), "
+                f"merge {merge * 1000:.2f} ms, same output: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
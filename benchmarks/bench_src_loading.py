@@ -0,0 +1,85 @@
+"""Throughput and copies of loading source files for the analysis.
+
+Compares the former loading (sniffing the file, reading it again as text, normalizing
+the line endings in ``str`` and encoding it back to bytes) with
+:meth:`sphinx_codelinks.analyse.analyse.SourceAnalyse.get_src_strings`, which reads
+each file once as bytes. The peak of the traced memory per file shows the number of
+full copies of the content made while loading it.
+
+Run with ``python benchmarks/bench_src_loading.py [files] [size in KiB]``.
+"""
+
+from collections.abc import Iterator
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sphinx_codelinks.analyse import utils
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.config import SourceAnalyseConfig
+
+LINE = "    int value_{0} = compute(value_{0});  // @need-ids: REQ_{0}\n"
+
+
+def legacy_src_strings(src_files: list[Path]) -> Iterator[tuple[Path, bytes]]:
+    for src_path in src_files:
+        with src_path.open("rb") as f:
+            if not utils.is_text(f.read(2048)):
+                continue
+        with src_path.open("r", encoding="utf-8", newline="") as f:
+            text = f.read()
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        yield src_path, text.encode("utf-8")
+
+
+def measure(
+    src_strings: Iterator[tuple[Path, utils.SourceBuffer]],
+) -> tuple[float, int]:
+    """Return the duration and the highest peak of traced memory of a single file."""
+    peak = 0
+    start = time.perf_counter()
+    tracemalloc.start()
+    for item in src_strings:
+        # drop the content before the next file is loaded
+        del item
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+    return time.perf_counter() - start, peak
+
+
+def main(num_files: int = 20, size_kib: int = 2048) -> None:
+    # the temporary sources are not in a git repository
+    logging.getLogger("sphinx_codelinks").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_dir = Path(tmp_dir)
+        line_count = size_kib * 1024 // len(LINE.format(0))
+        content = "".join(LINE.format(idx) for idx in range(line_count))
+        src_files = []
+        for idx in range(num_files):
+            # half of the files have Windows line endings
+            newline = "\r\n" if idx % 2 else "\n"
+            src_path = src_dir / f"src_{idx}.cpp"
+            src_path.write_bytes(content.replace("\n", newline).encode())
+            src_files.append(src_path)
+        total_mib = sum(path.stat().st_size for path in src_files) / (1 << 20)
+        analyse_config = SourceAnalyseConfig(src_files=src_files, src_dir=src_dir)
+
+        results = {
+            "legacy": measure(legacy_src_strings(src_files)),
+            "single read": measure(SourceAnalyse(analyse_config).get_src_strings()),
+        }
+
+    print(f"{num_files} files, {total_mib:.1f} MiB, half of them with CRLF")
+    for name, (duration, peak) in results.items():
+        print(
+            f"{name:12}: {total_mib / duration:8.1f} MiB/s, "
+            f"peak per file {peak / (size_kib * 1024):4.1f}x the file size"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
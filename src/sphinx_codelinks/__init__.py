@@ -1,6 +1,9 @@
 """CodeLinks source code analyser"""
 
-from sphinx_codelinks.sphinx_extension.source_tracing import setup
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sphinx_codelinks.sphinx_extension.source_tracing import setup
 
 __version__ = "0.1.0"
 
@@ -8,3 +11,15 @@ __all__ = [
     "__version__",
     "setup",
 ]
+
+
+def __getattr__(name: str) -> object:
+    # the Sphinx extension is only imported when Sphinx loads it,
+    # so that the CLI and the analyse API do not import Sphinx
+    if name == "setup":
+        from sphinx_codelinks.sphinx_extension.source_tracing import (  # noqa: PLC0415
+            setup,
+        )
+
+        return setup
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
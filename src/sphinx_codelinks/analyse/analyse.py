@@ -1,12 +1,19 @@
-from collections.abc import Generator
+from collections import Counter
+from collections.abc import Callable, Generator, Sequence
 from dataclasses import dataclass
-import json
+from functools import cached_property
+from itertools import chain, groupby
+from mmap import mmap
+from operator import attrgetter
+import os
 from pathlib import Path
-from typing import Any, TypedDict
+from typing import TextIO, TypedDict
 
 from tree_sitter import Node as TreeSitterNode
 
+from sphinx_codelinks import serialize
 from sphinx_codelinks.analyse import utils
+from sphinx_codelinks.analyse.incremental import TreeCache
 from sphinx_codelinks.analyse.models import (
     MarkedContentType,
     MarkedRst,
@@ -23,6 +30,7 @@ from sphinx_codelinks.analyse.oneline_parser import (
 from sphinx_codelinks.config import (
     UNIX_NEWLINE,
     OneLineCommentStyle,
+    RemoteUrlRev,
     SourceAnalyseConfig,
 )
 from sphinx_codelinks.logger import get_logger
@@ -35,6 +43,26 @@ def _count(n: int, noun: str) -> str:
     return f"{n} {noun}" if n == 1 else f"{n} {noun}s"
 
 
+def _format_size(n_bytes: int) -> str:
+    return f"{n_bytes / (1 << 20):.1f} MiB"
+
+
+MarkerType = NeedIdRefs | OneLineNeed | MarkedRst
+
+
+def _get_row(marker: MarkerType) -> int:
+    return marker.source_map["start"]["row"]
+
+
+_get_source_file = attrgetter("source_comment.source_file")
+
+
+def _path_sort_key(filepath: Path) -> list[str]:
+    """Sort key of a path with the same order as comparing the paths themselves."""
+    # paths are compared by their case-normalized parts, Path.parts are not normalized
+    return os.path.normcase(filepath).split(os.sep)  # noqa: PTH206
+
+
 class AnalyseWarningType(TypedDict):
     file_path: str
     lineno: int
@@ -52,15 +80,63 @@ class AnalyseWarning:
     sub_type: str
 
 
+WarningSink = Callable[[AnalyseWarning], None]
+"""Receiver of each warning as soon as the analysis produces it."""
+
+
+class WarningLimit:
+    """Emit warnings up to a maximum number and count the further ones per subtype.
+
+    It is a warning sink itself, so that warnings can be emitted as they are
+    produced without the suppressed ones being kept.
+    """
+
+    def __init__(self, emit: WarningSink, max_warnings: int = 0) -> None:
+        """:param max_warnings: The number of warnings to emit, 0 for all of them."""
+        self.emit = emit
+        self.max_warnings = max_warnings
+        self.cnt_emitted = 0
+        self.suppressed: Counter[str] = Counter()
+
+    def __call__(self, warning: AnalyseWarning) -> None:
+        if self.max_warnings and self.cnt_emitted >= self.max_warnings:
+            self.suppressed[warning.sub_type] += 1
+            return
+        self.cnt_emitted += 1
+        self.emit(warning)
+
+    def summary(self) -> str | None:
+        """Summarize the suppressed warnings, None if there are none."""
+        if not self.suppressed:
+            return None
+        per_sub_type = ", ".join(
+            f"{sub_type}: {cnt}" for sub_type, cnt in sorted(self.suppressed.items())
+        )
+        return (
+            f"{_count(self.suppressed.total(), 'more warning')} not shown "
+            f"({per_sub_type}), the first {self.max_warnings} are shown"
+        )
+
+
 class SourceAnalyse:
     def __init__(
         self,
         analyse_config: SourceAnalyseConfig,
         *,
         name: str = "",
+        tree_cache: TreeCache | None = None,
+        warning_sink: WarningSink | None = None,
     ) -> None:
+        """Analyse the marked content in the source files of a project.
+
+        :param tree_cache: Keeps the parsed trees across analyses,
+            so that files edited since the previous analysis are re-parsed incrementally.
+        :param warning_sink: Receives the warnings as they are produced instead of
+            ``oneline_warnings``, so that they are not kept.
+        """
         self.name = name
         self.analyse_config = analyse_config
+        self.tree_cache = tree_cache
         self.src_files: list[SourceFile] = []
         self.src_comments: list[SourceComment] = []
         self.need_id_refs: list[NeedIdRefs] = []
@@ -82,41 +158,93 @@ class SourceAnalyse:
             self.git_root if self.git_root else self.analyse_config.src_dir
         )
         self.oneline_warnings: list[AnalyseWarning] = []
+        self.add_warning: WarningSink = warning_sink or self.oneline_warnings.append
+        # the peak resident set size of the whole process by the end of the analysis,
+        # which includes the analyses before, None if it cannot be measured
+        self.process_peak_rss: int | None = None
 
-    def get_src_strings(self) -> Generator[tuple[Path, bytes], Any, None]:  # type: ignore[explicit-any]
+    @cached_property
+    def git_file_revs(self) -> dict[Path, str]:
+        """The last commits which changed the source files, if remote URLs link to them."""
+        if (
+            self.analyse_config.remote_url_rev != RemoteUrlRev.last_change
+            or not self.git_root
+        ):
+            return {}
+        return utils.get_last_change_revs(self.git_root, self.analyse_config.src_files)
+
+    def get_commit_rev(self, filepath: Path) -> str | None:
+        """Get the commit which the remote URLs of a source file link to."""
+        return self.git_file_revs.get(filepath, self.git_commit_rev)
+
+    def get_src_strings(
+        self, src_files: list[Path] | None = None
+    ) -> Generator[tuple[Path, utils.SourceBuffer], None, None]:
         """Load source files and extract their content."""
-        for src_path in self.analyse_config.src_files:
-            if not utils.is_text_file(src_path):
-                continue
-            with src_path.open("r", encoding="utf-8", newline="") as f:
-                # Normalize all line endings to Unix LF
-                text = f.read()
-            text = text.replace("\r\n", "\n").replace("\r", "\n")
-            yield src_path, text.encode("utf-8")
-
-    def create_src_objects(self) -> None:
-        parser, query = utils.init_tree_sitter(self.analyse_config.comment_type)
-
-        for src_path, src_string in self.get_src_strings():
-            comments: list[TreeSitterNode] | None = utils.extract_comments(
-                src_string, parser, query
+        markers = [marker.encode("utf-8") for marker in self.get_markers()]
+        if src_files is None:
+            src_files = self.analyse_config.src_files
+        for src_path in src_files:
+            # each file is read once, the text check and the line ending
+            # normalization work on the bytes tree-sitter parses
+            src_bytes = utils.load_src_buffer(
+                src_path, self.analyse_config.mmap_threshold
             )
+            if not utils.is_text(src_bytes):
+                continue
+            if isinstance(src_bytes, mmap) and not utils.contains_any(
+                src_bytes, markers
+            ):
+                # a large file without any marker is not worth parsing
+                continue
+            # rebinding releases the original content while the caller parses
+            src_bytes = utils.normalize_line_endings(src_bytes)
+            yield src_path, src_bytes
+
+    def get_markers(self) -> list[str]:
+        """Get the markers of the enabled extractions, one of which a marked comment contains."""
+        markers: list[str] = []
+        if self.analyse_config.get_need_id_refs:
+            markers.extend(self.analyse_config.need_id_refs_config.markers)
+        if self.analyse_config.get_oneline_needs:
+            markers.append(self.analyse_config.oneline_comment_style.start_sequence)
+        if self.analyse_config.get_rst:
+            markers.append(self.analyse_config.marked_rst_config.start_sequence)
+        return markers
+
+    def create_src_objects(self, src_files: list[Path] | None = None) -> None:
+        # tree-sitter only captures the comments containing one of the markers
+        parser, query = utils.init_tree_sitter(
+            self.analyse_config.comment_type, self.get_markers()
+        )
+
+        for src_path, src_string in self.get_src_strings(src_files):
+            comments: list[TreeSitterNode] | None
+            if self.tree_cache is not None and isinstance(src_string, bytes):
+                comments = self.tree_cache.extract_comments(
+                    src_path, src_string, parser, query
+                )
+            else:
+                comments = utils.extract_comments(src_string, parser, query)
             if not comments:
                 continue
             src_comments: list[SourceComment] = [
                 SourceComment(node) for node in comments
             ]
 
-            src_file = SourceFile(src_path.absolute())
+            src_file = SourceFile(
+                src_path.absolute(),
+                src_string,
+                self.analyse_config.tagged_scope_format,
+            )
             src_file.add_comments(src_comments)
             self.src_files.append(src_file)
             self.src_comments.extend(src_comments)
 
     def extract_marker(
         self,
-        text: str,
+        lines: list[str],
     ) -> Generator[tuple[str, list[str], int, int, int], None, None]:
-        lines = text.splitlines()
         row_offset = 0
         for line in lines:
             for marker in self.analyse_config.need_id_refs_config.markers:
@@ -133,7 +261,6 @@ class SourceAnalyse:
     # @Extract need ID references from code comments, IMPL_LNK_1, impl, [FE_LNK]
     def extract_anchors(
         self,
-        text: str,
         filepath: Path,
         tagged_scope: TreeSitterNode | None,
         src_comment: SourceComment,
@@ -146,13 +273,14 @@ class SourceAnalyse:
             row_offset,
             start_column,
             end_column,
-        ) in self.extract_marker(text):
+        ) in self.extract_marker(src_comment.lines):
             lineno = src_comment.node.start_point.row + row_offset + 1
             remote_url = self.git_remote_url
-            if self.git_remote_url and self.git_commit_rev:
+            commit_rev = self.get_commit_rev(filepath)
+            if self.git_remote_url and commit_rev:
                 remote_url = utils.form_https_url(
                     self.git_remote_url,
-                    self.git_commit_rev,
+                    commit_rev,
                     self.project_path,
                     filepath,
                     lineno,
@@ -182,15 +310,14 @@ class SourceAnalyse:
 
     def extract_oneline_need(
         self,
-        text: str,
         src_comment: SourceComment,
         oneline_comment_style: OneLineCommentStyle,
     ) -> Generator[tuple[dict[str, str | list[str] | int], int]]:
-        lines = text.splitlines(keepends=True)
+        lines = src_comment.lines
         row_offset = 0
         if len(lines) == 1:
             # single line comment has no newline char in the extracted comment
-            lines[0] = f"{lines[0]}{UNIX_NEWLINE}"
+            lines = [f"{lines[0]}{UNIX_NEWLINE}"]
 
         for line in lines:
             resolved = oneline_parser(line, oneline_comment_style)
@@ -209,7 +336,7 @@ class SourceAnalyse:
                     MarkedContentType.need,
                     resolved.sub_type.value,
                 )
-                self.oneline_warnings.append(warning)
+                self.add_warning(warning)
                 row_offset += 1
                 continue
             yield resolved, row_offset
@@ -218,7 +345,6 @@ class SourceAnalyse:
     # @Extract one-line traceability needs from comments, IMPL_ONE_1, impl, [FE_DEF, FE_CMT]
     def extract_oneline_needs(
         self,
-        text: str,
         filepath: Path,
         tagged_scope: TreeSitterNode | None,
         src_comment: SourceComment,
@@ -227,14 +353,15 @@ class SourceAnalyse:
         row_offset = 0
         oneline_needs = []
         for resolved, row_offset in self.extract_oneline_need(
-            text, src_comment, oneline_comment_style
+            src_comment, oneline_comment_style
         ):
             lineno = src_comment.node.start_point.row + row_offset + 1
             remote_url = self.git_remote_url
-            if self.git_remote_url and self.git_commit_rev:
+            commit_rev = self.get_commit_rev(filepath)
+            if self.git_remote_url and commit_rev:
                 remote_url = utils.form_https_url(
                     self.git_remote_url,
-                    self.git_commit_rev,
+                    commit_rev,
                     self.project_path,
                     filepath,
                     lineno,
@@ -288,10 +415,11 @@ class SourceAnalyse:
             rst_text = extracted_rst["rst_text"]
         lineno = src_comment.node.start_point.row + extracted_rst["row_offset"] + 1
         remote_url = self.git_remote_url
-        if self.git_remote_url and self.git_commit_rev:
+        commit_rev = self.get_commit_rev(filepath)
+        if self.git_remote_url and commit_rev:
             remote_url = utils.form_https_url(
                 self.git_remote_url,
-                self.git_commit_rev,
+                commit_rev,
                 self.project_path,
                 filepath,
                 lineno,
@@ -316,29 +444,33 @@ class SourceAnalyse:
         )
 
     def extract_marked_content(self) -> None:
+        # the query may have fallen back to capturing all comments
+        markers = [marker.encode("utf-8") for marker in self.get_markers()]
         for src_comment in self.src_comments:
-            text = (
-                src_comment.node.text.decode("utf-8") if src_comment.node.text else None
-            )
-            if not text:
+            src_file = src_comment.source_file
+            if not src_file:
                 continue
-            filepath = (
-                src_comment.source_file.filepath if src_comment.source_file else None
-            )
-            if not filepath:
+            if src_file.src_buffer is not None and not utils.contains_any(
+                src_file.src_buffer,
+                markers,
+                src_comment.node.start_byte,
+                src_comment.node.end_byte,
+            ):
+                # neither decode nor split a comment without any marker
                 continue
+            text = src_comment.text
+            if not text:
+                continue
+            filepath = src_file.filepath
             tagged_scope: TreeSitterNode | None = utils.find_associated_scope(
                 src_comment.node, self.analyse_config.comment_type
             )
             if self.analyse_config.get_need_id_refs:
-                anchors = self.extract_anchors(
-                    text, filepath, tagged_scope, src_comment
-                )
+                anchors = self.extract_anchors(filepath, tagged_scope, src_comment)
                 self.need_id_refs.extend(anchors)
 
             if self.analyse_config.get_oneline_needs:
                 oneline_needs = self.extract_oneline_needs(
-                    text,
                     filepath,
                     tagged_scope,
                     src_comment,
@@ -353,13 +485,41 @@ class SourceAnalyse:
                     self.marked_rst.append(marked_rst)
 
     def merge_marked_content(self) -> None:
-        self.all_marked_content.extend(self.need_id_refs)
-        self.oneline_needs.sort(key=lambda x: x.source_map["start"]["row"])
-        self.all_marked_content.extend(self.oneline_needs)
-        self.all_marked_content.extend(self.marked_rst)
-        self.all_marked_content.sort(
-            key=lambda x: (x.filepath, x.source_map["start"]["row"])
+        """Merge the markers of all kinds, ordered by their file and row.
+
+        The markers of each kind are extracted file by file in the order of their rows,
+        so only the files are sorted and the sorted runs of each file are merged.
+        Markers of the same file and row are ordered need-id-refs, one-line needs,
+        marked RST.
+        """
+        # runs of the markers of one source file, per file path and kind
+        file_runs: dict[Path, tuple[list[list[MarkerType]], ...]] = {}
+        kinds: tuple[Sequence[MarkerType], ...] = (
+            self.need_id_refs,
+            self.oneline_needs,
+            self.marked_rst,
         )
+        for kind, markers in enumerate(kinds):
+            for _, run in groupby(markers, key=_get_source_file):
+                # the first marker of a run has the path of all of them
+                file_run = list(run)
+                runs = file_runs.setdefault(file_run[0].filepath, ([], [], []))
+                runs[kind].append(file_run)
+        # src-trace renders the one-line needs in this order
+        self.oneline_needs.sort(key=_get_row)
+
+        # a precomputed key per file is faster than comparing the paths
+        for filepath in sorted(file_runs, key=_path_sort_key):
+            ordered_runs = [
+                run for kind_runs in file_runs[filepath] for run in kind_runs
+            ]
+            if len(ordered_runs) == 1:
+                self.all_marked_content.extend(ordered_runs[0])
+            else:
+                # the stable sort finds the sorted runs and merges them
+                self.all_marked_content.extend(
+                    sorted(chain.from_iterable(ordered_runs), key=_get_row)
+                )
 
     def dump_marked_content(self, outdir: Path) -> None:
         output_path = outdir / "marked_content.json"
@@ -368,25 +528,77 @@ class SourceAnalyse:
         to_dump = [
             marked_content.to_dict() for marked_content in self.all_marked_content
         ]
-        with output_path.open("w") as f:
-            json.dump(to_dump, f)
+        with output_path.open("w", encoding=serialize.ENCODING) as f:
+            f.write(serialize.dumps(to_dump))
 
     def run(self) -> None:
         self.create_src_objects()
         self.extract_marked_content()
         self.merge_marked_content()
-        self._log_summary()
+        self._measure_process_peak_rss()
+        self._log_summary(self._counts())
+
+    def run_batches(self, output: TextIO) -> None:
+        """Analyse the source files in batches of ``batch_size`` files to bound the memory.
 
-    def _log_summary(self) -> None:
+        The marked content of each batch is written to ``output`` as JSON lines, one
+        marker per line and in the order of ``all_marked_content`` in :meth:`run`.
+        The files, comments and markers of a batch, and with them the parsed trees,
+        are released before the next batch is parsed, only the warnings are kept.
+        """
+        # the markers are sorted by their file, so are the batches
+        src_files = sorted(self.analyse_config.src_files, key=Path.absolute)
+        batch_size = self.analyse_config.batch_size or max(len(src_files), 1)
+        counts: Counter[str] = Counter()
+        for start in range(0, len(src_files), batch_size):
+            self.create_src_objects(src_files[start : start + batch_size])
+            self.extract_marked_content()
+            self.merge_marked_content()
+            for marker in self.all_marked_content:
+                output.write(serialize.dumps(marker.to_dict()))
+                output.write("\n")
+            counts.update(self._counts())
+            self._clear_batch()
+        self._measure_process_peak_rss()
+        self._log_summary(counts)
+
+    def _clear_batch(self) -> None:
+        self.src_files.clear()
+        self.src_comments.clear()
+        self.need_id_refs.clear()
+        self.oneline_needs.clear()
+        self.marked_rst.clear()
+        self.all_marked_content.clear()
+
+    def _measure_process_peak_rss(self) -> None:
+        # a high-water mark of the process, which includes the peaks within a batch
+        self.process_peak_rss = utils.get_process_peak_rss()
+
+    def _counts(self) -> Counter[str]:
+        return Counter(
+            files=len(self.src_files),
+            markers=len(self.all_marked_content),
+            marked_comments=len(self.src_comments),
+            oneline_needs=len(self.oneline_needs),
+            need_id_refs=len(self.need_id_refs),
+            marked_rst=len(self.marked_rst),
+        )
+
+    def _log_summary(self, counts: Counter[str]) -> None:
         """Emit a per-project marker (default-visible) plus a -v breakdown."""
         label = f"codelinks [{self.name}]" if self.name else "codelinks"
+        peak_rss = (
+            f", process peak RSS {_format_size(self.process_peak_rss)}"
+            if self.process_peak_rss is not None
+            else ""
+        )
         logger.info(
-            f"{label}: {_count(len(self.src_files), 'file')}, "
-            f"{_count(len(self.all_marked_content), 'marker')}"
+            f"{label}: {_count(counts['files'], 'file')}, "
+            f"{_count(counts['markers'], 'marker')}{peak_rss}"
         )
         logger.debug(
-            f"{label}: {_count(len(self.src_comments), 'comment')}, "
-            f"{_count(len(self.oneline_needs), 'oneline need')}, "
-            f"{_count(len(self.need_id_refs), 'id-ref')}, "
-            f"{_count(len(self.marked_rst), 'marked-rst block')}"
+            f"{label}: {_count(counts['marked_comments'], 'marked comment')}, "
+            f"{_count(counts['oneline_needs'], 'oneline need')}, "
+            f"{_count(counts['need_id_refs'], 'id-ref')}, "
+            f"{_count(counts['marked_rst'], 'marked-rst block')}"
         )
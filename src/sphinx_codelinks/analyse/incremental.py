@@ -0,0 +1,125 @@
+"""Incremental re-parsing of edited source files.
+
+For long-running uses (watch mode, language tooling, repeated Sphinx builds in one
+process), the tree and the comments of the most recently parsed files are kept. When
+the content of a file changes, the edit between the old and the new content is applied
+to the old tree, so that tree-sitter only re-parses the edited part and re-uses the
+rest of the old tree.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from tree_sitter import Node as TreeSitterNode
+from tree_sitter import Parser, Point, Query, QueryCursor, Tree
+
+
+@dataclass
+class SourceEdit:
+    """A single edit replacing ``src[start_byte:old_end_byte]`` by ``new[start_byte:new_end_byte]``."""
+
+    start_byte: int
+    old_end_byte: int
+    new_end_byte: int
+
+    @property
+    def delta(self) -> int:
+        return self.new_end_byte - self.old_end_byte
+
+
+@dataclass
+class CachedTree:
+    src_string: bytes
+    tree: Tree
+    query: Query
+    comments: list[TreeSitterNode]
+
+
+def _common_prefix_length(old: bytes, new: bytes) -> int:
+    # binary search on slice comparisons, which run at memcmp speed
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[low:mid] == new[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix_length(old: bytes, new: bytes, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[len(old) - mid : len(old) - low] == new[len(new) - mid : len(new) - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def compute_edit(old: bytes, new: bytes) -> SourceEdit:
+    """Compute the smallest single edit which turns ``old`` into ``new``."""
+    prefix = _common_prefix_length(old, new)
+    suffix = _common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+    return SourceEdit(prefix, len(old) - suffix, len(new) - suffix)
+
+
+def _point(src_string: bytes, byte_offset: int) -> Point:
+    row = src_string.count(b"\n", 0, byte_offset)
+    column = byte_offset - (src_string.rfind(b"\n", 0, byte_offset) + 1)
+    return Point(row, column)
+
+
+def capture_comments(tree: Tree, query: Query) -> list[TreeSitterNode]:
+    """Capture all comments of a tree in the order of the source."""
+    comments = QueryCursor(query).captures(tree.root_node).get("comment", [])
+    return sorted(comments, key=lambda node: node.start_byte)
+
+
+class TreeCache:
+    """Keep the tree and the comments of parsed files for incremental re-parsing."""
+
+    def __init__(self, max_files: int) -> None:
+        """:param max_files: The number of files to keep, the least recently used
+        ones are evicted."""
+        self.max_files = max_files
+        self.trees: OrderedDict[Path, CachedTree] = OrderedDict()
+
+    def extract_comments(
+        self, filepath: Path, src_string: bytes, parser: Parser, query: Query
+    ) -> list[TreeSitterNode] | None:
+        """Get all comments of a file, re-using the result of its previous parse."""
+        cached = self.trees.get(filepath)
+        if cached is None or cached.query is not query:
+            tree = parser.parse(src_string)
+            comments = capture_comments(tree, query)
+        elif cached.src_string == src_string:
+            self.trees.move_to_end(filepath)
+            return cached.comments or None
+        else:
+            tree, comments = self._reparse(cached, src_string, parser, query)
+        self.trees[filepath] = CachedTree(src_string, tree, query, comments)
+        self.trees.move_to_end(filepath)
+        while len(self.trees) > self.max_files:
+            self.trees.popitem(last=False)
+        return comments or None
+
+    def _reparse(
+        self, cached: CachedTree, src_string: bytes, parser: Parser, query: Query
+    ) -> tuple[Tree, list[TreeSitterNode]]:
+        edit = compute_edit(cached.src_string, src_string)
+        old_tree = cached.tree
+        old_tree.edit(
+            start_byte=edit.start_byte,
+            old_end_byte=edit.old_end_byte,
+            new_end_byte=edit.new_end_byte,
+            start_point=_point(src_string, edit.start_byte),
+            old_end_point=_point(cached.src_string, edit.old_end_byte),
+            new_end_point=_point(src_string, edit.new_end_byte),
+        )
+        tree = parser.parse(src_string, old_tree)
+        # capturing the whole new tree runs in C, which is faster than re-locating
+        # the unchanged comments of the old tree one by one
+        return tree, capture_comments(tree, query)
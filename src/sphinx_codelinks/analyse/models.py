@@ -1,10 +1,16 @@
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import cached_property
+import hashlib
+import json
 from pathlib import Path
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 from tree_sitter import Node as TreeSitterNode
 
+from sphinx_codelinks.analyse.utils import SourceBuffer, find_scope_name
+from sphinx_codelinks.config import TaggedScopeFormat
+
 
 class MarkedContentType(str, Enum):
     need = "need"
@@ -17,11 +23,77 @@ class SourceComment:
         self.node: TreeSitterNode = node
         self.source_file: SourceFile | None = None
 
+    @cached_property
+    def text(self) -> str | None:
+        """The text of the comment, decoded once."""
+        node_text = self.node.text
+        return node_text.decode("utf-8") if node_text else None
+
+    @cached_property
+    def lines(self) -> list[str]:
+        """The lines of the comment including their line endings, split once."""
+        return (self.text or "").splitlines(keepends=True)
+
 
 class SourceFile:
-    def __init__(self, filepath: Path) -> None:
+    def __init__(
+        self,
+        filepath: Path,
+        src_buffer: SourceBuffer | None = None,
+        tagged_scope_format: TaggedScopeFormat = TaggedScopeFormat.text,
+    ) -> None:
         self.filepath: Path = filepath
+        # the normalized content of the file, which is searched for markers before
+        # the text of a comment is decoded
+        self.src_buffer = src_buffer
+        self.tagged_scope_format = tagged_scope_format
         self.src_comments: list[SourceComment] = []
+        self._texts: dict[tuple[int, int], str | None] = {}
+        self._summaries: dict[tuple[int, int], ScopeSummary] = {}
+
+    def get_text(self, node: TreeSitterNode) -> str | None:
+        """Get the text of a node, which is decoded only once per byte range.
+
+        Several markers share the same tagged scope, whose text is then only decoded
+        for the first one.
+        """
+        key = (node.start_byte, node.end_byte)
+        if key not in self._texts:
+            self._texts[key] = node.text.decode("utf-8") if node.text else None
+        return self._texts[key]
+
+    def get_summary(self, node: TreeSitterNode) -> "ScopeSummary":
+        """Summarize a tagged scope by its kind, name and position, once per byte range.
+
+        Neither the text of the scope is decoded, nor is it copied for the hash
+        if the content of the file is available.
+        """
+        key = (node.start_byte, node.end_byte)
+        summary = self._summaries.get(key)
+        if summary is None:
+            summary = self._summaries[key] = {
+                "type": node.type,
+                "name": find_scope_name(node),
+                "start": {
+                    "row": node.start_point.row,
+                    "column": node.start_point.column,
+                },
+                "end": {"row": node.end_point.row, "column": node.end_point.column},
+            }
+            if self.tagged_scope_format == TaggedScopeFormat.summary_hash:
+                content = (
+                    memoryview(self.src_buffer)[node.start_byte : node.end_byte]
+                    if self.src_buffer is not None
+                    else node.text or b""
+                )
+                summary["hash"] = hashlib.sha256(content).hexdigest()
+        return summary
+
+    def get_scope(self, node: TreeSitterNode) -> "str | ScopeSummary | None":
+        """Get a tagged scope in the configured format."""
+        if self.tagged_scope_format == TaggedScopeFormat.text:
+            return self.get_text(node)
+        return self.get_summary(node)
 
     def add_comment(self, comment: SourceComment) -> None:
         self.src_comments.append(comment)
@@ -42,6 +114,23 @@ class SourceMap(TypedDict):
     end: Position
 
 
+class ScopeSummary(TypedDict):
+    """A tagged scope written without its text."""
+
+    type: str
+    name: str | None
+    start: Position
+    end: Position
+    hash: NotRequired[str]
+
+
+def get_scope_text(tagged_scope: str | ScopeSummary | None) -> str | None:
+    """Get a tagged scope as text, a summary as its JSON text."""
+    if tagged_scope is None or isinstance(tagged_scope, str):
+        return tagged_scope
+    return json.dumps(tagged_scope)
+
+
 @dataclass
 class Metadata:
     filepath: Path
@@ -54,11 +143,18 @@ class Metadata:
     def to_dict(self) -> dict[str, str | int | list[str]]:
         obj = self.__dict__.copy()
         obj["filepath"] = str(self.filepath)
-        obj["tagged_scope"] = (
-            str(self.tagged_scope.text.decode("utf-8"))
-            if self.tagged_scope and self.tagged_scope.text
-            else None
-        )
+        if self.tagged_scope is None:
+            obj["tagged_scope"] = None
+        elif self.source_comment.source_file:
+            obj["tagged_scope"] = self.source_comment.source_file.get_scope(
+                self.tagged_scope
+            )
+        else:
+            obj["tagged_scope"] = (
+                self.tagged_scope.text.decode("utf-8")
+                if self.tagged_scope.text
+                else None
+            )
         obj["type"] = self.type.value
         del obj["source_comment"]
         return obj
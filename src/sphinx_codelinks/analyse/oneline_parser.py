@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 from enum import Enum
+from functools import cache
+import re
 
 from sphinx_codelinks.config import ESCAPE, UNIX_NEWLINE, OneLineCommentStyle
 
@@ -141,27 +143,65 @@ def custom_split(
     """
     if positions_list_str is None:
         positions_list_str = []
-    escape_chars = [delimiter, "[", "]", ESCAPE]
-    field = []  # a list of string for a field
-    fields: list[str] = []  # a list of string which contains
-    leading_escape = False
-    expect_closing_bracket = False
+    if len(delimiter) != 1:
+        # a delimiter is compared char by char, so a longer one never splits
+        delimiter = ""
+    if ESCAPE in string:
+        return _split_segments(string, delimiter, frozenset(positions_list_str))
+    # without escapes, only the delimiter and the brackets of list fields are special
+    bracket_idx = string.find("[") if positions_list_str else -1
+    if bracket_idx == -1:
+        return string.split(delimiter) if delimiter else [string]
+    # the fields before the one with the first bracket are split natively
+    field_start = string.rfind(delimiter, 0, bracket_idx) + 1 if delimiter else 0
+    fields = string[: field_start - 1].split(delimiter) if field_start else []
+    if max(positions_list_str) <= len(fields):
+        # the brackets are only in fields with type:str, where they are literals
+        return string.split(delimiter)
+    return _split_segments(
+        string, delimiter, frozenset(positions_list_str), fields, field_start
+    )
+
+
+@cache
+def _special_chars_pattern(delimiter: str) -> re.Pattern[str]:
+    return re.compile(f"[{re.escape(delimiter + '[]' + ESCAPE)}]")
+
+
+def _split_segments(
+    string: str,
+    delimiter: str,
+    positions_list_str: frozenset[int],
+    fields: list[str] | None = None,
+    pos: int = 0,
+) -> list[str]:
+    """Split ``string[pos:]``, copying the runs between special chars at once.
 
-    for char in string:
-        # +1 to locate the current field position
-        current_field_idx = len(fields) + 1
-        is_list_str_field = current_field_idx in positions_list_str
+    :param fields: The fields already split from ``string[:pos]``.
+    """
+    escape_chars = {delimiter, "[", "]", ESCAPE}
+    special_chars = _special_chars_pattern(delimiter)
+    field: list[str] = []  # the segments of the current field
+    if fields is None:
+        fields = []
+    # +1 to locate the current field position
+    is_list_str_field = len(fields) + 1 in positions_list_str
+    expect_closing_bracket = False
+    while (match := special_chars.search(string, pos)) is not None:
+        char_idx = match.start()
+        field.append(string[pos:char_idx])
+        char = string[char_idx]
+        pos = char_idx + 1
 
-        if leading_escape:
-            if char not in escape_chars:
+        if char == ESCAPE and not is_list_str_field:
+            if pos == len(string):
+                # a trailing escape has nothing to escape
+                break
+            if string[pos] not in escape_chars:
                 # leading escape is considered as a literal
                 field.append(ESCAPE)
-            field.append(char)
-            leading_escape = False
-            continue
-
-        if char == ESCAPE and not is_list_str_field:
-            leading_escape = True
+            field.append(string[pos])
+            pos += 1
             continue
 
         if char == delimiter:
@@ -171,6 +211,7 @@ def custom_split(
             else:
                 fields.append("".join(field))
                 field = []
+                is_list_str_field = len(fields) + 1 in positions_list_str
             continue
 
         if is_list_str_field:
@@ -180,6 +221,8 @@ def custom_split(
                 expect_closing_bracket = False
 
         field.append(char)
+    else:
+        field.append(string[pos:])
 
     # add last field
     fields.append("".join(field))
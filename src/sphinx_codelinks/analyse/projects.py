@@ -1,78 +1,229 @@
-import json
+from collections.abc import Iterator, Sequence
+from functools import partial
 from pathlib import Path
-from typing import cast
+import tempfile
+from typing import TextIO, cast
+from warnings import warn
 
+from sphinx_codelinks import serialize
 from sphinx_codelinks.analyse.analyse import (
     AnalyseWarning,
     AnalyseWarningType,
     SourceAnalyse,
+    WarningLimit,
 )
 from sphinx_codelinks.config import CodeLinksConfig, CodeLinksProjectConfigType
 from sphinx_codelinks.logger import get_logger
+from sphinx_codelinks.marked_content import dump_layout_1, dump_layout_2, write_digest
+from sphinx_codelinks.marker_index import INDEX_FILENAME, MarkerIndex
+from sphinx_codelinks.needextend_write import MarkedObjType
 
 logger = get_logger(__name__)
 
 
+def log_warning(warning: AnalyseWarning) -> None:
+    logger.warning(
+        f"Oneline parser warning in {warning.file_path}:{warning.lineno} "
+        f"- {warning.sub_type}: {warning.msg}",
+    )
+
+
 class AnalyseProjects:
-    warning_filepath: Path = Path("warnings") / "codelinks_warnings.json"
+    # one warning per line, written as the warnings are produced
+    warning_filepath: Path = Path("warnings") / "codelinks_warnings.jsonl"
+    # the JSON list of the warnings before 1.4.0, only written by the deprecated
+    # update_warnings() and dump_warnings()
+    legacy_warning_filepath: Path = Path("warnings") / "codelinks_warnings.json"
 
     def __init__(self, codelink_config: CodeLinksConfig) -> None:
         self.projects_configs: dict[str, CodeLinksProjectConfigType] = (
             codelink_config.projects
         )
         self.projects_analyse: dict[str, SourceAnalyse] = {}
+        # the marked content of the projects analysed in batches, as JSON lines
+        self.projects_spool: dict[str, TextIO] = {}
         self.warnings_path = codelink_config.outdir / AnalyseProjects.warning_filepath
+        self.warning_limit = WarningLimit(log_warning, codelink_config.max_warnings)
+        # the number of warnings written per project, in the order of the projects
+        self.warning_counts: dict[str, int] = {}
         self.outdir = codelink_config.outdir
 
     def run(self) -> None:
-        for project, config in self.projects_configs.items():
-            src_analyse = SourceAnalyse(config["analyse_config"], name=project)
-            src_analyse.run()
-            self.projects_analyse[project] = src_analyse
+        """Analyse the projects.
+
+        Their warnings are written to the warnings file and logged up to
+        ``max_warnings`` as they are produced, they are not kept.
+        """
+        if not self.warnings_path.parent.exists():
+            self.warnings_path.parent.mkdir(parents=True)
+        with self.warnings_path.open("w", encoding=serialize.ENCODING) as warnings_file:
+
+            def add_warning(project: str, warning: AnalyseWarning) -> None:
+                warnings_file.write(serialize.dumps(warning))
+                warnings_file.write("\n")
+                self.warning_counts[project] += 1
+                self.warning_limit(warning)
+
+            for project, config in self.projects_configs.items():
+                analyse_config = config["analyse_config"]
+                self.warning_counts[project] = 0
+                src_analyse = SourceAnalyse(
+                    analyse_config,
+                    name=project,
+                    warning_sink=partial(add_warning, project),
+                )
+                if analyse_config.batch_size:
+                    # only the spooled output of a batch outlives it
+                    spool = tempfile.TemporaryFile("w+", encoding=serialize.ENCODING)  # noqa: SIM115  # closed in close()
+                    self.projects_spool[project] = spool
+                    src_analyse.run_batches(spool)
+                else:
+                    src_analyse.run()
+                self.projects_analyse[project] = src_analyse
+        summary = self.warning_limit.summary()
+        if summary:
+            logger.warning(summary)
+
+    def close(self) -> None:
+        """Remove the spooled marked content of the projects analysed in batches."""
+        for spool in self.projects_spool.values():
+            spool.close()
+        self.projects_spool.clear()
+
+    def iter_marker_jsons(self, project: str) -> Iterator[str]:
+        """Iterate over the JSON texts of the markers of a project."""
+        spool = self.projects_spool.get(project)
+        if spool is None:
+            for marker in self.projects_analyse[project].all_marked_content:
+                yield serialize.dumps(marker.to_dict())
+            return
+        spool.seek(0)
+        for line in spool:
+            yield line.rstrip("\n")
 
-    def dump_markers(self) -> None:
+    def iter_marker_dicts(self, project: str) -> Iterator[MarkedObjType]:
+        """Iterate over the markers of a project as dumped."""
+        if project not in self.projects_spool:
+            for marker in self.projects_analyse[project].all_marked_content:
+                yield cast(MarkedObjType, marker.to_dict())
+            return
+        for marker_json in self.iter_marker_jsons(project):
+            yield cast(MarkedObjType, serialize.loads(marker_json))
+
+    def dump_markers(self, layout: int = 1) -> None:
+        """Dump the markers of all projects to ``marked_content.json``.
+
+        :param layout: 1 lists the full markers per project, 2 refers to the files
+            and scopes of the markers in tables per project.
+        """
         output_path = self.outdir / "marked_content.json"
         if not output_path.parent.exists():
             output_path.parent.mkdir(parents=True)
-        to_dump = {
-            project: [marker.to_dict() for marker in analyse.all_marked_content]
-            for project, analyse in self.projects_analyse.items()
-        }
-        with output_path.open("w") as f:
-            json.dump(to_dump, f)
+        if layout == 2:  # noqa: PLR2004  # the only other layout
+            with output_path.open("w", encoding=serialize.ENCODING) as f:
+                dump_layout_2(
+                    f,
+                    (
+                        (project, self.iter_marker_dicts(project))
+                        for project in self.projects_analyse
+                    ),
+                )
+            write_digest(output_path)
+            logger.debug(f"codelinks: marked content dumped to {output_path}")
+            return
+        with output_path.open("w", encoding=serialize.ENCODING) as f:
+            dump_layout_1(
+                f,
+                (
+                    (project, self.iter_marker_jsons(project))
+                    for project in self.projects_analyse
+                ),
+            )
+        write_digest(output_path)
         logger.debug(f"codelinks: marked content dumped to {output_path}")
 
+    def update_index(self) -> Path:
+        """Update the SQLite marker index in the output directory.
+
+        Only the files whose marked content changed since the last update are rewritten.
+        """
+        index_path = self.outdir / INDEX_FILENAME
+        if not index_path.parent.exists():
+            index_path.parent.mkdir(parents=True)
+        with MarkerIndex(index_path) as index:
+            for project, analyse in self.projects_analyse.items():
+                cnt_updated = index.update_project(
+                    project,
+                    [
+                        str(src_file.resolve())
+                        for src_file in analyse.analyse_config.src_files
+                    ],
+                    self.iter_marker_dicts(project),
+                )
+                logger.debug(
+                    f"codelinks [{project}]: {cnt_updated} files updated in {index_path}"
+                )
+        return index_path
+
+    @classmethod
+    def iter_warnings(cls, warnings_dir: Path) -> Iterator[AnalyseWarning]:
+        """Iterate over the warnings written to the given directory one by one."""
+        warnings_path = warnings_dir / cls.warning_filepath
+        if not warnings_path.exists():
+            return
+        with warnings_path.open("r", encoding=serialize.ENCODING) as f:
+            for line in f:
+                yield AnalyseWarning(**cast(AnalyseWarningType, serialize.loads(line)))
+
     @classmethod
     def load_warnings(cls, warnings_dir: Path) -> list[AnalyseWarning] | None:
         """Load warnings from the given path.
 
         It mainly used for other apps or users to load warnings files directly.
+        The JSON list of the warnings written before 1.4.0 is loaded as well.
         """
-        warnings_path = warnings_dir / cls.warning_filepath
-        if not warnings_path.exists():
+        if (warnings_dir / cls.warning_filepath).exists():
+            return list(cls.iter_warnings(warnings_dir))
+        legacy_path = warnings_dir / cls.legacy_warning_filepath
+        if not legacy_path.exists():
             return None
-        with warnings_path.open("r") as f:
-            # load the json file and convert to AnalyseWarning]
-            warnings = json.load(f)
-        loaded_warnings: list[AnalyseWarning] = [
-            AnalyseWarning(**warning) for warning in warnings
-        ]
-
-        return loaded_warnings
+        with legacy_path.open("r", encoding=serialize.ENCODING) as f:
+            legacy_warnings = cast(list[AnalyseWarningType], serialize.loads(f.read()))
+        return [AnalyseWarning(**warning) for warning in legacy_warnings]
 
     def update_warnings(self) -> None:
-        current_warnings: list[AnalyseWarningType] = [
-            cast(AnalyseWarningType, _warning.__dict__)
-            for analyse in self.projects_analyse.values()
-            for _warning in analyse.oneline_warnings
-        ]
-        self.dump_warnings(current_warnings)
-
-    def dump_warnings(self, warnings: list[AnalyseWarningType]) -> None:
-        if not self.warnings_path.parent.exists():
-            self.warnings_path.parent.mkdir(parents=True)
-        with self.warnings_path.open("w") as f:
-            json.dump(
-                warnings,
-                f,
-            )
+        """Write the warnings of the analysis as a JSON list to the legacy file.
+
+        .. deprecated:: 1.4.0
+           :meth:`run` writes the warnings to ``codelinks_warnings.jsonl``.
+        """
+        warn(
+            "update_warnings() is deprecated, run() writes the warnings to "
+            f"{self.warning_filepath}",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        self._dump_legacy_warnings(list(self.iter_warnings(self.outdir)))
+
+    def dump_warnings(
+        self, warnings: Sequence[AnalyseWarning | AnalyseWarningType]
+    ) -> None:
+        """Write the given warnings as a JSON list to the legacy file.
+
+        .. deprecated:: 1.4.0
+           :meth:`run` writes the warnings to ``codelinks_warnings.jsonl``.
+        """
+        warn(
+            "dump_warnings() is deprecated, run() writes the warnings to "
+            f"{self.warning_filepath}",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        self._dump_legacy_warnings(warnings)
+
+    def _dump_legacy_warnings(
+        self, warnings: Sequence[AnalyseWarning | AnalyseWarningType]
+    ) -> None:
+        legacy_path = self.outdir / self.legacy_warning_filepath
+        legacy_path.parent.mkdir(parents=True, exist_ok=True)
+        legacy_path.write_text(serialize.dumps(warnings), encoding=serialize.ENCODING)
@@ -0,0 +1,186 @@
+"""Partition of the source files of the projects for a sharded analysis.
+
+``codelinks analyse --shard I/N`` analyses the I-th of N disjoint parts of the
+discovered files of each project and writes a manifest next to its outputs, which
+``codelinks merge`` combines (see :mod:`sphinx_codelinks.shard_merge`). All nodes
+compute the same partition from the same checkout, without any coordination.
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict, cast
+
+from sphinx_codelinks import serialize
+
+if TYPE_CHECKING:
+    from sphinx_codelinks.analyse.projects import AnalyseProjects
+
+MANIFEST_FILENAME = "codelinks_shard.json"
+"""File in the output directory of a shard which describes its outputs."""
+
+
+class ShardStrategy(str, Enum):
+    hash = "hash"
+    """The files are assigned by a hash of their path relative to the source directory."""
+    size = "size"
+    """The files are assigned to the shard with the least bytes so far, largest first."""
+
+
+class ShardProjectType(TypedDict):
+    warnings: int
+    """The number of lines of the project in the warnings file."""
+    batched: bool
+    """Whether the project is analysed in batches, which orders its warnings by path."""
+
+
+class ShardManifestType(TypedDict):
+    shard: str
+    strategy: str
+    projects: dict[str, ShardProjectType]
+
+
+class ShardError(Exception):
+    """The outputs of the shards cannot be merged."""
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The I-th of N parts of the files of each project, counted from 1."""
+
+    index: int
+    count: int
+    strategy: ShardStrategy = ShardStrategy.hash
+
+    @classmethod
+    def parse(cls, text: str, strategy: ShardStrategy = ShardStrategy.hash) -> "Shard":
+        """Parse a shard given as ``I/N``.
+
+        :raises ValueError: if the text is not of this form or I is not in 1..N.
+        """
+        index, sep, count = text.partition("/")
+        if not sep or not index.strip().isdigit() or not count.strip().isdigit():
+            raise ValueError(f"Shard {text!r} is not of the form I/N, e.g. 1/4")
+        shard = cls(int(index), int(count), strategy)
+        if not 1 <= shard.index <= shard.count:
+            raise ValueError(f"Shard index of {text!r} is not between 1 and {count}")
+        return shard
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def _relative_key(src_file: Path, src_dir: Path) -> str:
+    """The path of a file relative to the source directory, the same on all nodes."""
+    return Path(os.path.relpath(src_file, src_dir)).as_posix()
+
+
+class ShardSelector:
+    """Selects the files of a shard, project by project in the order of the config.
+
+    The bytes assigned to each shard by the size strategy are carried over to the
+    next project, so that many small projects are spread over the shards as well.
+    """
+
+    def __init__(self, shard: Shard) -> None:
+        self.shard = shard
+        self.loads = [0] * shard.count
+
+    def select(self, src_files: list[Path], src_dir: Path) -> list[Path]:
+        """Select the files of the shard, keeping their order."""
+        if self.shard.strategy == ShardStrategy.size:
+            selected = self._select_by_size(src_files, src_dir)
+        else:
+            selected = self._select_by_hash(src_files, src_dir)
+        return [src_file for src_file in src_files if src_file in selected]
+
+    def _select_by_hash(self, src_files: list[Path], src_dir: Path) -> set[Path]:
+        selected = set()
+        for src_file in src_files:
+            digest = hashlib.blake2b(
+                _relative_key(src_file, src_dir).encode("utf-8"), digest_size=8
+            ).digest()
+            if int.from_bytes(digest) % self.shard.count == self.shard.index - 1:
+                selected.add(src_file)
+        return selected
+
+    def _select_by_size(self, src_files: list[Path], src_dir: Path) -> set[Path]:
+        sized = sorted(
+            (-src_file.stat().st_size, _relative_key(src_file, src_dir), src_file)
+            for src_file in src_files
+        )
+        selected = set()
+        for neg_size, _, src_file in sized:
+            # the first of the least loaded shards, so that all nodes agree
+            idx = self.loads.index(min(self.loads))
+            self.loads[idx] -= neg_size
+            if idx == self.shard.index - 1:
+                selected.add(src_file)
+        return selected
+
+
+def write_manifest(
+    outdir: Path, shard: Shard, analyse_projects: "AnalyseProjects"
+) -> Path:
+    """Write the manifest of a shard to its output directory."""
+    manifest: ShardManifestType = {
+        "shard": str(shard),
+        "strategy": shard.strategy.value,
+        "projects": {
+            project: {
+                "warnings": analyse_projects.warning_counts[project],
+                "batched": bool(config["analyse_config"].batch_size),
+            }
+            for project, config in analyse_projects.projects_configs.items()
+        },
+    }
+    manifest_path = outdir / MANIFEST_FILENAME
+    manifest_path.write_text(serialize.dumps(manifest), encoding=serialize.ENCODING)
+    return manifest_path
+
+
+def project_modes(manifest: ShardManifestType) -> list[tuple[str, bool]]:
+    return [
+        (project, project_manifest["batched"])
+        for project, project_manifest in manifest["projects"].items()
+    ]
+
+
+def load_manifests(shard_dirs: list[Path]) -> list[tuple[Path, ShardManifestType]]:
+    """Load the manifests of the shards with their directories, ordered by their index.
+
+    :raises ShardError: if the shards are not all shards of the same analysis.
+    """
+    manifests: dict[int, tuple[Path, ShardManifestType]] = {}
+    counts: set[int] = set()
+    for shard_dir in shard_dirs:
+        manifest_path = shard_dir / MANIFEST_FILENAME
+        try:
+            manifest = cast(
+                ShardManifestType,
+                serialize.loads(manifest_path.read_text(encoding=serialize.ENCODING)),
+            )
+            shard = Shard.parse(manifest["shard"], ShardStrategy(manifest["strategy"]))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise ShardError(f"Invalid shard manifest {manifest_path}: {e}") from e
+        counts.add(shard.count)
+        if len(counts) > 1:
+            raise ShardError(f"The shards are of different counts: {sorted(counts)}")
+        if shard.index in manifests:
+            raise ShardError(f"Shard {shard} is given more than once")
+        manifests[shard.index] = (shard_dir, manifest)
+    missing = sorted(set(range(1, counts.pop() + 1)) - manifests.keys())
+    if missing:
+        raise ShardError(f"Missing shards: {', '.join(map(str, missing))}")
+    ordered = [manifests[idx] for idx in sorted(manifests)]
+    _, first = ordered[0]
+    for _, manifest in ordered[1:]:
+        if manifest["strategy"] != first["strategy"]:
+            raise ShardError("The shards are partitioned by different strategies")
+        if project_modes(manifest) != project_modes(first):
+            raise ShardError(
+                f"Shard {manifest['shard']} analysed other projects than shard 1"
+            )
+    return ordered
@@ -1,11 +1,20 @@
-from collections.abc import ByteString, Callable
+import codecs
+from collections.abc import Sequence, Set
 import configparser
+import contextlib
+from functools import cache, cached_property
+import mmap
+import os
 from pathlib import Path
-from typing import TypedDict
-from urllib.request import pathname2url
-
-from giturlparse import parse  # type: ignore[import-untyped]
-from tree_sitter import Language, Parser, Point, Query, QueryCursor
+import posixpath
+import re
+import shutil
+import subprocess
+import sys
+import threading
+from typing import TypedDict, cast
+
+from tree_sitter import Language, Parser, Query, QueryCursor, QueryError
 from tree_sitter import Node as TreeSitterNode
 
 from sphinx_codelinks.config import UNIX_NEWLINE, CommentCategory
@@ -53,27 +62,30 @@ GIT_HOST_URL_TEMPLATE = {
     "gitlab": "https://gitlab.com/{owner}/{repo}/-/blob/{rev}/{path}#L{lineno}",
 }
 
-PYTHON_QUERY = """
-                ; Match comments
-                (comment) @comment
-
-                ; Match docstrings inside modules, functions, or classes
-                (module (expression_statement (string)) @comment)
-                (function_definition (block (expression_statement (string)) @comment))
-                (class_definition (block (expression_statement (string)) @comment))
-            """
-CPP_QUERY = """(comment) @comment"""
-C_SHARP_QUERY = """(comment) @comment"""
-YAML_QUERY = """(comment) @comment"""
-RUST_QUERY = """
-    (line_comment) @comment
-    (block_comment) @comment
-"""
+# the top-level patterns of the comment queries, each captures ``@comment``
+PYTHON_QUERY_PATTERNS = (
+    # comments
+    "(comment) @comment",
+    # docstrings inside modules, functions, or classes
+    "(module (expression_statement (string)) @comment)",
+    "(function_definition (block (expression_statement (string)) @comment))",
+    "(class_definition (block (expression_statement (string)) @comment))",
+)
+CPP_QUERY_PATTERNS = ("(comment) @comment",)
+C_SHARP_QUERY_PATTERNS = ("(comment) @comment",)
+YAML_QUERY_PATTERNS = ("(comment) @comment",)
+RUST_QUERY_PATTERNS = ("(line_comment) @comment", "(block_comment) @comment")
 # @Go comment query for tree-sitter, IMPL_GO_3, impl, [FE_GO]
-GO_QUERY = """
-    (comment) @comment
-"""
-JSONC_QUERY = """(comment) @comment"""
+GO_QUERY_PATTERNS = ("(comment) @comment",)
+JSONC_QUERY_PATTERNS = ("(comment) @comment",)
+
+PYTHON_QUERY = "\n".join(PYTHON_QUERY_PATTERNS)
+CPP_QUERY = "\n".join(CPP_QUERY_PATTERNS)
+C_SHARP_QUERY = "\n".join(C_SHARP_QUERY_PATTERNS)
+YAML_QUERY = "\n".join(YAML_QUERY_PATTERNS)
+RUST_QUERY = "\n".join(RUST_QUERY_PATTERNS)
+GO_QUERY = "\n".join(GO_QUERY_PATTERNS)
+JSONC_QUERY = "\n".join(JSONC_QUERY_PATTERNS)
 
 # JSON value node types that can be associated with a comment.
 JSON_STRUCTURE_TYPES = {
@@ -88,84 +100,213 @@ JSON_STRUCTURE_TYPES = {
 }
 
 
-def is_text_file(filepath: Path, sample_size: int = 2048) -> bool:
-    """Return True if file is likely text, False if binary."""
+# The content of a source file, large files are memory-mapped instead of read
+SourceBuffer = bytes | mmap.mmap
+
+
+def load_src_buffer(filepath: Path, mmap_threshold: int) -> SourceBuffer:
+    """Read a source file, or memory-map it if it is larger than ``mmap_threshold`` bytes.
+
+    A mapped file is paged in by the OS while it is parsed, instead of being copied
+    into the memory of the process first.
+    """
+    with filepath.open("rb") as f:
+        if os.fstat(f.fileno()).st_size <= mmap_threshold:
+            return f.read()
+        # the mapping stays valid after the file is closed
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def get_process_peak_rss() -> int | None:
+    """Get the peak resident set size of the process so far in bytes.
+
+    Without the ``resource`` module, i.e. on Windows, the peak working set is taken
+    from psutil if it is installed, otherwise None is returned.
+    """
     try:
-        with filepath.open("rb") as f:
-            chunk = f.read(sample_size)
-        # Quick binary heuristic: null byte present
-        if b"\x00" in chunk:
-            return False
-        # Try UTF-8 decode on the sample
-        chunk.decode("utf-8")
-        return True
+        import resource  # noqa: PLC0415  # not available on Windows
+    except ImportError:
+        try:
+            import psutil  # noqa: PLC0415
+        except ImportError:
+            return None
+        peak_wset = getattr(psutil.Process().memory_info(), "peak_wset", None)
+        return cast(int | None, peak_wset)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in bytes on macOS, in kibibytes on Linux and the other BSDs
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def is_text(src_bytes: SourceBuffer, sample_size: int = 2048) -> bool:
+    """Return True if the content is likely text, False if binary.
+
+    Only the first ``sample_size`` bytes are checked.
+    """
+    # Quick binary heuristic: null byte present
+    if src_bytes.find(b"\x00", 0, sample_size) != -1:
+        return False
+    # Try UTF-8 decode on the sample, a character cut at its end is not an error
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(src_bytes[:sample_size])
     except UnicodeDecodeError:
         return False
+    return True
+
+
+def normalize_line_endings(src_bytes: SourceBuffer) -> SourceBuffer:
+    """Normalize all line endings to Unix LF.
+
+    The content is only copied if it has carriage returns, and only once for the
+    usual Windows line endings.
+    """
+    if src_bytes.find(b"\r") == -1:
+        return src_bytes
+    # the slice of a memory-mapped file is the only copy of it
+    normalized = src_bytes[:].replace(b"\r\n", b"\n")
+    if normalized.find(b"\r") == -1:
+        return normalized
+    return normalized.replace(b"\r", b"\n")
+
+
+def contains_any(
+    src_bytes: SourceBuffer,
+    markers: list[bytes],
+    start_byte: int = 0,
+    end_byte: int | None = None,
+) -> bool:
+    """Check whether any of the markers occurs in the content or a byte range of it."""
+    if end_byte is None:
+        end_byte = len(src_bytes)
+    return any(src_bytes.find(marker, start_byte, end_byte) != -1 for marker in markers)
+
+
+QUERY_PATTERNS = {
+    CommentType.cpp: CPP_QUERY_PATTERNS,
+    CommentType.python: PYTHON_QUERY_PATTERNS,
+    CommentType.cs: C_SHARP_QUERY_PATTERNS,
+    CommentType.yaml: YAML_QUERY_PATTERNS,
+    CommentType.rust: RUST_QUERY_PATTERNS,
+    CommentType.go: GO_QUERY_PATTERNS,
+    CommentType.jsonc: JSONC_QUERY_PATTERNS,
+}
 
 
 # @Tree-sitter parser initialization for multiple languages, IMPL_LANG_1, impl, [FE_C_SUPPORT, FE_CPP, FE_PY, FE_YAML, FE_RUST, FE_GO, FE_JSONC]
-def init_tree_sitter(comment_type: CommentType) -> tuple[Parser, Query]:
+@cache
+def get_language_query(comment_type: CommentType) -> tuple[Language, Query]:
+    """Load the grammar and compile the comment query of a comment type.
+
+    Both are immutable, so they are cached and shared for the whole process.
+    """
     if comment_type == CommentType.cpp:
         import tree_sitter_cpp  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_cpp.language())
-        query = Query(parsed_language, CPP_QUERY)
     elif comment_type == CommentType.python:
         import tree_sitter_python  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_python.language())
-        query = Query(parsed_language, PYTHON_QUERY)
     elif comment_type == CommentType.cs:
         import tree_sitter_c_sharp  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_c_sharp.language())
-        query = Query(parsed_language, C_SHARP_QUERY)
     elif comment_type == CommentType.yaml:
         import tree_sitter_yaml  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_yaml.language())
-        query = Query(parsed_language, YAML_QUERY)
     elif comment_type == CommentType.rust:
         import tree_sitter_rust  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_rust.language())
-        query = Query(parsed_language, RUST_QUERY)
     elif comment_type == CommentType.go:
         import tree_sitter_go  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_go.language())
-        query = Query(parsed_language, GO_QUERY)
     elif comment_type == CommentType.jsonc:
         import tree_sitter_json  # noqa: PLC0415
 
         parsed_language = Language(tree_sitter_json.language())
-        query = Query(parsed_language, JSONC_QUERY)
     else:
         raise ValueError(f"Unsupported comment style: {comment_type}")
-    parser = Parser(parsed_language)
-    return parser, query
+    query_source = "\n".join(QUERY_PATTERNS[comment_type])
+    return parsed_language, Query(parsed_language, query_source)
+
 
+def add_marker_predicate(patterns: Sequence[str], markers: Sequence[str]) -> str:
+    """Restrict each pattern of a query to the comments containing one of ``markers``.
 
-def wrap_read_callable_point(
-    src_string: ByteString,
-) -> Callable[[int, Point], ByteString]:
-    def read_callable_byte_offset(byte_offset: int, _: Point) -> ByteString:
-        return src_string[byte_offset : byte_offset + 1]
+    The ``#match?`` predicate is evaluated by tree-sitter while matching, so comments
+    without any marker are never returned to the caller.
+    """
+    regex = "|".join(re.escape(marker) for marker in markers)
+    literal = regex.replace("\\", "\\\\").replace('"', '\\"')
+    return "\n".join(
+        f'({pattern} (#match? @comment "{literal}"))' for pattern in patterns
+    )
 
-    return read_callable_byte_offset
+
+@cache
+def get_marker_query(comment_type: CommentType, markers: tuple[str, ...]) -> Query:
+    """Compile the comment query of a comment type restricted to ``markers``.
+
+    Without markers, or if the restricted query cannot be compiled, the query
+    capturing all comments is returned, whose comments are filtered later on.
+    """
+    parsed_language, query = get_language_query(comment_type)
+    if not markers:
+        return query
+    try:
+        return Query(
+            parsed_language,
+            add_marker_predicate(QUERY_PATTERNS[comment_type], markers),
+        )
+    except QueryError as err:
+        logger.debug(f"Falling back to the query of all comments: {err}")
+        return query
+
+
+_thread_local = threading.local()
+
+
+def get_parser(comment_type: CommentType) -> Parser:
+    """Get the parser of a comment type for the current thread.
+
+    A parser must not be used by several threads at the same time,
+    so each thread (and each worker process) keeps its own parsers for reuse.
+    """
+    parsers: dict[CommentType, Parser] | None = getattr(_thread_local, "parsers", None)
+    if parsers is None:
+        parsers = _thread_local.parsers = {}
+    parser = parsers.get(comment_type)
+    if parser is None:
+        parsed_language, _ = get_language_query(comment_type)
+        parser = parsers[comment_type] = Parser(parsed_language)
+    return parser
+
+
+def init_tree_sitter(
+    comment_type: CommentType, markers: Sequence[str] = ()
+) -> tuple[Parser, Query]:
+    """Get the parser and the comment query of a comment type, both reused across analyses.
+
+    With ``markers``, the query only captures the comments containing one of them.
+    """
+    return get_parser(comment_type), get_marker_query(comment_type, tuple(markers))
 
 
 # @Comment extraction from source code using tree-sitter, IMPL_EXTR_1, impl, [FE_DEF]
 def extract_comments(
-    src_string: ByteString, parser: Parser, query: Query
+    src_string: SourceBuffer, parser: Parser, query: Query
 ) -> list[TreeSitterNode] | None:
-    """Get all comments from source files by tree-sitter."""
-    read_point_fn = wrap_read_callable_point(src_string)
-    tree = parser.parse(read_point_fn)
+    """Get all comments from source files by tree-sitter in the order of the source."""
+    # the parser reads the buffer in place, which also works for a mapped file
+    tree = parser.parse(src_string)  # type: ignore[arg-type]  # any buffer is accepted
     query_cursor = QueryCursor(query)
     captures: dict[str, list[TreeSitterNode]] = query_cursor.captures(tree.root_node)
 
-    return captures.get("comment")
+    comments = captures.get("comment")
+    # the captures are grouped by the query pattern which matched them
+    return sorted(comments, key=lambda node: node.start_byte) if comments else None
 
 
 def find_enclosing_scope(
@@ -335,26 +476,161 @@ def find_associated_scope(
     return associated_scope
 
 
+# fields of scope nodes holding their name: declarations name it, C and C++ declarators
+# nest it, Rust impl blocks have a type, and YAML and JSON pairs have a key
+SCOPE_NAME_FIELDS = ("name", "declarator", "type", "key")
+
+
+def find_scope_name(node: TreeSitterNode) -> str | None:
+    """Find the name of a scope, e.g. of a function or class, without decoding the scope."""
+    for field_name in SCOPE_NAME_FIELDS:
+        name_node = node.child_by_field_name(field_name)
+        if name_node is None:
+            continue
+        # the declarator of a function declarator, pointer declarator ... is the name
+        while (declarator := name_node.child_by_field_name("declarator")) is not None:
+            name_node = declarator
+        return name_node.text.decode("utf-8") if name_node.text else None
+    # a Go type declaration names its type specs
+    for child in node.named_children:
+        name_node = child.child_by_field_name("name")
+        if name_node is not None:
+            return name_node.text.decode("utf-8") if name_node.text else None
+    return None
+
+
+class GitRepository:
+    """The metadata of a git repository, each file of it is read at most once.
+
+    The git directory is ``.git`` of the work tree, or the one which the ``.git`` file
+    of a linked worktree or a submodule points to. The config and the refs are in the
+    common directory, which the ``commondir`` file of a linked worktree points to.
+    """
+
+    def __init__(self, root: Path, git_dir: Path) -> None:
+        self.root = root
+        self.git_dir = git_dir
+        commondir_path = git_dir / "commondir"
+        if commondir_path.is_file():
+            self.common_dir = (git_dir / commondir_path.read_text().strip()).resolve()
+        else:
+            self.common_dir = git_dir
+        # the commits of the resolved refs, None for those which do not exist
+        self.refs: dict[str, str | None] = {}
+        # the last-change commits of the files by path, per walked path of the history,
+        # and whether the whole history of the path was walked
+        self.last_change_revs: dict[str, tuple[dict[str, str], bool]] = {}
+
+    @cached_property
+    def config(self) -> configparser.ConfigParser | None:
+        config_path = self.common_dir / "config"
+        if not config_path.exists():
+            return None
+        config = configparser.ConfigParser(allow_no_value=True, strict=False)
+        config.read(config_path)
+        return config
+
+    @cached_property
+    def head(self) -> str | None:
+        head_path = self.git_dir / "HEAD"
+        if not head_path.exists():
+            return None
+        return head_path.read_text().strip()
+
+    @cached_property
+    def packed_refs(self) -> dict[str, str]:
+        """The commits of the refs in ``packed-refs``, by ref name."""
+        packed_refs: dict[str, str] = {}
+        packed_refs_path = self.common_dir / "packed-refs"
+        if not packed_refs_path.exists():
+            return packed_refs
+        for line in packed_refs_path.read_text().splitlines():
+            # the header and the peeled commits of annotated tags are skipped
+            if not line or line.startswith(("#", "^")):
+                continue
+            commit, _, ref = line.partition(" ")
+            packed_refs[ref.strip()] = commit
+        return packed_refs
+
+    def resolve_ref(self, ref: str) -> str | None:
+        """Get the commit of a ref, from its loose ref file or ``packed-refs``."""
+        if ref not in self.refs:
+            ref_path = self.common_dir / ref
+            if ref_path.exists():
+                self.refs[ref] = ref_path.read_text().strip()
+            else:
+                self.refs[ref] = self.packed_refs.get(ref)
+        return self.refs[ref]
+
+
+# the located git roots by resolved directory, and the repositories by git root
+_git_roots: dict[Path, Path | None] = {}
+_git_repositories: dict[Path, GitRepository] = {}
+
+
+def clear_git_cache() -> None:
+    """Forget the located git roots and the read metadata of the repositories."""
+    _git_roots.clear()
+    _git_repositories.clear()
+
+
+def _find_git_dir(git_root: Path) -> Path | None:
+    """Find the git directory of a work tree, following a ``.git`` file."""
+    dot_git = git_root / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    if dot_git.is_file():
+        content = dot_git.read_text().strip()
+        if content.startswith("gitdir:"):
+            return (git_root / content.split(":", 1)[1].strip()).resolve()
+    return None
+
+
+def get_git_repository(git_root: Path) -> GitRepository:
+    """Get the metadata of the git repository of a work tree, shared per process."""
+    repository = _git_repositories.get(git_root)
+    if repository is None:
+        git_dir = _find_git_dir(git_root) or git_root / ".git"
+        repository = GitRepository(git_root, git_dir)
+        _git_repositories[git_root] = repository
+    return repository
+
+
 def locate_git_root(src_dir: Path) -> Path | None:
     """Traverse upwards to find git root."""
     current = src_dir.resolve()
-    parents = list(current.parents)
-    parents.append(current)
-    for parent in parents:
-        if (parent / ".git").exists() and (parent / ".git").is_dir():
-            return parent
-    logger.warning(
-        f"git root is not found in the parent of {src_dir}",
-        subtype="git_root",
-        location=str(src_dir),
-    )
-    return None
+    if current not in _git_roots:
+        visited = []
+        git_root = None
+        for parent in (current, *current.parents):
+            if parent in _git_roots:
+                git_root = _git_roots[parent]
+                break
+            visited.append(parent)
+            git_dir = _find_git_dir(parent)
+            if git_dir is not None:
+                git_root = parent
+                _git_repositories.setdefault(parent, GitRepository(parent, git_dir))
+                break
+        # the directories in between are in the same work tree
+        for directory in visited:
+            _git_roots[directory] = git_root
+    git_root = _git_roots[current]
+    if git_root is None:
+        logger.warning(
+            f"git root is not found in the parent of {src_dir}",
+            subtype="git_root",
+            location=str(src_dir),
+        )
+    return git_root
 
 
 def get_remote_url(git_root: Path, remote_name: str = "origin") -> str | None:
     """Get remote url from .git/config."""
-    config_path = git_root / ".git" / "config"
-    if not config_path.exists():
+    repository = get_git_repository(git_root)
+    config_path = repository.common_dir / "config"
+    config = repository.config
+    if config is None:
         logger.warning(
             f"{config_path} does not exist",
             subtype="git_config",
@@ -362,8 +638,6 @@ def get_remote_url(git_root: Path, remote_name: str = "origin") -> str | None:
         )
         return None
 
-    config = configparser.ConfigParser(allow_no_value=True, strict=False)
-    config.read(config_path)
     section = f'remote "{remote_name}"'
     if section in config and "url" in config[section]:
         url: str = config[section]["url"]
@@ -378,34 +652,144 @@ def get_remote_url(git_root: Path, remote_name: str = "origin") -> str | None:
 
 def get_current_rev(git_root: Path) -> str | None:
     """Get current commit rev from .git/HEAD."""
-    head_path = git_root / ".git" / "HEAD"
-    if not head_path.exists():
+    repository = get_git_repository(git_root)
+    head_content = repository.head
+    if head_content is None:
+        head_path = repository.git_dir / "HEAD"
         logger.warning(
             f"{head_path} does not exist",
             subtype="git_head",
             location=str(head_path),
         )
         return None
-    head_content = head_path.read_text().strip()
     if not head_content.startswith("ref: "):
         # Detached HEAD (e.g. CI checkouts): .git/HEAD holds the commit SHA
         # directly, which is exactly the rev we want.
         return head_content
 
-    ref_path = git_root / ".git" / head_content.split(":", 1)[1].strip()
-    if not ref_path.exists():
+    ref = head_content.split(":", 1)[1].strip()
+    rev = repository.resolve_ref(ref)
+    if rev is None:
+        ref_path = repository.common_dir / ref
         logger.warning(
             f"{ref_path} does not exist",
             subtype="git_ref",
             location=str(ref_path),
         )
+    return rev
+
+
+def _walk_last_changes(
+    git_root: Path, pathspec: str, paths: set[str]
+) -> tuple[dict[str, str], bool] | None:
+    """Walk the history of a path until the last change of all given files is found.
+
+    Get the commits by path relative to the git root, and whether the whole history
+    was walked. None if git failed.
+    """
+    git_path = shutil.which("git")
+    if git_path is None:
+        logger.warning(
+            "git is not found, the remote URLs link to the current commit",
+            subtype="git_log",
+        )
+        return None
+    command = [
+        git_path,
+        "-C",
+        str(git_root),
+        "-c",
+        "core.quotepath=off",
+        "log",
+        # a commit starts with a line which no path starts with
+        "--format=%x00%H",
+        "--name-only",
+        "--no-renames",
+        "--relative",
+        "--",
+        pathspec,
+    ]
+    revs: dict[str, str] = {}
+    remaining = set(paths)
+    rev = ""
+    with subprocess.Popen(  # noqa: S603
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        encoding="utf-8",
+        errors="surrogateescape",
+    ) as process:
+        if process.stdout is not None:
+            for line in process.stdout:
+                path = line.rstrip("\n")
+                if path.startswith("\0"):
+                    rev = path[1:]
+                elif path and path not in revs:
+                    # the newest commit which changed the file comes first
+                    revs[path] = rev
+                    remaining.discard(path)
+                    if not remaining:
+                        # the older history is not needed
+                        process.terminate()
+                        break
+    if remaining and process.returncode != 0:
+        logger.warning(
+            f"git log failed in {git_root}, the remote URLs link to the current commit",
+            subtype="git_log",
+            location=str(git_root),
+        )
         return None
-    return ref_path.read_text().strip()
+    return revs, bool(remaining)
+
+
+def _find_walked_revs(
+    repository: GitRepository, pathspec: str, paths: Set[str]
+) -> dict[str, str] | None:
+    """Find a walk of the history which found the last commits of the given files."""
+    for walked_path, (revs, complete) in repository.last_change_revs.items():
+        # a walk of the history of a directory also covers the files below it
+        covers = (
+            walked_path == "."
+            or posixpath.commonpath((walked_path, pathspec)) == walked_path
+        )
+        if covers and (complete or paths <= revs.keys()):
+            return revs
+    return None
+
+
+def get_last_change_revs(git_root: Path, src_files: list[Path]) -> dict[Path, str]:
+    """Get the last commit which changed each given file, with a single ``git log``.
+
+    The files which no commit changed, e.g. untracked ones, are not in the result.
+    The commits are kept with the metadata of the repository.
+    """
+    paths: dict[str, Path] = {}
+    for src_file in src_files:
+        with contextlib.suppress(ValueError):
+            paths[src_file.resolve().relative_to(git_root).as_posix()] = src_file
+    if not paths:
+        return {}
+    # only the history of the directory which contains all files is walked
+    pathspec = posixpath.commonpath(paths) or "."
+    repository = get_git_repository(git_root)
+    revs = _find_walked_revs(repository, pathspec, paths.keys())
+    if revs is None:
+        walked = _walk_last_changes(git_root, pathspec, set(paths))
+        if walked is None:
+            return {}
+        repository.last_change_revs[pathspec] = walked
+        revs = walked[0]
+    return {src_file: revs[path] for path, src_file in paths.items() if path in revs}
 
 
 def form_https_url(
     git_url: str, rev: str, project_path: Path, filepath: Path, lineno: int
 ) -> str | None:
+    # only needed with remote urls, urllib.request alone takes long to import
+    from urllib.request import pathname2url  # noqa: PLC0415
+
+    from giturlparse import parse  # type: ignore[import-untyped]  # noqa: PLC0415
+
     parsed_url = parse(git_url)
     template = GIT_HOST_URL_TEMPLATE.get(parsed_url.platform)
     if not template:
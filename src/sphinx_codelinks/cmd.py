@@ -1,27 +1,21 @@
 from collections import deque
-import json
 from os import linesep
 from pathlib import Path
 import tomllib
-from typing import Annotated, TypeAlias, cast
+from typing import TYPE_CHECKING, Annotated, TypeAlias, cast
 
 import typer
 
-from sphinx_codelinks.analyse.projects import AnalyseProjects
-from sphinx_codelinks.config import (
-    CodeLinksConfig,
-    CodeLinksConfigType,
-    CodeLinksProjectConfigType,
-    generate_project_configs,
-)
+from sphinx_codelinks.analyse.shard import ShardStrategy
 from sphinx_codelinks.logger import configure_cli, logger
-from sphinx_codelinks.needextend_write import MarkedObjType, convert_marked_content
 from sphinx_codelinks.source_discover.config import (
     CommentType,
     SourceDiscoverConfig,
     SourceDiscoverConfigType,
 )
-from sphinx_codelinks.source_discover.source_discover import SourceDiscover
+
+if TYPE_CHECKING:
+    from sphinx_codelinks.config import CodeLinksConfigType
 
 app = typer.Typer(
     no_args_is_help=True, context_settings={"help_option_names": ["-h", "--help"]}
@@ -56,7 +50,7 @@ OptQuiet: TypeAlias = Annotated[  # noqa: UP040 # has to be TypeAlias
 
 
 @app.command(no_args_is_help=True)
-def analyse(  # noqa: PLR0912   # for CLI, so it needs the branches
+def analyse(  # noqa: PLR0912, PLR0913, PLR0915   # for CLI, so it needs the branches, parameters and statements
     config: Annotated[
         Path,
         typer.Argument(
@@ -88,14 +82,66 @@ def analyse(  # noqa: PLR0912   # for CLI, so it needs the branches
             exists=True,
         ),
     ] = None,
+    index: Annotated[
+        bool,
+        typer.Option(
+            "--index",
+            help="Also write the markers to an indexed SQLite database for 'codelinks query'",
+        ),
+    ] = False,
+    layout: Annotated[
+        int,
+        typer.Option(
+            "--layout",
+            min=1,
+            max=2,
+            help="Layout of marked_content.json: 1 lists the full markers, "
+            "2 refers to tables of their files and scopes",
+        ),
+    ] = 1,
+    shard: Annotated[
+        str | None,
+        typer.Option(
+            "--shard",
+            help="Only analyse the I-th of N parts of the files of each project, "
+            "given as I/N, to be combined by 'codelinks merge'",
+            show_default=False,
+        ),
+    ] = None,
+    shard_by: Annotated[
+        ShardStrategy,
+        typer.Option(
+            "--shard-by",
+            help="Partition the files by a hash of their paths or into bins of "
+            "about the same size",
+        ),
+    ] = ShardStrategy.hash,
     verbose: OptVerbose = False,
     quiet: OptQuiet = False,
 ) -> None:
     """Analyse marked content in source code."""
     # @CLI command to analyse source code and extract traceability markers, IMPL_CLI_ANALYZE, impl, [FE_CLI_ANALYZE]
+    from sphinx_codelinks.analyse.projects import AnalyseProjects
+    from sphinx_codelinks.analyse.shard import Shard, ShardSelector, write_manifest
+    from sphinx_codelinks.config import (
+        CodeLinksConfig,
+        CodeLinksProjectConfigType,
+        generate_project_configs,
+    )
+    from sphinx_codelinks.source_discover.source_discover import SourceDiscover
+
     configure_cli(verbose, quiet)
 
-    data: CodeLinksConfigType = load_config_from_toml(config)
+    shard_selector = None
+    if shard is not None:
+        if index:
+            raise typer.BadParameter("--index cannot be used with --shard")
+        try:
+            shard_selector = ShardSelector(Shard.parse(shard, shard_by))
+        except ValueError as e:
+            raise typer.BadParameter(str(e)) from e
+
+    data = load_config_from_toml(config)
 
     try:
         codelinks_config = CodeLinksConfig(**data)
@@ -143,6 +189,10 @@ def analyse(  # noqa: PLR0912   # for CLI, so it needs the branches
         analyse_config = _config["analyse_config"]
         analyse_config.src_files = src_discover.source_paths
         analyse_config.src_dir = Path(src_discover.src_discover_config.src_dir)
+        if shard_selector is not None:
+            analyse_config.src_files = shard_selector.select(
+                analyse_config.src_files, analyse_config.src_dir
+            )
 
         # git_root shall be relative to the config file's location (like src_dir)
         if analyse_config.git_root is not None:
@@ -159,17 +209,69 @@ def analyse(  # noqa: PLR0912   # for CLI, so it needs the branches
 
     codelinks_config.projects = specifed_project_configs
     analyse_projects = AnalyseProjects(codelinks_config)
-    analyse_projects.run()
-
-    # Output warnings to console for CLI users
-    for src_analyse in analyse_projects.projects_analyse.values():
-        for warning in src_analyse.oneline_warnings:
-            logger.warning(
-                f"Oneline parser warning in {warning.file_path}:{warning.lineno} "
-                f"- {warning.sub_type}: {warning.msg}",
+    try:
+        # the warnings are output to the console while analysing
+        analyse_projects.run()
+        analyse_projects.dump_markers(layout)
+        if shard_selector is not None:
+            write_manifest(
+                codelinks_config.outdir, shard_selector.shard, analyse_projects
             )
+        if index:
+            analyse_projects.update_index()
+    finally:
+        analyse_projects.close()
 
-    analyse_projects.dump_markers()
+
+@app.command(no_args_is_help=True)
+def merge(
+    shard_dirs: Annotated[
+        list[Path],
+        typer.Argument(
+            help="The output directories of all shards of 'codelinks analyse --shard'",
+            show_default=False,
+            dir_okay=True,
+            file_okay=False,
+            exists=True,
+        ),
+    ],
+    outdir: Annotated[
+        Path,
+        typer.Option(
+            "--outdir",
+            "-o",
+            help="The output directory of the merged marked content and warnings",
+            show_default=True,
+            dir_okay=True,
+            file_okay=False,
+        ),
+    ] = Path("output"),
+    layout: Annotated[
+        int,
+        typer.Option(
+            "--layout",
+            min=1,
+            max=2,
+            help="Layout of the merged marked_content.json, the layouts of the "
+            "shards may differ from it",
+        ),
+    ] = 1,
+    verbose: OptVerbose = False,
+    quiet: OptQuiet = False,
+) -> None:
+    """Merge the outputs of a sharded analysis as if it ran on a single node."""
+    from sphinx_codelinks.analyse.shard import ShardError
+    from sphinx_codelinks.shard_merge import merge_shards
+
+    configure_cli(verbose, quiet)
+    try:
+        cnt_markers, cnt_warnings = merge_shards(shard_dirs, outdir, layout)
+    except (OSError, ValueError, ShardError) as e:
+        raise typer.BadParameter(f"Failed to merge the shards: {e}") from e
+    typer.echo(
+        f"Merged {len(shard_dirs)} shards: {cnt_markers} markers, "
+        f"{cnt_warnings} warnings in {outdir}"
+    )
 
 
 @app.command(no_args_is_help=True)
@@ -223,6 +325,7 @@ def discover(  # noqa: PLR0913   # CLI command requires multiple parameters
     ] = CommentType.cpp,
 ) -> None:
     """Discover the filepaths from the given root directory."""
+    from sphinx_codelinks.source_discover.source_discover import SourceDiscover
 
     src_discover_dict: SourceDiscoverConfigType = {
         "src_dir": src_dir,
@@ -294,32 +397,151 @@ def write_rst(  # noqa: PLR0913  # for CLI, so it takes as many as it requires
     quiet: OptQuiet = False,
 ) -> None:
     """Generate needextend.rst from the extracted obj in JSON."""
+    from sphinx_codelinks.marked_content import is_written_by_analyse, load_marked_objs
+    from sphinx_codelinks.needextend_write import (
+        collect_need_id_urls,
+        iter_needextend_texts,
+    )
+
     configure_cli(verbose, quiet)
+    # files written by analyse are valid by construction
+    validate = not is_written_by_analyse(jsonpath)
+    if not validate:
+        logger.debug(f"{jsonpath} is unchanged since analyse, skipping validation")
+    # the marked objects are streamed, only the remote urls are kept per need id
     try:
-        with jsonpath.open("r") as f:
-            marked_content = json.load(f)
-    except Exception as e:
+        id_urls, errors = collect_need_id_urls(
+            (obj for _, obj in load_marked_objs(jsonpath)), validate
+        )
+    except (OSError, ValueError) as e:
         raise typer.BadParameter(
             f"Failed to load marked content from {jsonpath}: {e}"
         ) from e
 
-    marked_objs: list[MarkedObjType] = [
-        obj for objs in marked_content.values() for obj in objs
-    ]
-
-    needextend_texts, errors = convert_marked_content(
-        marked_objs, remote_url_field, title
-    )
     if errors:
         raise typer.BadParameter(
             f"Errors occurred during conversion: {linesep.join(errors)}"
         )
     with outpath.open("w") as f:
-        f.writelines(needextend_texts)
+        for needextend_text in iter_needextend_texts(id_urls, remote_url_field, title):
+            f.write(needextend_text)
     typer.echo(f"Generated {outpath}")
 
 
-def load_config_from_toml(toml_file: Path) -> CodeLinksConfigType:
+@write_app.command("parquet", no_args_is_help=True)
+def write_parquet(
+    jsonpath: Annotated[
+        Path,
+        typer.Argument(
+            ...,
+            help="Path of the JSON file which contains the extracted markers",
+            show_default=False,
+            dir_okay=False,
+            file_okay=True,
+            exists=True,
+            resolve_path=True,
+        ),
+    ],
+    outpath: Annotated[
+        Path,
+        typer.Option(
+            "--outpath",
+            "-o",
+            help="The output path for generated parquet file",
+            show_default=True,
+            dir_okay=False,
+            file_okay=True,
+            exists=False,
+        ),
+    ] = Path("marked_content.parquet"),
+    verbose: OptVerbose = False,
+    quiet: OptQuiet = False,
+) -> None:
+    """Generate a columnar parquet file from the extracted obj in JSON.
+
+    Requires the optional dependency ``pyarrow``.
+    """
+    from sphinx_codelinks import parquet_write
+    from sphinx_codelinks.marked_content import load_marked_objs
+    from sphinx_codelinks.needextend_write import MarkedObjType
+
+    configure_cli(verbose, quiet)
+    marked_content: dict[str, list[MarkedObjType]] = {}
+    try:
+        for project, obj in load_marked_objs(jsonpath):
+            marked_content.setdefault(project, []).append(obj)
+    except Exception as e:
+        raise typer.BadParameter(
+            f"Failed to load marked content from {jsonpath}: {e}"
+        ) from e
+
+    columns = parquet_write.convert_to_columns(marked_content)
+    try:
+        parquet_write.write_parquet(columns, outpath)
+    except ImportError as e:
+        raise typer.BadParameter(str(e)) from e
+    typer.echo(f"Generated {outpath}")
+
+
+@app.command(no_args_is_help=True)
+def query(
+    need_id: Annotated[
+        str | None,
+        typer.Option(
+            "--need-id",
+            "-n",
+            help="Find the markers related to the given need id",
+            show_default=False,
+        ),
+    ] = None,
+    file: Annotated[
+        Path | None,
+        typer.Option(
+            "--file",
+            "-f",
+            help="Find the markers in the given source file",
+            show_default=False,
+            dir_okay=False,
+            file_okay=True,
+            resolve_path=True,
+        ),
+    ] = None,
+    index_path: Annotated[
+        Path,
+        typer.Option(
+            "--index",
+            "-i",
+            help="Path of the SQLite index written by 'codelinks analyse --index'",
+            show_default=True,
+            dir_okay=False,
+            file_okay=True,
+        ),
+    ] = Path("output") / "marker_index.db",
+) -> None:
+    """Query the marker index by need id and/or source file."""
+    from sphinx_codelinks.marker_index import MarkerIndex
+
+    if need_id is None and file is None:
+        raise typer.BadParameter("Either --need-id or --file must be given")
+    if not index_path.is_file():
+        raise typer.BadParameter(f"Marker index {index_path} does not exist")
+
+    with MarkerIndex(index_path) as marker_index:
+        markers = marker_index.query(
+            need_id=need_id, filepath=str(file) if file else None
+        )
+    if not markers:
+        typer.echo("No markers found", err=True)
+        raise typer.Exit(code=1)
+    for marker in markers:
+        location = f"{marker.filepath}:{marker.start_row + 1}:{marker.start_column}"
+        need_ids = ", ".join(marker.need_ids)
+        typer.echo(f"{location}: [{marker.project}] {marker.type} {need_ids}".rstrip())
+        if marker.remote_url:
+            typer.echo(f"    {marker.remote_url}")
+
+
+def load_config_from_toml(toml_file: Path) -> "CodeLinksConfigType":
     try:
         with toml_file.open("rb") as f:
             toml_data = tomllib.load(f)
@@ -334,7 +556,7 @@ def load_config_from_toml(toml_file: Path) -> CodeLinksConfigType:
     if not codelink_dict:
         raise typer.BadParameter(f"No 'codelinks' section found in {toml_file}")
 
-    return cast(CodeLinksConfigType, codelink_dict)
+    return cast("CodeLinksConfigType", codelink_dict)
 
 
 if __name__ == "__main__":
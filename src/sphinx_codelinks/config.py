@@ -2,18 +2,21 @@ from collections import deque
 from dataclasses import MISSING, dataclass, field, fields
 from enum import Enum
 from pathlib import Path
-from typing import Any, Literal, TypedDict, cast
-
-from jsonschema import ValidationError, validate
-from sphinx.application import Sphinx
-from sphinx.config import Config as _SphinxConfig
+from typing import TYPE_CHECKING, Any, Literal, TypedDict, cast
 
+from sphinx_codelinks.schema import SCHEMA_ERROR_TEMPLATE, get_fields_validator
 from sphinx_codelinks.source_discover.config import (
     CommentType,
     SourceDiscoverConfig,
     SourceDiscoverSectionConfigType,
 )
-from sphinx_codelinks.source_discover.source_discover import SourceDiscover
+
+if TYPE_CHECKING:
+    # Sphinx is only needed by the extension, so the CLI does not import it
+    from sphinx.application import Sphinx
+    from sphinx.config import Config as _SphinxConfig
+
+    from sphinx_codelinks.source_discover.source_discover import SourceDiscover
 
 UNIX_NEWLINE = "\n"
 
@@ -35,6 +38,21 @@ class CommentCategory(str, Enum):
     docstring = "expression_statement"
 
 
+class TaggedScopeFormat(str, Enum):
+    """How the scope tagged by a marker is written to the marked content."""
+
+    text = "text"
+    summary = "summary"
+    summary_hash = "summary_hash"
+
+
+class RemoteUrlRev(str, Enum):
+    """Which commit the remote URL of a source file links to."""
+
+    head = "head"
+    last_change = "last_change"
+
+
 class NeedIdRefsConfigType(TypedDict):
     markers: list[str]
 
@@ -59,17 +77,10 @@ class NeedIdRefsConfig:
         return None
 
     def check_schema(self) -> list[str]:
-        errors = []
-        for _field_name in self.field_names():
-            schema = self.get_schema(_field_name)
-            value = getattr(self, _field_name)
-            try:
-                validate(instance=value, schema=schema)  # type: ignore[arg-type]  # validate has no type
-            except ValidationError as e:
-                errors.append(
-                    f"Schema validation error in field '{_field_name}': {e.message}"
-                )
-        return errors
+        return get_fields_validator(type(self)).check_fields(
+            {name: getattr(self, name) for name in self.field_names()},
+            SCHEMA_ERROR_TEMPLATE,
+        )
 
 
 class MarkedRstConfigType(TypedDict):
@@ -98,17 +109,10 @@ class MarkedRstConfig:
         return None
 
     def check_schema(self) -> list[str]:
-        errors = []
-        for _field_name in self.field_names():
-            schema = self.get_schema(_field_name)
-            value = getattr(self, _field_name)
-            try:
-                validate(instance=value, schema=schema)  # type: ignore[arg-type]  # validate has no type
-            except ValidationError as e:
-                errors.append(
-                    f"Schema validation error in field '{_field_name}': {e.message}"
-                )
-        return errors
+        return get_fields_validator(type(self)).check_fields(
+            {name: getattr(self, name) for name in self.field_names()},
+            SCHEMA_ERROR_TEMPLATE,
+        )
 
     def check_sequence_mutually_exclusive(self) -> list[str]:
         errors = []
@@ -239,21 +243,18 @@ class OneLineCommentStyle:
 
     def check_schema(self) -> list[str]:
         errors = []
-        for _field_name in self.field_names():
-            schema = self.get_schema(_field_name)
-            value = getattr(self, _field_name)
-            try:
-                validate(instance=value, schema=schema)  # type: ignore[arg-type]  # validate has no type specified
-            except ValidationError as e:
-                if _field_name == "needs_fields":
-                    need_field_name = value[e.path[0]]["name"]
-                    errors.append(
-                        f"Schema validation error in need_fields '{need_field_name}': {e.message}"
-                    )
-                else:
-                    errors.append(
-                        f"Schema validation error in field '{_field_name}': {e.message}"
-                    )
+        for _field_name, error in get_fields_validator(type(self)).iter_field_errors(
+            {name: getattr(self, name) for name in self.field_names()}
+        ):
+            if _field_name == "needs_fields" and len(error.path) > 1:
+                need_field_name = self.needs_fields[cast(int, error.path[1])]["name"]
+                errors.append(
+                    f"Schema validation error in need_fields '{need_field_name}': {error.message}"
+                )
+            else:
+                errors.append(
+                    f"Schema validation error in field '{_field_name}': {error.message}"
+                )
         return errors
 
     def check_required_fields(self) -> list[str]:
@@ -326,6 +327,10 @@ class AnalyseSectionConfigType(TypedDict, total=False):
     get_rst: bool
     outdir: str
     git_root: str
+    mmap_threshold: int
+    batch_size: int
+    tagged_scope_format: str
+    remote_url_rev: str
     need_id_refs: NeedIdRefsConfigType
     marked_rst: MarkedRstConfigType
     oneline_comment_style: OneLineCommentStyleType
@@ -341,6 +346,10 @@ class SourceAnalyseConfigType(TypedDict, total=False):
     get_oneline_needs: bool
     get_rst: bool
     git_root: Path | None
+    mmap_threshold: int
+    batch_size: int
+    tagged_scope_format: TaggedScopeFormat
+    remote_url_rev: RemoteUrlRev
     need_id_refs_config: NeedIdRefsConfig
     marked_rst_config: MarkedRstConfig
     oneline_comment_style: OneLineCommentStyle
@@ -389,6 +398,42 @@ class SourceAnalyseConfig:
     """Explicit path to the Git repository root. If not set, it will be auto-detected
     by traversing parent directories. Useful for Bazel builds or deeply nested configs."""
 
+    mmap_threshold: int = field(
+        default=32 * 1024 * 1024,
+        metadata={"schema": {"type": "integer", "minimum": 0}},
+    )
+    """Size in bytes above which source files are memory-mapped instead of read."""
+
+    batch_size: int = field(
+        default=0,
+        metadata={"schema": {"type": "integer", "minimum": 0}},
+    )
+    """Number of source files analysed at a time to bound the memory, 0 for all at once."""
+
+    tagged_scope_format: TaggedScopeFormat = field(
+        default=TaggedScopeFormat.text,
+        metadata={
+            "schema": {
+                "type": "string",
+                "enum": [scope_format.value for scope_format in TaggedScopeFormat],
+            }
+        },
+    )
+    """Whether the tagged scope of a marker is written as its whole text or as a summary
+    of its kind, name and position, optionally with a hash of its text."""
+
+    remote_url_rev: RemoteUrlRev = field(
+        default=RemoteUrlRev.head,
+        metadata={
+            "schema": {
+                "type": "string",
+                "enum": [url_rev.value for url_rev in RemoteUrlRev],
+            }
+        },
+    )
+    """Whether the remote URLs link to the current commit, or to the last commit which
+    changed each file, so that they only change with the file."""
+
     need_id_refs_config: NeedIdRefsConfig = field(default_factory=NeedIdRefsConfig)
     """Configuration for extracting need id references from comments."""
 
@@ -408,25 +453,19 @@ class SourceAnalyseConfig:
         return None
 
     def check_schema(self) -> list[str]:
-        errors = []
+        values: dict[str, object] = {}
         for _field_name in self.field_names():
-            schema = self.get_schema(_field_name)
-            if not schema:
-                continue
             value = getattr(self, _field_name)
             if isinstance(value, Path):  # adapt to json schema restriction
                 value = str(value)
             if _field_name == "src_files" and isinstance(
                 value, list
             ):  # adapt to json schema restriction
-                value: list[str] = [str(src_file) for src_file in value]  # type: ignore[no-redef] # only for value adaptation
-            try:
-                validate(instance=value, schema=schema)
-            except ValidationError as e:
-                errors.append(
-                    f"Schema validation error in field '{_field_name}': {e.message}"
-                )
-        return errors
+                value = [str(src_file) for src_file in value]
+            values[_field_name] = value
+        return get_fields_validator(type(self)).check_fields(
+            values, SCHEMA_ERROR_TEMPLATE
+        )
 
     def check_markers_mutually_exclusive(self) -> list[str]:
         errors = set()
@@ -519,6 +558,9 @@ class CodeLinksConfigType(TypedDict):
     remote_url_field: str
     outdir: Path
     projects: dict[str, CodeLinksProjectConfigType]
+    max_warnings: int
+    pre_analyse: bool
+    tree_cache_size: int
     debug_measurement: bool
     debug_filters: bool
 
@@ -526,7 +568,7 @@ class CodeLinksConfigType(TypedDict):
 @dataclass
 class CodeLinksConfig:
     @classmethod
-    def from_sphinx(cls, sphinx_config: _SphinxConfig) -> "CodeLinksConfig":
+    def from_sphinx(cls, sphinx_config: "_SphinxConfig") -> "CodeLinksConfig":
         obj = cls()
         super().__setattr__(obj, "_sphinx_config", sphinx_config)
         return obj
@@ -573,7 +615,7 @@ class CodeLinksConfig:
         return object.__setattr__(self, name, value)
 
     @classmethod
-    def add_config_values(cls, app: Sphinx) -> None:
+    def add_config_values(cls, app: "Sphinx") -> None:
         """Add all config values to Sphinx application"""
         for item in fields(cls):
             if item.default_factory is not MISSING:
@@ -691,6 +733,31 @@ class CodeLinksConfig:
     )
     """The configuration for the source tracing projects."""
 
+    max_warnings: int = field(
+        default=100,
+        metadata={
+            "rebuild": "html",
+            "types": (int,),
+            "schema": {"type": "integer", "minimum": 0},
+        },
+    )
+    """The number of analyse warnings to emit, the others are counted per subtype. 0 for all."""
+
+    pre_analyse: bool = field(
+        default=True, metadata={"rebuild": "html", "types": (bool,)}
+    )
+    """If True, analyse the projects of the documents to read concurrently before reading them."""
+
+    tree_cache_size: int = field(
+        default=500,
+        metadata={
+            "rebuild": "html",
+            "types": (int,),
+            "schema": {"type": "integer", "minimum": 0},
+        },
+    )
+    """The number of parsed source files kept to re-parse them incrementally, 0 for none."""
+
     debug_measurement: bool = field(
         default=False, metadata={"rebuild": "html", "types": (bool,)}
     )
@@ -703,21 +770,15 @@ class CodeLinksConfig:
 
 def check_schema(config: CodeLinksConfig) -> list[str]:
     """Check only first layer's of schema, so that the nested dict is not validated here."""
-    errors = []
+    values: dict[str, object] = {}
     for _field_name in CodeLinksConfig.field_names():
-        schema = CodeLinksConfig.get_schema(_field_name)
-        if not schema:
-            continue
         value = getattr(config, _field_name)
         if isinstance(value, Path):  # adapt to json schema restriction
             value = str(value)
-        try:
-            validate(instance=value, schema=schema)
-        except ValidationError as e:
-            errors.append(
-                f"Schema validation error in filed '{_field_name}': {e.message}"
-            )
-    return errors
+        values[_field_name] = value
+    return get_fields_validator(CodeLinksConfig).check_fields(
+        values, "Schema validation error in filed '{name}': {message}"
+    )
 
 
 def check_project_configuration(config: CodeLinksConfig) -> list[str]:
@@ -787,7 +848,7 @@ def convert_src_discovery_config(
 
 def convert_analyse_config(
     config_dict: AnalyseSectionConfigType | None,
-    src_discover: SourceDiscover | None = None,
+    src_discover: "SourceDiscover | None" = None,
 ) -> SourceAnalyseConfig:
     analyse_config_dict: SourceAnalyseConfigType = {}
     if config_dict:
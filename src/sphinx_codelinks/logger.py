@@ -1,21 +1,38 @@
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 import logging
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol
 
-from rich.console import Console
-from rich.text import Text
-from sphinx import version_info as _sphinx_version_info
-from sphinx.util import logging as sphinx_logging
-import typer
+if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.text import Text
 
 
 class Logger:
-    __slots__ = ("console", "err_console", "quiet", "verbose")
+    __slots__ = ("_console", "_err_console", "quiet", "verbose")
 
     def __init__(self, *, verbose: bool = False, quiet: bool = False) -> None:
         self.verbose = verbose
         self.quiet = quiet
-        self.console = Console()
-        self.err_console = Console(stderr=True)
+        # rich is imported with the first output, not with this module
+        self._console: Console | None = None
+        self._err_console: Console | None = None
+
+    @property
+    def console(self) -> "Console":
+        if self._console is None:
+            from rich.console import Console  # noqa: PLC0415
+
+            self._console = Console()
+        return self._console
+
+    @property
+    def err_console(self) -> "Console":
+        if self._err_console is None:
+            from rich.console import Console  # noqa: PLC0415
+
+            self._err_console = Console(stderr=True)
+        return self._err_console
 
     def configure(self, verbose: bool = False, quiet: bool = False) -> None:
         self.verbose = verbose
@@ -23,11 +40,11 @@ class Logger:
 
     def debug(
         self,
-        *msg: str | Text,
-        style: str | None = typer.colors.BRIGHT_BLACK,
+        *msg: "str | Text",
+        style: str | None = "bright_black",
         highlight: bool = False,
         markup: bool = False,
-        console: Console | None = None,
+        console: "Console | None" = None,
     ) -> None:
         """Print a debug message.
 
@@ -40,12 +57,12 @@ class Logger:
 
     def info(
         self,
-        *msg: str | Text,
+        *msg: "str | Text",
         style: str | None = None,
         highlight: bool = False,
         markup: bool = False,
         no_wrap: bool | None = None,
-        console: Console | None = None,
+        console: "Console | None" = None,
     ) -> None:
         """Print an informational message.
 
@@ -58,11 +75,11 @@ class Logger:
 
     def result(
         self,
-        *msg: str | Text,
+        *msg: "str | Text",
         style: str | None = None,
         highlight: bool = False,
         markup: bool = False,
-        console: Console | None = None,
+        console: "Console | None" = None,
     ) -> None:
         """Print a result message, like info but ignores quiet mode."""
         (console or self.console).print(
@@ -71,11 +88,11 @@ class Logger:
 
     def warning(
         self,
-        *msg: str | Text,
-        style: str | None = typer.colors.YELLOW,
+        *msg: "str | Text",
+        style: str | None = "yellow",
         highlight: bool = False,
         markup: bool = False,
-        console: Console | None = None,
+        console: "Console | None" = None,
     ) -> None:
         """Print a warning message."""
         (console or self.console).print(
@@ -84,11 +101,11 @@ class Logger:
 
     def error(
         self,
-        *msg: str | Text,
-        style: str | None = typer.colors.RED,
+        *msg: "str | Text",
+        style: str | None = "red",
         highlight: bool = False,
         markup: bool = False,
-        console: Console | None = None,
+        console: "Console | None" = None,
     ) -> None:
         """Print an error message."""
         (console or self.err_console).print(
@@ -182,15 +199,21 @@ class _SphinxBackend:
     ``suppress_warnings`` and rendered on the Sphinx warning stream.
     """
 
-    # Sphinx >= 8 renders the warning type itself; older versions need it
-    # appended to the message (mirrors sphinx-needs' logging helper).
-    _show_warning_types = _sphinx_version_info >= (8,)
+    def __init__(self) -> None:
+        # Sphinx is only imported once the Sphinx frontend is selected
+        from sphinx import version_info  # noqa: PLC0415
+        from sphinx.util import logging as sphinx_logging  # noqa: PLC0415
+
+        self.sphinx_logging = sphinx_logging
+        # Sphinx >= 8 renders the warning type itself; older versions need it
+        # appended to the message (mirrors sphinx-needs' logging helper).
+        self._show_warning_types = version_info >= (8,)
 
     def debug(self, name: str, msg: str, _location: str | None, /) -> None:
-        sphinx_logging.getLogger(name).verbose(msg)
+        self.sphinx_logging.getLogger(name).verbose(msg)
 
     def info(self, name: str, msg: str, _location: str | None, /) -> None:
-        sphinx_logging.getLogger(name).info(msg)
+        self.sphinx_logging.getLogger(name).info(msg)
 
     def warning(
         self, name: str, msg: str, subtype: str, location: str | None, /
@@ -198,7 +221,7 @@ class _SphinxBackend:
         message = msg
         if not self._show_warning_types:
             message += f" [codelinks.{subtype}]" if subtype else " [codelinks]"
-        sphinx_logging.getLogger(name).warning(
+        self.sphinx_logging.getLogger(name).warning(
             message,
             type="codelinks",
             subtype=subtype,
@@ -206,6 +229,28 @@ class _SphinxBackend:
         )
 
 
+Record = tuple[str, str, str, str, str | None]
+"""A kept log record: level, logger name, message, subtype and location."""
+
+
+class _RecordingBackend:
+    """Recording backend: keep the records, to emit them in another process."""
+
+    def __init__(self, records: list[Record]) -> None:
+        self.records = records
+
+    def debug(self, name: str, msg: str, location: str | None, /) -> None:
+        self.records.append(("debug", name, msg, "", location))
+
+    def info(self, name: str, msg: str, location: str | None, /) -> None:
+        self.records.append(("info", name, msg, "", location))
+
+    def warning(
+        self, name: str, msg: str, subtype: str, location: str | None, /
+    ) -> None:
+        self.records.append(("warning", name, msg, subtype, location))
+
+
 class _Dispatch:
     """Holds the active backend, swapped by the ``configure_*`` entry points."""
 
@@ -256,6 +301,34 @@ def configure_sphinx() -> None:
     _dispatch.backend = _SphinxBackend()
 
 
+@contextmanager
+def recording() -> Iterator[list[Record]]:
+    """Keep the records instead of emitting them, e.g. in a worker process.
+
+    The records are emitted later with :func:`replay`, the previous backend is
+    restored on exit.
+    """
+    records: list[Record] = []
+    backend = _dispatch.backend
+    _dispatch.backend = _RecordingBackend(records)
+    try:
+        yield records
+    finally:
+        _dispatch.backend = backend
+
+
+def replay(records: Iterable[Record]) -> None:
+    """Emit kept records through the active backend."""
+    backend = _dispatch.backend
+    for level, name, msg, subtype, location in records:
+        if level == "warning":
+            backend.warning(name, msg, subtype, location)
+        elif level == "info":
+            backend.info(name, msg, location)
+        else:
+            backend.debug(name, msg, location)
+
+
 def reset() -> None:
     """Restore the default (plain library) backend. Mainly for tests."""
     _dispatch.backend = _StdlibBackend()
@@ -0,0 +1,363 @@
+"""Incremental reader of the JSON file created by CodeLinks analyse.
+
+The file has the layout ``{"<project>": [<marked object>, ...], ...}`` (layout 1)
+or, written with ``codelinks analyse --layout 2``, the normalised layout::
+
+    {"layout": 2, "projects": {"<project>": {
+        "files": [...], "url_prefixes": [...], "scopes": [...],
+        "markers": [<compact marked object>, ...]}, ...}}
+
+Instead of loading it at once, the marked objects are decoded one by one
+from a growing text buffer, so that only a single object and the unread
+tail of the current chunk are held in memory. The compact objects of layout 2
+are expanded to the objects of layout 1 while reading.
+"""
+
+from collections.abc import Iterable, Iterator
+import hashlib
+import json
+from pathlib import Path
+import re
+from typing import NoReturn, TextIO, cast
+
+from sphinx_codelinks import serialize
+from sphinx_codelinks.analyse.models import ScopeSummary, SourceMap, get_scope_text
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+CHUNK_SIZE = 1 << 16
+"""Number of characters read from the file at once."""
+
+DIGEST_SUFFIX = ".sha256"
+"""Suffix of the file with the digest of the marked content written by analyse."""
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+LAYOUT_KEY = "layout"
+"""First key of files in a layout other than 1, with the layout version."""
+
+# keys of the marked objects which are replaced by references to the tables
+SHARED_KEYS = frozenset({"filepath", "remote_url", "tagged_scope"})
+COMPACT_KEYS = frozenset({"file", "remote_url", "scope"})
+
+
+class MarkerTables:
+    """The tables shared by the markers of a project in layout 2.
+
+    A compact marker refers to its file and its tagged scope by their index in
+    ``files`` and ``scopes``. Its remote url is the url prefix of its file followed
+    by its line number, only markers with another remote url keep their own.
+    """
+
+    def __init__(self) -> None:
+        self.files: list[str] = []
+        self.url_prefixes: list[str | None] = []
+        self.scopes: list[str | ScopeSummary] = []
+        self._file_indices: dict[str, int] = {}
+        self._scope_indices: dict[str, int] = {}
+
+    def compact(self, obj: MarkedObjType) -> dict[str, object]:
+        """Compact a marked object, adding its file and scope to the tables."""
+        lineno = str(obj["source_map"]["start"]["row"] + 1)
+        remote_url = obj["remote_url"]
+        url_prefix = (
+            remote_url[: -len(lineno)]
+            if remote_url and remote_url.endswith(lineno)
+            else None
+        )
+        file_idx = self._file_indices.get(obj["filepath"])
+        if file_idx is None:
+            file_idx = self._file_indices[obj["filepath"]] = len(self.files)
+            self.files.append(obj["filepath"])
+            self.url_prefixes.append(url_prefix)
+
+        scope_idx = None
+        tagged_scope = obj["tagged_scope"]
+        if tagged_scope is not None:
+            # summaries are compared by their text
+            scope_key = cast(str, get_scope_text(tagged_scope))
+            scope_idx = self._scope_indices.get(scope_key)
+            if scope_idx is None:
+                scope_idx = self._scope_indices[scope_key] = len(self.scopes)
+                self.scopes.append(tagged_scope)
+
+        compact: dict[str, object] = {"file": file_idx, "scope": scope_idx}
+        compact.update({k: v for k, v in obj.items() if k not in SHARED_KEYS})
+        if url_prefix is None or url_prefix != self.url_prefixes[file_idx]:
+            compact["remote_url"] = remote_url
+        return compact
+
+    def expand(self, compact: dict[str, object]) -> MarkedObjType:
+        """Expand a compact marker to the marked object it was compacted from.
+
+        :raises KeyError, IndexError, TypeError: if it does not refer to the tables.
+        """
+        file_idx = cast(int, compact["file"])
+        scope_idx = cast(int | None, compact["scope"])
+        source_map = cast(SourceMap, compact["source_map"])
+        if "remote_url" in compact:
+            remote_url = cast(str | None, compact["remote_url"])
+        else:
+            url_prefix = self.url_prefixes[file_idx]
+            remote_url = (
+                None
+                if url_prefix is None
+                else f"{url_prefix}{source_map['start']['row'] + 1}"
+            )
+        obj: dict[str, object] = {
+            "filepath": self.files[file_idx],
+            "remote_url": remote_url,
+            "source_map": source_map,
+            "tagged_scope": None if scope_idx is None else self.scopes[scope_idx],
+        }
+        obj.update({k: v for k, v in compact.items() if k not in COMPACT_KEYS})
+        return cast(MarkedObjType, obj)
+
+
+class _ChunkedDecoder:
+    """Decode JSON values from a text stream chunk by chunk."""
+
+    def __init__(self, fp: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        # position of the buffer start in the whole document, for error messages
+        self.offset = 0
+        self.lineno = 1
+        self.line_start = 0
+
+    def fill(self) -> bool:
+        """Drop the consumed part of the buffer and read the next chunk.
+
+        The size of the read is at least the size of the unconsumed buffer,
+        so that decoding a value spanning many chunks stays linear.
+        """
+        if self.eof:
+            return False
+        consumed = self.buffer[: self.pos]
+        newlines = consumed.count("\n")
+        if newlines:
+            self.lineno += newlines
+            self.line_start = self.offset + consumed.rindex("\n") + 1
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+
+        chunk = self.fp.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespaces and return the next character, empty at the end."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore[union-attr]  # always matches
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which has to be one of the given ones."""
+        char = self.peek()
+        if not char or char not in chars:
+            expected = " or ".join(repr(c) for c in chars)
+            self.error(f"Expecting {expected}", self.pos)
+        self.pos += 1
+        return char
+
+    def decode(self) -> object:
+        """Decode the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # the value may be cut at the end of the buffer
+                if self.fill():
+                    continue
+                self.error(e.msg, e.pos)
+            # numbers and literals may continue in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def error(self, msg: str, pos: int) -> NoReturn:
+        lineno = self.lineno + self.buffer.count("\n", 0, pos)
+        line_start = self.buffer.rfind("\n", 0, pos)
+        if line_start == -1:
+            colno = self.offset + pos - self.line_start + 1
+        else:
+            colno = pos - line_start
+        raise ValueError(
+            f"{msg}: line {lineno} column {colno} (char {self.offset + pos})"
+        )
+
+
+def _iter_keys(decoder: _ChunkedDecoder) -> Iterator[str]:
+    """Iterate over the keys of the next object, the caller consumes each value."""
+    decoder.expect("{")
+    if decoder.peek() == "}":
+        decoder.pos += 1
+        return
+    while True:
+        if decoder.peek() != '"':
+            decoder.error(
+                "Expecting property name enclosed in double quotes", decoder.pos
+            )
+        key = decoder.decode()
+        decoder.expect(":")
+        yield str(key)
+        if decoder.expect(",}") == "}":
+            return
+
+
+def _iter_items(decoder: _ChunkedDecoder) -> Iterator[object]:
+    """Iterate over the decoded items of the next array."""
+    decoder.expect("[")
+    if decoder.peek() == "]":
+        decoder.pos += 1
+        return
+    while True:
+        yield decoder.decode()
+        if decoder.expect(",]") == "]":
+            return
+
+
+def _iter_layout_2(
+    decoder: _ChunkedDecoder, keys: Iterator[str]
+) -> Iterator[tuple[str, MarkedObjType]]:
+    for key in keys:
+        if key != "projects":
+            decoder.error(f"Unexpected key {key!r}", decoder.pos)
+        for project in _iter_keys(decoder):
+            tables = MarkerTables()
+            for table in _iter_keys(decoder):
+                if table == "files":
+                    tables.files = cast(list[str], decoder.decode())
+                elif table == "url_prefixes":
+                    tables.url_prefixes = cast(list[str | None], decoder.decode())
+                elif table == "scopes":
+                    tables.scopes = cast(list[str | ScopeSummary], decoder.decode())
+                elif table == "markers":
+                    for compact in _iter_items(decoder):
+                        try:
+                            obj = tables.expand(cast(dict[str, object], compact))
+                        except (KeyError, IndexError, TypeError) as e:
+                            decoder.error(
+                                f"Invalid marker {compact} of project {project!r}: {e!r}",
+                                decoder.pos,
+                            )
+                        yield project, obj
+                else:
+                    decoder.error(f"Unexpected key {table!r}", decoder.pos)
+
+
+def iter_marked_content(
+    fp: TextIO, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[str, MarkedObjType]]:
+    """Iterate over the marked objects in the file with their project names.
+
+    :raises ValueError: if the content is not valid JSON of the expected layout.
+    """
+    decoder = _ChunkedDecoder(fp, chunk_size)
+    keys = _iter_keys(decoder)
+    for idx, key in enumerate(keys):
+        # a project of layout 1 has a list of marked objects instead of a version
+        if idx == 0 and key == LAYOUT_KEY and decoder.peek() != "[":
+            layout = decoder.decode()
+            if layout != 2:  # noqa: PLR2004  # the only other layout
+                decoder.error(f"Unsupported layout {layout!r}", decoder.pos)
+            yield from _iter_layout_2(decoder, keys)
+            break
+        for obj in _iter_items(decoder):
+            yield key, obj  # type: ignore[misc]  # validated by the consumer
+    if decoder.peek():
+        decoder.error("Extra data", decoder.pos)
+
+
+def dump_layout_1(fp: TextIO, projects: Iterable[tuple[str, Iterable[str]]]) -> None:
+    """Write the JSON texts of the marked objects of the projects in layout 1.
+
+    The markers are written one by one, with the same text as ``serialize.dumps`` of
+    all marked objects.
+    """
+    fp.write("{")
+    for idx, (project, marker_jsons) in enumerate(projects):
+        if idx:
+            fp.write(",")
+        fp.write(f"{serialize.dumps(project)}:[")
+        for marker_idx, marker_json in enumerate(marker_jsons):
+            if marker_idx:
+                fp.write(",")
+            fp.write(marker_json)
+        fp.write("]")
+    fp.write("}")
+
+
+def dump_layout_2(
+    fp: TextIO, projects: Iterable[tuple[str, Iterable[MarkedObjType]]]
+) -> None:
+    """Write the marked objects of the projects in layout 2.
+
+    The tables of a project are written before its markers, so the compact markers
+    of a project are kept until all of them are known.
+    """
+    # in the compact text of serialize.dumps
+    fp.write(f'{{"{LAYOUT_KEY}":2,"projects":{{')
+    for idx, (project, objs) in enumerate(projects):
+        tables = MarkerTables()
+        markers = [serialize.dumps(tables.compact(obj)) for obj in objs]
+        if idx:
+            fp.write(",")
+        fp.write(
+            f"{serialize.dumps(project)}:{{"
+            f'"files":{serialize.dumps(tables.files)},'
+            f'"url_prefixes":{serialize.dumps(tables.url_prefixes)},'
+            f'"scopes":{serialize.dumps(tables.scopes)},'
+            f'"markers":[{",".join(markers)}]}}'
+        )
+    fp.write("}}")
+
+
+def load_marked_objs(jsonpath: Path) -> Iterator[tuple[str, MarkedObjType]]:
+    """Open the given file and iterate over its marked objects."""
+    with jsonpath.open("r", encoding=serialize.ENCODING) as f:
+        yield from iter_marked_content(f)
+
+
+def compute_digest(jsonpath: Path) -> str:
+    """Compute the SHA-256 digest of the given file."""
+    digest = hashlib.sha256()
+    with jsonpath.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_digest_path(jsonpath: Path) -> Path:
+    return jsonpath.with_name(jsonpath.name + DIGEST_SUFFIX)
+
+
+def write_digest(jsonpath: Path) -> Path:
+    """Write the digest of a marked content file next to it, in ``sha256sum`` format."""
+    digest_path = get_digest_path(jsonpath)
+    digest_path.write_text(f"{compute_digest(jsonpath)}  {jsonpath.name}\n")
+    return digest_path
+
+
+def is_written_by_analyse(jsonpath: Path) -> bool:
+    """Check whether the file is unchanged since analyse has written it.
+
+    Such files are valid by construction, so their schema validation can be skipped.
+    """
+    digest_path = get_digest_path(jsonpath)
+    if not digest_path.is_file():
+        return False
+    digest, _, _ = digest_path.read_text().partition(" ")
+    return digest == compute_digest(jsonpath)
@@ -0,0 +1,293 @@
+"""Indexed SQLite storage of the marked content extracted by CodeLinks analyse."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+from types import TracebackType
+
+from sphinx_codelinks.analyse.models import MarkedContentType, get_scope_text
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+INDEX_FILENAME = "marker_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    UNIQUE (project, path)
+);
+CREATE TABLE IF NOT EXISTS scopes (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS markers (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    scope_id INTEGER REFERENCES scopes (id) ON DELETE SET NULL,
+    type TEXT NOT NULL,
+    start_row INTEGER NOT NULL,
+    start_column INTEGER NOT NULL,
+    end_row INTEGER NOT NULL,
+    end_column INTEGER NOT NULL,
+    remote_url TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS need_ids (
+    marker_id INTEGER NOT NULL REFERENCES markers (id) ON DELETE CASCADE,
+    need_id TEXT NOT NULL,
+    relation TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_path ON files (path);
+CREATE INDEX IF NOT EXISTS idx_scopes_file_id ON scopes (file_id);
+CREATE INDEX IF NOT EXISTS idx_markers_file_id ON markers (file_id);
+CREATE INDEX IF NOT EXISTS idx_need_ids_need_id ON need_ids (need_id);
+CREATE INDEX IF NOT EXISTS idx_need_ids_marker_id ON need_ids (marker_id);
+"""
+
+QUERY_MARKERS = """
+SELECT markers.id, files.project, files.path, markers.type,
+       markers.start_row, markers.start_column, markers.end_row, markers.end_column,
+       markers.remote_url, scopes.text
+FROM markers
+JOIN files ON files.id = markers.file_id
+LEFT JOIN scopes ON scopes.id = markers.scope_id
+"""
+
+# the need ids of the markers found by QUERY_MARKERS with the same conditions
+QUERY_NEED_IDS = """
+SELECT need_ids.marker_id, need_ids.need_id
+FROM need_ids
+WHERE need_ids.marker_id IN (
+    SELECT markers.id FROM markers JOIN files ON files.id = markers.file_id{where}
+)
+ORDER BY need_ids.rowid
+"""
+
+
+@dataclass
+class IndexedMarker:
+    """A marker as stored in the index."""
+
+    project: str
+    filepath: str
+    type: str
+    start_row: int
+    start_column: int
+    end_row: int
+    end_column: int
+    remote_url: str | None
+    tagged_scope: str | None
+    need_ids: list[str]
+
+
+def get_related_need_ids(obj: MarkedObjType) -> list[tuple[str, str]]:
+    """Get the need ids a marked object is related to, with the kind of relation.
+
+    - ``ref`` for the need ids referenced by a need-id-refs marker
+    - ``id`` for the id of a one-line need
+    - the field name for the need ids given in list fields of a one-line need (e.g. ``links``)
+    """
+    related: list[tuple[str, str]] = []
+    if obj["type"] == MarkedContentType.need_id_refs.value:
+        need_ids = obj.get("need_ids") or []
+        related.extend((need_id, "ref") for need_id in need_ids)
+    elif obj["type"] == MarkedContentType.need.value:
+        need = obj.get("need") or {}
+        for field_name, value in need.items():
+            if field_name == "id" and value:
+                related.append((str(value), "id"))
+            elif isinstance(value, list):
+                related.extend((str(need_id), field_name) for need_id in value)
+    return related
+
+
+def resolve_path(filepath: str) -> str:
+    """Get the canonical path a file is indexed by, without symbolic links and ``..``."""
+    return str(Path(filepath).resolve())
+
+
+def compute_digest(objs: list[MarkedObjType]) -> str:
+    """Digest of the marked content of one file, used to detect changes."""
+    return hashlib.sha256(json.dumps(objs, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MarkerIndex:
+    """SQLite index of markers with lookups by need id and file path.
+
+    Markers are stored per project and file. Updating a project only rewrites
+    the rows of those files whose marked content actually changed.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "MarkerIndex":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def update_project(
+        self,
+        project: str,
+        filepaths: Iterable[str],
+        marked_objs: Iterable[MarkedObjType],
+    ) -> int:
+        """Update the index with the analysis result of a project.
+
+        :param filepaths: All analysed files, including those without markers.
+            Indexed files of the project which are not given are removed.
+        :param marked_objs: The marked content of the project as dumped by analyse.
+        :return: The number of files whose rows were (re)written.
+        """
+        objs_per_file: dict[str, list[MarkedObjType]] = {
+            resolve_path(filepath): [] for filepath in filepaths
+        }
+        for obj in marked_objs:
+            objs_per_file.setdefault(resolve_path(obj["filepath"]), []).append(obj)
+
+        cnt_updated = 0
+        with self.connection:
+            indexed: dict[str, tuple[int, str]] = {
+                path: (file_id, digest)
+                for file_id, path, digest in self.connection.execute(
+                    "SELECT id, path, digest FROM files WHERE project = ?", (project,)
+                )
+            }
+            for path, (file_id, _) in indexed.items():
+                if path not in objs_per_file:
+                    self.connection.execute(
+                        "DELETE FROM files WHERE id = ?", (file_id,)
+                    )
+
+            for path, objs in objs_per_file.items():
+                digest = compute_digest(objs)
+                if path in indexed:
+                    file_id, indexed_digest = indexed[path]
+                    if indexed_digest == digest:
+                        continue
+                    self.connection.execute(
+                        "DELETE FROM files WHERE id = ?", (file_id,)
+                    )
+                self._insert_file(project, path, digest, objs)
+                cnt_updated += 1
+        return cnt_updated
+
+    def _insert_file(
+        self, project: str, path: str, digest: str, objs: list[MarkedObjType]
+    ) -> None:
+        cursor = self.connection.execute(
+            "INSERT INTO files (project, path, digest) VALUES (?, ?, ?)",
+            (project, path, digest),
+        )
+        file_id = cursor.lastrowid
+        scope_ids: dict[str, int | None] = {}
+        for obj in objs:
+            scope_id = None
+            scope_text = get_scope_text(obj.get("tagged_scope"))
+            if scope_text is not None:
+                # markers in the same scope share one row
+                if scope_text not in scope_ids:
+                    scope_ids[scope_text] = self.connection.execute(
+                        "INSERT INTO scopes (file_id, text) VALUES (?, ?)",
+                        (file_id, scope_text),
+                    ).lastrowid
+                scope_id = scope_ids[scope_text]
+            source_map = obj["source_map"]
+            marker_id = self.connection.execute(
+                "INSERT INTO markers (file_id, scope_id, type, start_row, start_column,"
+                " end_row, end_column, remote_url, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_id,
+                    scope_id,
+                    obj["type"],
+                    source_map["start"]["row"],
+                    source_map["start"]["column"],
+                    source_map["end"]["row"],
+                    source_map["end"]["column"],
+                    obj.get("remote_url"),
+                    json.dumps(obj),
+                ),
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT INTO need_ids (marker_id, need_id, relation) VALUES (?, ?, ?)",
+                [
+                    (marker_id, need_id, relation)
+                    for need_id, relation in get_related_need_ids(obj)
+                ],
+            )
+
+    def query(
+        self, need_id: str | None = None, filepath: str | None = None
+    ) -> list[IndexedMarker]:
+        """Find markers by need id and/or by the path of the source file."""
+        conditions: list[str] = []
+        params: list[str] = []
+        if need_id is not None:
+            conditions.append(
+                "markers.id IN (SELECT marker_id FROM need_ids WHERE need_id = ?)"
+            )
+            params.append(need_id)
+        if filepath is not None:
+            conditions.append("files.path = ?")
+            params.append(resolve_path(filepath))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # the need ids of all found markers at once, instead of a query per marker
+        need_ids_per_marker: dict[int, list[str]] = {}
+        for marker_id, related_id in self.connection.execute(
+            QUERY_NEED_IDS.format(where=where), params
+        ):
+            need_ids_per_marker.setdefault(marker_id, []).append(related_id)
+
+        sql = (
+            QUERY_MARKERS
+            + where
+            + " ORDER BY files.project, files.path, markers.start_row, markers.id"
+        )
+        markers: list[IndexedMarker] = []
+        for (
+            marker_id,
+            project,
+            path,
+            marker_type,
+            start_row,
+            start_column,
+            end_row,
+            end_column,
+            remote_url,
+            tagged_scope,
+        ) in self.connection.execute(sql, params).fetchall():
+            markers.append(
+                IndexedMarker(
+                    project,
+                    path,
+                    marker_type,
+                    start_row,
+                    start_column,
+                    end_row,
+                    end_column,
+                    remote_url,
+                    tagged_scope,
+                    need_ids_per_marker.get(marker_id, []),
+                )
+            )
+        return markers
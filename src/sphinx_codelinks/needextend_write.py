@@ -1,14 +1,13 @@
 """Convert the generated JSON file created by CodeLinks analyse to need-extend in RST."""
 
-from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
 from dataclasses import dataclass, field, fields
 from os import linesep
 from string import Template
 from typing import Any, TypedDict, cast
 
-from jsonschema import ValidationError, validate
-
-from sphinx_codelinks.analyse.models import MarkedContentType, SourceMap
+from sphinx_codelinks.analyse.models import MarkedContentType, ScopeSummary, SourceMap
+from sphinx_codelinks.schema import SCHEMA_ERROR_TEMPLATE, get_fields_validator
 
 NEEDEXTEND_TEMPLATE = Template(""".. needextend:: $need_id
    :$remote_url_field: $remote_url
@@ -61,8 +60,10 @@ class MarkedContentSchema:
     )
     """Coordinate of the marked content in a file"""
 
-    tagged_scope: str | None = field(metadata={"schema": {"type": ["string", "null"]}})
-    """The scoped tagged by the marked content"""
+    tagged_scope: str | ScopeSummary | None = field(
+        metadata={"schema": {"type": ["string", "object", "null"]}}
+    )
+    """The scoped tagged by the marked content, its text or its summary"""
 
     type: MarkedContentType = field(
         metadata={
@@ -110,109 +111,139 @@ class MarkedContentSchema:
         return None
 
     def check_schema(self) -> list[str]:
-        errors = []
-        for _field_name in self.field_names():
-            schema = self.get_schema(_field_name)
-            value = getattr(self, _field_name)
-            try:
-                validate(instance=value, schema=schema)  # type: ignore[arg-type]  # validate has no type
-            except ValidationError as e:
-                errors.append(
-                    f"Schema validation error in field '{_field_name}': {e.message}"
-                )
-        return errors
+        return get_fields_validator(type(self)).check_fields(
+            {name: getattr(self, name) for name in self.field_names()},
+            SCHEMA_ERROR_TEMPLATE,
+        )
 
     def check_conditional_required_fields(self) -> list[str]:
-        errors = []
-        if self.type == MarkedContentType.need.value and not self.need:
+        return check_conditional_required_fields(vars(self))
+
+    def check_loaded_objs(self) -> list[str]:
+        return self.check_schema() + self.check_conditional_required_fields()
+
+    @classmethod
+    def check_obj(cls, obj: Mapping[str, object]) -> list[str]:
+        """Check a loaded marked object without instantiating the schema for it.
+
+        :raises TypeError: if required fields are missing or unknown fields are given,
+            in the same way as the constructor does.
+        """
+        validator = get_fields_validator(cls)
+        keys = obj.keys()
+        if not (validator.required_names <= keys <= validator.field_names):
+            cls(**obj)  # type: ignore[arg-type]  # raises the TypeError of the constructor
+        # fields not given have their default None, which is valid for all of them
+        errors = validator.check_fields(obj, SCHEMA_ERROR_TEMPLATE)
+        errors.extend(check_conditional_required_fields(obj))
+        return errors
+
+
+def check_conditional_required_fields(obj: Mapping[str, object]) -> list[str]:
+    """Check the fields which are required depending on the type of marked content."""
+    errors = []
+    marked_type = obj.get("type")
+    if marked_type == MarkedContentType.need.value and not obj.get("need"):
+        errors.append("Need definition is required for marked content of type 'need'")
+    elif marked_type == MarkedContentType.need_id_refs.value:
+        if not obj.get("marker"):
             errors.append(
-                "Need definition is required for marked content of type 'need'"
+                "Marker is required for marked content of type 'need_id_refs'"
             )
-        elif self.type == MarkedContentType.need_id_refs.value:
-            if not self.marker:
-                errors.append(
-                    "Marker is required for marked content of type 'need_id_refs'"
-                )
-            if not self.need_ids:
-                errors.append(
-                    "Need id refs are required for marked content of type 'need_id_refs'"
-                )
-        elif self.type == MarkedContentType.need.value and not self.need_ids:
+        if not obj.get("need_ids"):
             errors.append(
                 "Need id refs are required for marked content of type 'need_id_refs'"
             )
-        elif self.type == MarkedContentType.rst.value and not self.rst:
-            errors.append("RST text is required for marked content of type 'rst'")
-        return errors
-
-    def check_loaded_objs(self) -> list[str]:
-        return self.check_schema() + self.check_conditional_required_fields()
+    elif marked_type == MarkedContentType.need.value and not obj.get("need_ids"):
+        errors.append(
+            "Need id refs are required for marked content of type 'need_id_refs'"
+        )
+    elif marked_type == MarkedContentType.rst.value and not obj.get("rst"):
+        errors.append("RST text is required for marked content of type 'rst'")
+    return errors
 
 
 class MarkedObjType(TypedDict):
     filepath: str
     remote_url: str | None
     source_map: SourceMap
-    tagged_scope: str | None
+    tagged_scope: str | ScopeSummary | None
     type: MarkedContentType
     need_ids: list[str] | None
     need: dict[str, str | list[str]] | None
     rst: str | None
 
 
-def convert_marked_content(
-    marked_objs: list[MarkedObjType],
-    remote_url_field: str = "remote-url",
-    title: str | None = None,
-) -> tuple[list[str], list[str]]:
-    """Convert marked objects extracted by analyse CLI to needextend in RST"""
-    errors = []
-    needextend_texts: list[str] = []
-    intersted_objs = [
-        obj
-        for obj in marked_objs
-        if obj["type"] == MarkedContentType.need_id_refs.value
-    ]
-
-    for obj in intersted_objs:
-        try:
-            schema = MarkedContentSchema(**obj)
-        except TypeError as e:
-            errors.append(str(e))
-            continue
-        obj_errors: deque[str] = deque()
-        obj_errors.extend(schema.check_schema())
-        obj_errors.extend(schema.check_conditional_required_fields())
-        if obj_errors:
-            obj_errors.appendleft(f"{obj} has the following errors:")
-            errors.extend(list(obj_errors))
+def collect_need_id_urls(
+    marked_objs: Iterable[MarkedObjType], validate: bool = True
+) -> tuple[dict[str, list[str]], list[str]]:
+    """Validate the need id refs and group their remote urls per need id.
 
-    if errors:
-        return needextend_texts, errors
+    The marked objects are consumed one by one, so they may come from a stream.
+    Need ids appear in the order of their first occurrence.
 
+    :param validate: Whether to validate the objects against the schema.
+        It can be skipped for objects known to be generated by analyse.
+    """
+    errors: list[str] = []
     # handle N:1 mapping of need_id and remote_url
     id_urls: dict[str, list[str]] = {}
-    for obj in intersted_objs:
-        if obj["type"] == MarkedContentType.need_id_refs.value and obj["need_ids"]:
-            for need_id in obj["need_ids"]:
-                if need_id not in id_urls:
-                    id_urls[need_id] = []
-                if obj["remote_url"]:
-                    id_urls[need_id].append(obj["remote_url"])
+    for obj in marked_objs:
+        if obj["type"] != MarkedContentType.need_id_refs.value:
+            continue
+        if validate:
+            try:
+                obj_errors = MarkedContentSchema.check_obj(obj)
+            except TypeError as e:
+                errors.append(str(e))
+                continue
+            if obj_errors:
+                errors.append(f"{obj} has the following errors:")
+                errors.extend(obj_errors)
+                continue
+        if errors or not obj["need_ids"]:
+            # the result is discarded anyway
+            continue
+
+        remote_url = obj["remote_url"]
+        for need_id in obj["need_ids"]:
+            urls = id_urls.setdefault(need_id, [])
+            if remote_url:
+                urls.append(remote_url)
+
+    if errors:
+        return {}, errors
+    return id_urls, errors
 
+
+def iter_needextend_texts(
+    id_urls: dict[str, list[str]],
+    remote_url_field: str = "remote-url",
+    title: str | None = None,
+) -> Iterator[str]:
+    """Generate the RST text blocks for the grouped remote urls."""
     if title:
-        needextend_texts.append(f"{title}{linesep}{'=' * len(title)}{linesep}{linesep}")
+        yield f"{title}{linesep}{'=' * len(title)}{linesep}{linesep}"
 
     for id, urls in id_urls.items():
         # Connect urls with comma, if there are multiple urls
         if not urls:
             continue
         remote_url = ",".join(urls)
-        needextend_text = NEEDEXTEND_TEMPLATE.safe_substitute(
+        yield NEEDEXTEND_TEMPLATE.safe_substitute(
             need_id=id,
             remote_url_field=remote_url_field,
             remote_url=remote_url,
         )
-        needextend_texts.append(needextend_text)
 
-    return needextend_texts, errors
+
+def convert_marked_content(
+    marked_objs: Iterable[MarkedObjType],
+    remote_url_field: str = "remote-url",
+    title: str | None = None,
+) -> tuple[list[str], list[str]]:
+    """Convert marked objects extracted by analyse CLI to needextend in RST"""
+    id_urls, errors = collect_need_id_urls(marked_objs)
+    if errors:
+        return [], errors
+    return list(iter_needextend_texts(id_urls, remote_url_field, title)), errors
@@ -0,0 +1,92 @@
+"""Convert the generated JSON file created by CodeLinks analyse to a columnar Parquet table."""
+
+from pathlib import Path
+
+from sphinx_codelinks.analyse.models import MarkedContentType, get_scope_text
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+PARQUET_COLUMNS: tuple[str, ...] = (
+    "project",
+    "filepath",
+    "type",
+    "need_id",
+    "start_row",
+    "start_column",
+    "end_row",
+    "end_column",
+    "remote_url",
+    "tagged_scope",
+)
+"""Column order of the generated table."""
+
+ColumnsType = dict[str, list[str | int | None]]
+
+
+def get_need_ids(obj: MarkedObjType) -> list[str | None]:
+    """Get the need ids a marked object refers to, one table row per id.
+
+    Markers without any need id (e.g. marked rst) still produce a single row,
+    so that no marker is lost when the need ids are exploded into rows.
+    """
+    if obj["type"] == MarkedContentType.need_id_refs.value and obj.get("need_ids"):
+        return list(obj["need_ids"])  # type: ignore[arg-type]  # checked above
+    if obj["type"] == MarkedContentType.need.value:
+        need = obj.get("need")
+        if need and need.get("id"):
+            return [str(need["id"])]
+    return [None]
+
+
+def convert_to_columns(marked_content: dict[str, list[MarkedObjType]]) -> ColumnsType:
+    """Flatten the marked content of all projects into columns.
+
+    Need ids are exploded into rows, so every row refers to at most one need id.
+    """
+    columns: ColumnsType = {name: [] for name in PARQUET_COLUMNS}
+    for project, objs in marked_content.items():
+        for obj in objs:
+            source_map = obj["source_map"]
+            for need_id in get_need_ids(obj):
+                columns["project"].append(project)
+                columns["filepath"].append(obj["filepath"])
+                columns["type"].append(obj["type"])
+                columns["need_id"].append(need_id)
+                columns["start_row"].append(source_map["start"]["row"])
+                columns["start_column"].append(source_map["start"]["column"])
+                columns["end_row"].append(source_map["end"]["row"])
+                columns["end_column"].append(source_map["end"]["column"])
+                columns["remote_url"].append(obj["remote_url"])
+                columns["tagged_scope"].append(get_scope_text(obj["tagged_scope"]))
+    return columns
+
+
+def write_parquet(columns: ColumnsType, outpath: Path) -> None:
+    """Write the columns to a Parquet file.
+
+    ``pyarrow`` is an optional dependency, so it is only imported here.
+    """
+    try:
+        import pyarrow as pa  # noqa: PLC0415
+        import pyarrow.parquet as pq  # noqa: PLC0415
+    except ImportError as e:
+        raise ImportError(
+            "Writing Parquet files requires 'pyarrow'. "
+            "Install it with: pip install sphinx-codelinks[parquet]"
+        ) from e
+
+    schema = pa.schema(
+        [
+            ("project", pa.dictionary(pa.int32(), pa.string())),
+            ("filepath", pa.dictionary(pa.int32(), pa.string())),
+            ("type", pa.dictionary(pa.int8(), pa.string())),
+            ("need_id", pa.string()),
+            ("start_row", pa.int64()),
+            ("start_column", pa.int64()),
+            ("end_row", pa.int64()),
+            ("end_column", pa.int64()),
+            ("remote_url", pa.string()),
+            ("tagged_scope", pa.string()),
+        ]
+    )
+    table = pa.Table.from_pydict(columns, schema=schema)
+    pq.write_table(table, outpath)
@@ -0,0 +1,78 @@
+"""Validation of dataclass fields against the JSON schemas in their metadata."""
+
+from collections.abc import Iterator, Mapping
+from dataclasses import MISSING, Field, fields
+from typing import TYPE_CHECKING, Any, cast
+
+if TYPE_CHECKING:
+    from jsonschema import ValidationError
+    from jsonschema.protocols import Validator
+
+SCHEMA_ERROR_TEMPLATE = "Schema validation error in field '{name}': {message}"
+
+
+class FieldsValidator:
+    """One compiled validator for all fields of a dataclass with a ``schema`` metadata.
+
+    The schemas of the fields are combined into the ``properties`` of a single object
+    schema, which is checked and compiled once. Validating an instance is then a single
+    pass over its fields, instead of resolving and compiling a schema per field and value.
+    """
+
+    def __init__(self, dataclass_type: type) -> None:
+        _fields = cast(tuple[Field[object], ...], fields(dataclass_type))
+        self.field_names = frozenset(_field.name for _field in _fields)
+        self.required_names = frozenset(
+            _field.name
+            for _field in _fields
+            if _field.default is MISSING and _field.default_factory is MISSING
+        )
+        self.field_schemas: dict[str, dict[str, Any]] = {  # type: ignore[explicit-any]
+            _field.name: cast(dict[str, Any], _field.metadata["schema"])  # type: ignore[explicit-any]
+            for _field in _fields
+            if _field.metadata and "schema" in _field.metadata
+        }
+        # jsonschema is only imported once something is validated
+        from jsonschema.validators import validator_for  # noqa: PLC0415
+
+        schema = {"type": "object", "properties": self.field_schemas}
+        validator_cls = validator_for(schema)
+        validator_cls.check_schema(schema)
+        self.validator: Validator = validator_cls(schema)
+
+    def iter_field_errors(
+        self, instance: Mapping[str, object]
+    ) -> Iterator[tuple[str, "ValidationError"]]:
+        """Yield the most relevant validation error per invalid field in field order.
+
+        The errors are the same ones ``jsonschema.validate`` raises when validating
+        the value of the field against its schema alone.
+        """
+        from jsonschema.exceptions import best_match  # noqa: PLC0415
+
+        errors: dict[str, list[ValidationError]] = {}
+        for error in self.validator.iter_errors(instance):  # type: ignore[arg-type]  # Mapping is a JSON object
+            errors.setdefault(str(error.path[0]), []).append(error)
+        if not errors:
+            return
+        for name in self.field_schemas:
+            if name in errors:
+                yield name, cast("ValidationError", best_match(errors[name]))
+
+    def check_fields(self, instance: Mapping[str, object], template: str) -> list[str]:
+        """Format the field errors with ``template``, which gets ``name`` and ``message``."""
+        return [
+            template.format(name=name, message=error.message)
+            for name, error in self.iter_field_errors(instance)
+        ]
+
+
+_VALIDATORS: dict[type, FieldsValidator] = {}
+
+
+def get_fields_validator(dataclass_type: type) -> FieldsValidator:
+    """Get the compiled validator of a dataclass, which is only built once."""
+    validator = _VALIDATORS.get(dataclass_type)
+    if validator is None:
+        validator = _VALIDATORS[dataclass_type] = FieldsValidator(dataclass_type)
+    return validator
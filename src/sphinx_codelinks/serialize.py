@@ -0,0 +1,51 @@
+"""JSON serialisation of the files written by CodeLinks.
+
+`orjson <https://pypi.org/project/orjson/>`__ is used if it is installed, e.g. with
+``pip install sphinx-codelinks[orjson]``, and the standard library otherwise.
+Both write the same text, which is the one of orjson: without whitespace between the
+items and with non-ASCII characters unescaped. The files are read and written as UTF-8.
+"""
+
+from dataclasses import is_dataclass
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+ENCODING = "utf-8"
+"""Encoding of the written JSON files."""
+
+
+def _serialize_record(obj: object) -> object:
+    # records such as the analyse warnings are written without copying them to a dict
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return vars(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(
+    ensure_ascii=False,
+    separators=(",", ":"),
+    default=_serialize_record,
+)
+
+
+def get_backend() -> str:
+    """Get the name of the JSON library in use."""
+    return "json" if orjson is None else "orjson"
+
+
+def dumps(obj: object) -> str:
+    """Serialise an object, dataclass instances as objects of their fields."""
+    if orjson is None:
+        return _encoder.encode(obj)
+    return orjson.dumps(obj).decode(ENCODING)
+
+
+def loads(text: str | bytes) -> object:
+    """Deserialise the JSON text of a single value."""
+    if orjson is None:
+        return json.loads(text)
+    return orjson.loads(text)
@@ -0,0 +1,156 @@
+"""Merge of the outputs of a sharded analysis.
+
+The markers and the warnings of one file are produced by a single shard, and each
+shard keeps the order of an analysis of all files. The outputs of the shards are
+therefore merged file by file, giving the same files as a single analysis of the
+same checkout.
+"""
+
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+import heapq
+from itertools import groupby, islice
+from operator import itemgetter
+import os
+from pathlib import Path
+from typing import cast
+
+from sphinx_codelinks import serialize
+from sphinx_codelinks.analyse.analyse import _path_sort_key
+from sphinx_codelinks.analyse.projects import AnalyseProjects
+from sphinx_codelinks.analyse.shard import (
+    ShardError,
+    ShardManifestType,
+    load_manifests,
+    project_modes,
+)
+from sphinx_codelinks.marked_content import (
+    dump_layout_1,
+    dump_layout_2,
+    load_marked_objs,
+    write_digest,
+)
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+
+class _ProjectReader:
+    """Reads the marked objects of a shard project by project."""
+
+    def __init__(self, jsonpath: Path) -> None:
+        self._objs = load_marked_objs(jsonpath)
+        self._head = next(self._objs, None)
+
+    def take(self, project: str) -> Iterator[MarkedObjType]:
+        """Iterate over the marked objects of the given project, the next in the file."""
+        while self._head is not None and self._head[0] == project:
+            obj = self._head[1]
+            self._head = next(self._objs, None)
+            yield obj
+
+    def take_files(
+        self, project: str
+    ) -> Iterator[tuple[list[str], list[MarkedObjType]]]:
+        """Iterate over the marked objects of the given project file by file.
+
+        The objects of a file are given with the sort key of its path.
+        """
+        for filepath, objs in groupby(self.take(project), key=itemgetter("filepath")):
+            yield _path_sort_key(Path(filepath)), list(objs)
+
+    def check_consumed(self) -> None:
+        """Check that the objects of all projects are taken.
+
+        :raises ShardError: if the shard has the objects of another project.
+        """
+        if self._head is not None:
+            raise ShardError(f"Unexpected project {self._head[0]!r} in a shard")
+
+
+def _warning_key(batched: bool) -> Callable[[str], list[str]]:
+    """Get the sort key of the warnings of a project, a line of the warnings file."""
+
+    def key(line: str) -> list[str]:
+        file_path = cast(dict[str, str], serialize.loads(line))["file_path"]
+        if batched:
+            return _path_sort_key(Path(file_path))
+        # the order of the discovered files, which a project not in batches warns in
+        return [os.path.normcase(os.path.normpath(file_path))]
+
+    return key
+
+
+def _merge_warnings(shards: list[tuple[Path, ShardManifestType]], outdir: Path) -> int:
+    """Merge the warnings files of the shards, returning the number of warnings."""
+    warnings_path = outdir / AnalyseProjects.warning_filepath
+    warnings_path.parent.mkdir(parents=True, exist_ok=True)
+    cnt_warnings = 0
+    with ExitStack() as stack:
+        warnings_files = [
+            stack.enter_context(
+                (shard_dir / AnalyseProjects.warning_filepath).open(
+                    "r", encoding=serialize.ENCODING
+                )
+            )
+            for shard_dir, _ in shards
+        ]
+        merged = stack.enter_context(
+            warnings_path.open("w", encoding=serialize.ENCODING)
+        )
+        _, first = shards[0]
+        for project, batched in project_modes(first):
+            # the warnings of the projects follow each other in each file
+            runs = [
+                list(islice(warnings_file, manifest["projects"][project]["warnings"]))
+                for warnings_file, (_, manifest) in zip(
+                    warnings_files, shards, strict=True
+                )
+            ]
+            for line in heapq.merge(*runs, key=_warning_key(batched)):
+                merged.write(line)
+                cnt_warnings += 1
+    return cnt_warnings
+
+
+def merge_shards(
+    shard_dirs: list[Path], outdir: Path, layout: int = 1
+) -> tuple[int, int]:
+    """Merge the outputs of the shards into the given output directory.
+
+    :returns: the number of markers and warnings.
+    :raises ShardError: if the shards are not all shards of the same analysis.
+    """
+    shards = load_manifests(shard_dirs)
+    _, first = shards[0]
+    outdir.mkdir(parents=True, exist_ok=True)
+    output_path = outdir / "marked_content.json"
+    readers = [
+        _ProjectReader(shard_dir / "marked_content.json") for shard_dir, _ in shards
+    ]
+    cnt_markers = 0
+
+    def merge_markers(project: str) -> Iterator[MarkedObjType]:
+        nonlocal cnt_markers
+        # the markers of a file are produced by a single shard
+        for _, objs in heapq.merge(
+            *(reader.take_files(project) for reader in readers), key=itemgetter(0)
+        ):
+            cnt_markers += len(objs)
+            yield from objs
+
+    with output_path.open("w", encoding=serialize.ENCODING) as f:
+        if layout == 2:  # noqa: PLR2004  # the only other layout
+            dump_layout_2(
+                f, ((project, merge_markers(project)) for project in first["projects"])
+            )
+        else:
+            dump_layout_1(
+                f,
+                (
+                    (project, map(serialize.dumps, merge_markers(project)))
+                    for project in first["projects"]
+                ),
+            )
+    for reader in readers:
+        reader.check_consumed()
+    write_digest(output_path)
+    return cnt_markers, _merge_warnings(shards, outdir)
@@ -3,7 +3,7 @@ from enum import Enum
 from pathlib import Path
 from typing import Any, Required, TypedDict, cast
 
-from jsonschema import ValidationError, validate
+from sphinx_codelinks.schema import SCHEMA_ERROR_TEMPLATE, get_fields_validator
 
 COMMENT_FILETYPE = {
     "cpp": ["c", "ci", "cpp", "cc", "cxx", "h", "hpp", "hxx", "hh", "ihl"],
@@ -99,16 +99,12 @@ class SourceDiscoverConfig:
         return None
 
     def check_schema(self) -> list[str]:
-        errors = []
+        values: dict[str, object] = {}
         for _field_name in self.field_names():
-            schema = self.get_schema(_field_name)
             value = getattr(self, _field_name)
             if isinstance(value, Path):  # adapt to json schema restriction
                 value = str(value)
-            try:
-                validate(instance=value, schema=schema)  # type: ignore[arg-type]  # validate has no type specified
-            except ValidationError as e:
-                errors.append(
-                    f"Schema validation error in field '{_field_name}': {e.message}"
-                )
-        return errors
+            values[_field_name] = value
+        return get_fields_validator(type(self)).check_fields(
+            values, SCHEMA_ERROR_TEMPLATE
+        )
@@ -0,0 +1,244 @@
+"""Tracking of the source files which the src-trace directives of a document render.
+
+Instead of a Sphinx dependency on each source file, which re-reads a document on any
+edit of one of them, the fingerprints of the files are kept per document. Before the
+documents are read, the files whose modification time or size changed are analysed,
+and a document is only read again if what it renders of them changed. As the pages
+of the copied source files show the whole file, any change of a file is rendered if
+local URLs are set.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+from sphinx_codelinks.config import CodeLinksConfig
+from sphinx_codelinks.sphinx_extension.pre_analyse import (
+    FileFingerprint,
+    analyse_project,
+    discover_src_files,
+    get_analyse_config,
+    get_commit_rev,
+    get_config_dir,
+    get_tree_cache,
+)
+
+
+@dataclass
+class TracedSources:
+    """The source files of a src-trace directive and their fingerprints."""
+
+    project: str
+    directory: str | None
+    """The directory whose files are traced, relative to the source directory.
+
+    None for a single file, whose path cannot be discovered again.
+    """
+    fingerprints: dict[str, FileFingerprint]
+    revs_head: str | None = None
+    """The current commit when the last commits which changed the files were found.
+
+    None if the remote URLs do not link to them.
+    """
+    remote_revs: dict[str, str] = field(default_factory=dict)
+    """The last commits which changed the files, by their path in the remote URLs."""
+
+
+def get_traced_sources(env: BuildEnvironment) -> dict[str, list[TracedSources]]:
+    """Get the traced source files of the src-trace directives per document."""
+    try:
+        traced_sources: dict[str, list[TracedSources]] = env.codelinks_traced_sources  # type: ignore[attr-defined]
+    except AttributeError:
+        traced_sources = {}
+        env.codelinks_traced_sources = traced_sources  # type: ignore[attr-defined]
+    return traced_sources
+
+
+def note_traced_sources(env: BuildEnvironment, traced: TracedSources) -> None:
+    """Keep the traced source files of a directive of the document being read."""
+    get_traced_sources(env).setdefault(env.docname, []).append(traced)
+
+
+def get_updated_traced_sources(
+    env: BuildEnvironment,
+) -> dict[str, list[TracedSources]]:
+    """Get the traced source files with new fingerprints of the documents not read again.
+
+    They are found before the documents are read and only replace the kept ones after
+    the read phase, in the build process, so that they are pickled with the
+    environment also in a parallel build.
+    """
+    try:
+        updated: dict[str, list[TracedSources]] = env.codelinks_updated_traced_sources  # type: ignore[attr-defined]
+    except AttributeError:
+        updated = {}
+        env.codelinks_updated_traced_sources = updated  # type: ignore[attr-defined]
+    return updated
+
+
+def purge_traced_sources(_app: Sphinx, env: BuildEnvironment, docname: str) -> None:
+    get_traced_sources(env).pop(docname, None)
+    get_updated_traced_sources(env).pop(docname, None)
+
+
+def update_traced_sources(_app: Sphinx, env: BuildEnvironment) -> list[str]:
+    """Keep the new fingerprints of the documents which were not read again.
+
+    These documents are returned as updated, as the environment is only pickled if
+    there are any.
+    """
+    traced_sources = get_traced_sources(env)
+    docnames = []
+    for docname, updated in get_updated_traced_sources(env).items():
+        if traced_sources.get(docname) != updated:
+            traced_sources[docname] = updated
+            docnames.append(docname)
+    del env.codelinks_updated_traced_sources  # type: ignore[attr-defined]
+    return docnames
+
+
+def merge_traced_sources(
+    _app: Sphinx,
+    env: BuildEnvironment,
+    docnames: Iterable[str],
+    other: BuildEnvironment,
+) -> None:
+    traced_sources = get_traced_sources(env)
+    other_traced_sources = get_traced_sources(other)
+    for docname in docnames:
+        if docname in other_traced_sources:
+            traced_sources[docname] = other_traced_sources[docname]
+
+
+def _find_changed_files(
+    traced: TracedSources, src_dir: Path, src_trace_sphinx_config: CodeLinksConfig
+) -> list[Path] | None:
+    """Find the files whose fingerprint may have changed, None if the files changed."""
+    if traced.directory is not None:
+        src_discover_config = src_trace_sphinx_config.projects[traced.project][
+            "source_discover_config"
+        ]
+        src_files = discover_src_files(src_dir / traced.directory, src_discover_config)
+        if {str(src_file) for src_file in src_files} != traced.fingerprints.keys():
+            return None
+    changed_files = []
+    for src_file, fingerprint in traced.fingerprints.items():
+        src_path = Path(src_file)
+        try:
+            stat = src_path.stat()
+        except OSError:
+            return None
+        if not fingerprint.is_unchanged(stat):
+            changed_files.append(src_path)
+    return changed_files
+
+
+def _find_files_to_analyse(
+    traced: TracedSources, config_dir: Path, src_trace_sphinx_config: CodeLinksConfig
+) -> tuple[list[Path], str | None] | None:
+    """Find the files to analyse again and the current commit of the remote URLs.
+
+    None if the document is outdated anyway.
+    """
+    src_trace_conf = src_trace_sphinx_config.projects[traced.project]
+    src_dir = (config_dir / src_trace_conf["source_discover_config"].src_dir).resolve()
+    src_files = _find_changed_files(traced, src_dir, src_trace_sphinx_config)
+    if src_files is None or (src_files and src_trace_sphinx_config.set_local_url):
+        return None
+    revs_head = traced.revs_head
+    if revs_head is not None:
+        revs_head = get_commit_rev(config_dir, src_trace_conf)
+        if revs_head != traced.revs_head:
+            # a new commit may have changed the last commits of unchanged files
+            src_files = [Path(src_file) for src_file in traced.fingerprints]
+    return src_files, revs_head
+
+
+def _compare_fingerprints(
+    project: str,
+    project_files: dict[Path, set[str]],
+    fingerprints: dict[Path, FileFingerprint],
+    updated: dict[str, list[TracedSources]],
+    outdated: set[str],
+) -> None:
+    """Add the documents which render the analysed files differently to the outdated.
+
+    The other documents keep the new fingerprints of the files.
+    """
+    for src_file, docnames in project_files.items():
+        fingerprint = fingerprints[src_file]
+        for docname in docnames - outdated:
+            for traced in updated[docname]:
+                old_fingerprint = traced.fingerprints.get(str(src_file))
+                if old_fingerprint is None or traced.project != project:
+                    continue
+                if old_fingerprint.digest != fingerprint.digest:
+                    outdated.add(docname)
+                    break
+                # not analysed again as long as the file is not changed again
+                traced.fingerprints[str(src_file)] = fingerprint
+
+
+def find_outdated_docs(
+    app: Sphinx,
+    env: BuildEnvironment,
+    _added: set[str],
+    changed: set[str],
+    removed: set[str],
+) -> set[str]:
+    """Find the documents whose src-trace directives render changed source files."""
+    src_trace_sphinx_config = CodeLinksConfig.from_sphinx(app.config)
+    projects = src_trace_sphinx_config.projects
+    config_dir = get_config_dir(Path(app.confdir), src_trace_sphinx_config)
+    outdated: set[str] = set()
+    # the traced sources with the new fingerprints, per document
+    updated = get_updated_traced_sources(env)
+    updated.clear()
+    # the documents of the changed files, per project and file
+    changed_files: dict[str, dict[Path, set[str]]] = {}
+    for docname, traced_sources in get_traced_sources(env).items():
+        if docname in changed or docname in removed:
+            continue
+        updated_sources = []
+        for traced in traced_sources:
+            if traced.project not in projects:
+                outdated.add(docname)
+                break
+            found = _find_files_to_analyse(traced, config_dir, src_trace_sphinx_config)
+            if found is None:
+                outdated.add(docname)
+                break
+            src_files, revs_head = found
+            # the kept ones are not changed before the documents are read
+            updated_sources.append(
+                replace(
+                    traced, fingerprints=dict(traced.fingerprints), revs_head=revs_head
+                )
+            )
+            project_files = changed_files.setdefault(traced.project, {})
+            for src_file in src_files:
+                project_files.setdefault(src_file, set()).add(docname)
+        else:
+            updated[docname] = updated_sources
+
+    for project, project_files in changed_files.items():
+        src_trace_conf = projects[project]
+        src_dir = (
+            config_dir / src_trace_conf["source_discover_config"].src_dir
+        ).resolve()
+        analysis = analyse_project(
+            project,
+            get_analyse_config(
+                config_dir, src_trace_conf, src_dir, list(project_files)
+            ),
+            get_tree_cache(app),
+        )
+        _compare_fingerprints(
+            project, project_files, analysis.fingerprints, updated, outdated
+        )
+    for docname in outdated:
+        updated.pop(docname, None)
+    return outdated
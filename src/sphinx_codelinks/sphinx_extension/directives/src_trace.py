@@ -1,30 +1,73 @@
 from collections.abc import Callable
-from dataclasses import replace
-import os
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, ClassVar, cast
 
 from docutils import nodes
 from docutils.parsers.rst import directives
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
 from sphinx.util import logging
 from sphinx.util.docutils import SphinxDirective
 from sphinx_needs.api import add_need  # type: ignore[import-untyped]
 from sphinx_needs.utils import add_doc  # type: ignore[import-untyped]
 
-from sphinx_codelinks.analyse.analyse import SourceAnalyse
-from sphinx_codelinks.analyse.models import OneLineNeed
+from sphinx_codelinks.analyse.analyse import AnalyseWarning, WarningLimit
+from sphinx_codelinks.analyse.models import SourceMap
 from sphinx_codelinks.config import (
     CodeLinksConfig,
     CodeLinksProjectConfigType,
     file_lineno_href,
 )
 from sphinx_codelinks.source_discover.config import SourceDiscoverConfig
-from sphinx_codelinks.source_discover.source_discover import SourceDiscover
 from sphinx_codelinks.sphinx_extension.debug import measure_time
+from sphinx_codelinks.sphinx_extension.dependencies import (
+    TracedSources,
+    note_traced_sources,
+)
+from sphinx_codelinks.sphinx_extension.pre_analyse import (
+    TracedNeed,
+    analyse_project,
+    discover_src_files,
+    get_analyse_config,
+    get_config_dir,
+    get_pre_analysed,
+    get_tree_cache,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def log_analyse_warning(warning: AnalyseWarning) -> None:
+    logger.warning(
+        f"{warning.file_path}:{warning.lineno}: {warning.msg}",
+        type=warning.type,
+        subtype=warning.sub_type,
+    )
+
+
+def init_analyse_warnings(app: Sphinx) -> None:
+    """Create the limit of the analyse warnings of a build.
+
+    The warnings are emitted as they are produced, up to ``src_trace_max_warnings``
+    per build, also when several builds run in the same process.
+    """
+    max_warnings = CodeLinksConfig.from_sphinx(app.config).max_warnings
+    app.env.codelinks_analyse_warnings = WarningLimit(  # type: ignore[attr-defined]
+        log_analyse_warning, max_warnings
+    )
+
+
+def get_analyse_warnings(env: BuildEnvironment) -> WarningLimit:
+    """Get the limit of the analyse warnings of the build."""
+    try:
+        analyse_warnings: WarningLimit = env.codelinks_analyse_warnings  # type: ignore[attr-defined]
+    except AttributeError:
+        init_analyse_warnings(env.app)
+        analyse_warnings = env.codelinks_analyse_warnings  # type: ignore[attr-defined]
+    return analyse_warnings
+
+
 def get_rel_path(doc_path: Path, code_path: Path, base_dir: Path) -> tuple[Path, Path]:
     """Get the relative path from the document to the source code file and vice versa."""
     doc_depth = len(doc_path.parents) - 1
@@ -34,26 +77,27 @@ def get_rel_path(doc_path: Path, code_path: Path, base_dir: Path) -> tuple[Path,
     return src_rel_path, doc_rel_path.with_suffix(".html")
 
 
-def generate_str_link_name(
-    oneline_need: OneLineNeed,
-    target_filepath: Path,
-    dirs: dict[str, Path],
-    local: bool = False,
-) -> str:
-    if oneline_need.source_map["start"]["row"] == oneline_need.source_map["end"]["row"]:
-        lineno = f"L{oneline_need.source_map['start']['row'] + 1}"
-    else:
-        lineno = f"L{oneline_need.source_map['start']['row'] + 1}-L{oneline_need.source_map['end']['row'] + 1}"
-    # url = str(target_filepath.relative_to(target_dir)) + f"#{lineno}"
-    if local:
-        url = str(target_filepath) + f"#{lineno}"
-    else:
-        remote_path = dirs["remote_src_dir"] / target_filepath.relative_to(
-            dirs["target_dir"]
-        )
-        url = f"{remote_path!s}#{lineno}"
+def get_lineno_anchor(source_map: SourceMap) -> str:
+    """Get the line anchor of a need, ``L3`` or ``L3-L5`` for several lines."""
+    start_row = source_map["start"]["row"] + 1
+    end_row = source_map["end"]["row"] + 1
+    if start_row == end_row:
+        return f"L{start_row}"
+    return f"L{start_row}-L{end_row}"
+
 
-    return url
+@dataclass
+class FileLinks:
+    """The parts of the link names which the needs of a source file share."""
+
+    local_path: str | None
+    """The path of the copied file relative to the document, if local URLs are set."""
+    remote_path: str | None
+    """The path of the file in the remote repository, if remote URLs are set."""
+    target_filepath: str
+    """The path of the copied file, which the page of the file is generated for."""
+    docs_href: str
+    """The link from the page of the copied file to the document."""
 
 
 def validate_option(options: dict[str, str]) -> None:
@@ -100,35 +144,23 @@ class SourceTracingDirective(SphinxDirective):
 
         source_files = self.get_src_files(self.options, src_dir, src_discover_config)
 
-        # add source files into the dependency
-        # https://www.sphinx-doc.org/en/master/extdev/envapi.html#sphinx.environment.BuildEnvironment.note_dependency
-        for source_file in source_files:
-            self.env.note_dependency(str(source_file.resolve()))
-
-        # ``analyse_config`` is stored in the ``src_trace_projects`` config value,
-        # which is registered with ``rebuild="env"`` and therefore persisted into
-        # ``environment.pickle``. Mutating it in place would make Sphinx compare the
-        # build-populated object against the freshly generated (empty) config on the
-        # next build and report ``[config changed ('src_trace_projects')]`` every
-        # time, forcing a full re-read. Build a per-directive copy instead so the
-        # stored config value stays equal to what ``generate_project_configs`` yields.
-        base_analyse_config = src_trace_conf["analyse_config"]
-        # git_root shall be relative to the config file's location (if provided)
-        git_root = base_analyse_config.git_root
-        if git_root:
-            conf_dir = Path(self.env.app.confdir)
-            if src_trace_sphinx_config.config_from_toml:
-                src_trace_toml_path = Path(src_trace_sphinx_config.config_from_toml)
-                conf_dir = conf_dir / src_trace_toml_path.parent
-            git_root = (conf_dir / git_root).resolve()
-        analyse_config = replace(
-            base_analyse_config,
-            src_dir=src_dir,
-            src_files=source_files,
-            git_root=git_root,
-        )
-        src_analyse = SourceAnalyse(analyse_config, name=project)
-        src_analyse.run()
+        analysis = get_pre_analysed(self.env.app).get(project)
+        if analysis is None or not analysis.covers(source_files):
+            # the project was not analysed before reading, or not these files
+            config_dir = get_config_dir(
+                Path(self.env.app.confdir), src_trace_sphinx_config
+            )
+            analyse_config = get_analyse_config(
+                config_dir, src_trace_conf, src_dir, source_files
+            )
+            analysis = analyse_project(
+                project, analyse_config, get_tree_cache(self.env.app)
+            )
+        git_root = analysis.git_root
+        oneline_needs, warnings = analysis.lookup(source_files)
+        analyse_warnings = get_analyse_warnings(self.env)
+        for warning in warnings:
+            analyse_warnings(warning)
 
         dirs = {
             "src_dir": src_dir,
@@ -136,52 +168,47 @@ class SourceTracingDirective(SphinxDirective):
             "target_dir": target_dir,
         }
 
-        # inject needs_string_links config before add_need()
-        # https://sphinx-needs.readthedocs.io/en/latest/configuration.html#needs-string-links
-        # local URL
+        # the needs_string_links of the URL fields are registered at builder-inited
         local_url_field = None
         remote_url_field = None
         if src_trace_sphinx_config.set_local_url:
             local_url_field = src_trace_sphinx_config.local_url_field
-            to_remove_str = f"{out_dir!s}{os.sep}"
-            if os.name == "nt":
-                to_remove_str = to_remove_str.replace("\\", "\\\\")
-            self.env.config.needs_string_links[local_url_field] = {
-                "regex": r"^(?P<value>.+?)\.[^\.]+#L(?P<lineno>\d+)",
-                "link_url": ("{{value}}.html#L-{{lineno}}"),
-                "link_name": f"{{{{value | replace('{to_remove_str}', '')}}}}#L{{{{lineno}}}}",
-                "options": [local_url_field],
-            }
         if (
             src_trace_sphinx_config.set_remote_url
             and src_trace_conf["remote_url_pattern"]
         ):
             remote_url_field = src_trace_sphinx_config.remote_url_field
-            if not src_analyse.git_root:
-                # No git root found, use the source directory as the remote source directory
-                remote_src_dir = src_dir
-            else:
-                remote_src_dir = src_dir.relative_to(src_analyse.git_root)
+            # without a git root, the source directory is the remote source directory
+            remote_src_dir = src_dir.relative_to(git_root) if git_root else src_dir
             dirs["remote_src_dir"] = remote_src_dir
-            remote_url_pattern = src_trace_conf["remote_url_pattern"].format(
-                commit=src_analyse.git_commit_rev,
-                # path=f"{remote_src_dir}/" + "{{value}}",
-                path="{{value}}",
-                line="{{lineno}}",
-            )
-            self.env.config.needs_string_links[remote_url_field] = {
-                "regex": r"^(?P<value>.+)#L(?P<lineno>.*)?",
-                "link_url": remote_url_pattern,
-                "link_name": "{{value}}#L{{lineno}}",
-                "options": [remote_url_field],
+            # the string link of the field links to the last commits of the files
+            remote_revs = {
+                str(remote_src_dir / src_file.relative_to(src_dir)): rev
+                for src_file in source_files
+                if (rev := analysis.file_revs.get(src_file))
             }
+        else:
+            remote_revs = {}
+
+        # the document is read again if what it renders of the source files changes,
+        # instead of on any change of them as with a Sphinx dependency
+        note_traced_sources(
+            self.env,
+            TracedSources(
+                project,
+                None if "file" in self.options else self.options.get("directory", "./"),
+                {
+                    str(src_file): analysis.fingerprints[src_file]
+                    for src_file in source_files
+                },
+                analysis.revs_head,
+                remote_revs,
+            ),
+        )
 
         # render needs from the source files
         rendered_needs = self.render_needs(
-            src_analyse,
-            local_url_field,
-            remote_url_field,
-            dirs,
+            oneline_needs, local_url_field, remote_url_field, dirs
         )
 
         # for post-processing of need links
@@ -211,17 +238,7 @@ class SourceTracingDirective(SphinxDirective):
             else:
                 additional_options["directory"] = directory
             dir_path = src_dir / directory
-            # create a new config for the specified directory
-            src_discover = SourceDiscoverConfig(
-                dir_path,
-                gitignore=src_discover_config.gitignore,
-                include=src_discover_config.include,
-                exclude=src_discover_config.exclude,
-                follow_links=src_discover_config.follow_links,
-                comment_type=src_discover_config.comment_type,
-            )
-            source_discover = SourceDiscover(src_discover)
-            source_files.extend(source_discover.source_paths)
+            source_files.extend(discover_src_files(dir_path, src_discover_config))
 
         return source_files
 
@@ -232,97 +249,95 @@ class SourceTracingDirective(SphinxDirective):
     ) -> Path:
         """Locate the source directory based on the configuration."""
         #  src dir in src_trace_conf is relative to conf_dir by default
-        conf_dir = Path(self.env.app.confdir)
-        # if config toml file is used, src dir is relative to the config toml
-        if src_trace_sphinx_config.config_from_toml:
-            src_trace_toml_path = Path(src_trace_sphinx_config.config_from_toml)
-            conf_dir = conf_dir / src_trace_toml_path.parent
-
+        conf_dir = get_config_dir(Path(self.env.app.confdir), src_trace_sphinx_config)
         src_dir = (conf_dir / src_discover_config.src_dir).resolve()
         return src_dir
 
+    def get_file_links(
+        self,
+        filepath: Path,
+        local_url_field: str | None,
+        remote_url_field: str | None,
+        dirs: dict[str, Path],
+    ) -> FileLinks:
+        """Get the shared parts of the link names of the needs of a source file."""
+        target_filepath = dirs["target_dir"] / filepath.relative_to(dirs["src_dir"])
+        local_path = None
+        remote_path = None
+        docs_href = ""
+        if local_url_field:
+            # copy files to _build/html
+            target_filepath.parent.mkdir(parents=True, exist_ok=True)
+            target_filepath.write_text(filepath.read_text())
+            # calculate the relative path from the current doc to the target file
+            local_rel_path, doc_rel_path = get_rel_path(
+                Path(self.env.docname), target_filepath, dirs["out_dir"]
+            )
+            local_path = str(local_rel_path)
+            docs_href = str(doc_rel_path)
+        if remote_url_field:
+            remote_path = str(
+                dirs["remote_src_dir"] / target_filepath.relative_to(dirs["target_dir"])
+            )
+        return FileLinks(local_path, remote_path, str(target_filepath), docs_href)
+
     def render_needs(
         self,
-        src_analyse: SourceAnalyse,
+        oneline_needs: list[TracedNeed],
         local_url_field: str | None,
         remote_url_field: str | None,
         dirs: dict[str, Path],
     ) -> list[nodes.Node]:
-        """Render the needs from the virtual docs"""
-        rendered_needs: list[nodes.Node] = []
-        for oneline_need in src_analyse.oneline_needs:
-            # # add source files into the dependency
-            # # https://www.sphinx-doc.org/en/master/extdev/envapi.html#sphinx.environment.BuildEnvironment.note_dependency
-            # self.env.note_dependency(str(oneline_need.filepath.resolve()))
-
-            filepath = src_analyse.analyse_config.src_dir / oneline_need.filepath
-            target_filepath = dirs["target_dir"] / filepath.relative_to(dirs["src_dir"])
+        """Render the needs from the virtual docs.
 
-            # mapping between lineno and need link in docs for local url
-
-            # The link to the documentation page for the source file
-
-            if local_url_field:
-                # copy files to _build/html
-                target_filepath.parent.mkdir(parents=True, exist_ok=True)
-                target_filepath.write_text(filepath.read_text())
-            local_link_name = None
-            remote_link_name = None
-            if local_url_field:
-                # generate link name
-                # calculate the relative path from the current doc to the target file
-                local_rel_path, docs_href = get_rel_path(
-                    Path(self.env.docname), target_filepath, dirs["out_dir"]
-                )
-                local_link_name = generate_str_link_name(
-                    oneline_need,
-                    local_rel_path,
+        The paths in the link names are computed, and the files copied, once per file.
+        """
+        rendered_needs: list[nodes.Node] = []
+        file_links: dict[Path, FileLinks] = {}
+        for oneline_need in oneline_needs:
+            links = file_links.get(oneline_need.filepath)
+            if links is None:
+                links = self.get_file_links(
+                    oneline_need.filepath,
+                    local_url_field,
+                    remote_url_field,
                     dirs,
-                    local=True,
                 )
-            if remote_url_field:
-                remote_link_name = generate_str_link_name(
-                    oneline_need, target_filepath, dirs, local=False
+                file_links[oneline_need.filepath] = links
+            if not oneline_need.need:
+                continue
+
+            # render needs from one-line marker
+            kwargs: dict[str, str | list[str]] = {
+                field_name: field_value
+                for field_name, field_value in oneline_need.need.items()
+                # title and type are mandatory for add_need()
+                if field_name not in ("title", "type")
+            }
+            lineno = get_lineno_anchor(oneline_need.source_map)
+            if local_url_field and links.local_path is not None:
+                kwargs[local_url_field] = f"{links.local_path}#{lineno}"
+            if remote_url_field and links.remote_path is not None:
+                kwargs[remote_url_field] = f"{links.remote_path}#{lineno}"
+
+            need_nodes: list[nodes.Node] = add_need(
+                app=self.env.app,  # The Sphinx application object
+                state=self.state,  # The docutils state object
+                docname=self.env.docname,  # The current document name
+                lineno=self.lineno,  # The line number where the directive is used
+                need_type=str(oneline_need.need["type"]),  # The type of the need
+                title=str(oneline_need.need["title"]),  # The title of the need
+                **cast(dict[str, Any], kwargs),  # type: ignore[explicit-any]
+            )
+            rendered_needs.extend(need_nodes)
+            if local_url_field:
+                # save the mapping of need links and line numbers of source codes
+                # for the later use in `html-collect-pages`
+                lineno_href = file_lineno_href.mappings.setdefault(
+                    links.target_filepath, {}
                 )
-
-            if oneline_need.need:
-                # render needs from one-line marker
-                kwargs: dict[str, str | list[str]] = {
-                    field_name: field_value
-                    for field_name, field_value in oneline_need.need.items()
-                    if field_name
-                    not in [
-                        "title",
-                        "type",
-                    ]  # title and type are mandatory for add_need()
-                }
-
-                if local_url_field and local_link_name is not None:
-                    kwargs[local_url_field] = local_link_name
-                if remote_url_field and remote_link_name is not None:
-                    kwargs[remote_url_field] = remote_link_name
-
-                oneline_needs: list[nodes.Node] = add_need(
-                    app=self.env.app,  # The Sphinx application object
-                    state=self.state,  # The docutils state object
-                    docname=self.env.docname,  # The current document name
-                    lineno=self.lineno,  # The line number where the directive is used
-                    need_type=str(oneline_need.need["type"]),  # The type of the need
-                    title=str(oneline_need.need["title"]),  # The title of the need
-                    **cast(dict[str, Any], kwargs),  # type: ignore[explicit-any]
+                lineno_href[oneline_need.source_map["start"]["row"] + 1] = (
+                    f"{links.docs_href}#{oneline_need.need['id']}"
                 )
-                rendered_needs.extend(oneline_needs)
-                if local_url_field:
-                    # save the mapping of need links and line numbers of source codes
-                    # for the later use in `html-collect-pages`
-                    if str(target_filepath) not in file_lineno_href.mappings:
-                        file_lineno_href.mappings[str(target_filepath)] = {
-                            oneline_need.source_map["start"]["row"]
-                            + 1: f"{docs_href}#{oneline_need.need['id']}"
-                        }
-                    else:
-                        file_lineno_href.mappings[str(target_filepath)][
-                            oneline_need.source_map["start"]["row"] + 1
-                        ] = f"{docs_href}#{oneline_need.need['id']}"
 
         return rendered_needs
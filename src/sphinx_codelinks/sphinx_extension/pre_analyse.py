@@ -0,0 +1,351 @@
+"""Analysis of the src-trace projects before the documents are read.
+
+The projects referenced by the documents to read are analysed concurrently in a
+process pool, so that each ``src-trace`` directive only looks up the one-line needs of
+its files. The projects are found by a search of the documents for the ``:project:``
+option, which is a best-effort prefetch only: a directive whose project was not found,
+or whose files are not part of the analysis of its project, e.g. a file excluded from
+the source discovery, analyses them itself.
+"""
+
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+import hashlib
+import multiprocessing
+import os
+from pathlib import Path
+import re
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+from sphinx_codelinks import logger as codelinks_logger
+from sphinx_codelinks import serialize
+from sphinx_codelinks.analyse import utils
+from sphinx_codelinks.analyse.analyse import AnalyseWarning, SourceAnalyse
+from sphinx_codelinks.analyse.incremental import TreeCache
+from sphinx_codelinks.analyse.models import (
+    OneLineNeed,
+    ScopeSummary,
+    SourceMap,
+    get_scope_text,
+)
+from sphinx_codelinks.config import (
+    CodeLinksConfig,
+    CodeLinksProjectConfigType,
+    RemoteUrlRev,
+    SourceAnalyseConfig,
+)
+from sphinx_codelinks.source_discover.config import SourceDiscoverConfig
+from sphinx_codelinks.source_discover.source_discover import SourceDiscover
+
+# the option of src-trace in reStructuredText and MyST, only to prefetch the analyses
+PROJECT_OPTION = re.compile(r"^\s*:project:\s*(\S+)", re.MULTILINE)
+
+
+@dataclass
+class TracedNeed:
+    """The parts of a one-line need which src-trace renders, without the parsed tree."""
+
+    filepath: Path
+    source_map: SourceMap
+    need: dict[str, str | list[str]]
+    tagged_scope: str | ScopeSummary | None = None
+    """The tagged scope in the ``tagged_scope_format`` of the project."""
+
+    @classmethod
+    def from_oneline_need(cls, oneline_need: OneLineNeed) -> "TracedNeed":
+        src_file = oneline_need.source_comment.source_file
+        tagged_scope = (
+            src_file.get_scope(oneline_need.tagged_scope)
+            if src_file is not None and oneline_need.tagged_scope is not None
+            else None
+        )
+        return cls(
+            oneline_need.filepath,
+            oneline_need.source_map,
+            oneline_need.need,
+            tagged_scope,
+        )
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """A source file as it was analysed, to find out whether src-trace renders it differently."""
+
+    mtime_ns: int
+    size: int
+    digest: str
+    """The digest of the one-line needs, their lines and tagged scopes, the warnings, and
+    the commit which the remote URLs of the file link to if it is not the current one."""
+
+    def is_unchanged(self, stat: os.stat_result) -> bool:
+        """Check whether the file still has the modification time and size it had."""
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+
+def digest_needs(
+    needs: list[TracedNeed],
+    warnings: list[AnalyseWarning],
+    commit_rev: str | None = None,
+) -> str:
+    """Digest what src-trace renders of the needs and emits of the warnings of a file.
+
+    The tagged scopes are digested as the project writes them, so that with the
+    ``summary`` format only a change of their kind, name or position counts.
+    """
+    rendered = (
+        [
+            [need.need, need.source_map, get_scope_text(need.tagged_scope)]
+            for need in needs
+        ],
+        [[warning.lineno, warning.sub_type, warning.msg] for warning in warnings],
+        commit_rev,
+    )
+    return hashlib.blake2b(
+        serialize.dumps(rendered).encode(serialize.ENCODING), digest_size=16
+    ).hexdigest()
+
+
+@dataclass
+class ProjectAnalysis:
+    """The one-line needs and warnings of the files of a project."""
+
+    git_root: Path | None
+    needs: dict[Path, list[TracedNeed]]
+    """The one-line needs per analysed file, ordered by their row."""
+    warnings: dict[Path, list[AnalyseWarning]]
+    """The warnings per analysed file, ordered by their position."""
+    fingerprints: dict[Path, FileFingerprint]
+    """The fingerprints of the analysed files."""
+    file_revs: dict[Path, str]
+    """The last commits which changed the files, if the remote URLs link to them."""
+    revs_head: str | None
+    """The current commit the last commits were found at, None if they are not linked."""
+
+    def covers(self, src_files: list[Path]) -> bool:
+        """Check whether all given files were analysed."""
+        return all(src_file in self.needs for src_file in src_files)
+
+    def lookup(
+        self, src_files: list[Path]
+    ) -> tuple[list[TracedNeed], list[AnalyseWarning]]:
+        """Get the needs and warnings of the given files, which were analysed.
+
+        The needs are ordered by their row, as those of :meth:`SourceAnalyse.run`.
+        """
+        needs = [need for src_file in src_files for need in self.needs[src_file]]
+        # stable, so that needs of the same row stay in the order of the files
+        needs.sort(key=lambda need: need.source_map["start"]["row"])
+        warnings = [
+            warning
+            for src_file in src_files
+            for warning in self.warnings.get(src_file, [])
+        ]
+        return needs, warnings
+
+
+def get_pre_analysed(app: Sphinx) -> dict[str, ProjectAnalysis]:
+    """Get the analyses of the projects of the documents being read, by project name.
+
+    They are kept on the application, not on the environment, which is pickled by
+    the processes of a parallel read.
+    """
+    try:
+        pre_analysed: dict[str, ProjectAnalysis] = app.codelinks_pre_analysed  # type: ignore[attr-defined]
+    except AttributeError:
+        pre_analysed = {}
+        app.codelinks_pre_analysed = pre_analysed  # type: ignore[attr-defined]
+    return pre_analysed
+
+
+def get_tree_cache(app: Sphinx) -> TreeCache | None:
+    """Get the parsed trees of the source files analysed in the build process.
+
+    The files which are analysed again, e.g. to find the outdated documents and then
+    to read them, or in a later build of the same application, are only re-parsed
+    where they changed. None if ``tree_cache_size`` is 0.
+    """
+    try:
+        tree_cache: TreeCache | None = app.codelinks_tree_cache  # type: ignore[attr-defined]
+    except AttributeError:
+        tree_cache_size = CodeLinksConfig.from_sphinx(app.config).tree_cache_size
+        tree_cache = TreeCache(tree_cache_size) if tree_cache_size else None
+        app.codelinks_tree_cache = tree_cache  # type: ignore[attr-defined]
+    return tree_cache
+
+
+def get_config_dir(confdir: Path, src_trace_sphinx_config: CodeLinksConfig) -> Path:
+    """Get the directory which the paths of the projects are relative to."""
+    # if config toml file is used, the paths are relative to the config toml
+    if src_trace_sphinx_config.config_from_toml:
+        src_trace_toml_path = Path(src_trace_sphinx_config.config_from_toml)
+        return confdir / src_trace_toml_path.parent
+    return confdir
+
+
+def discover_src_files(
+    dir_path: Path, src_discover_config: SourceDiscoverConfig
+) -> list[Path]:
+    """Discover the source files of a directory with the settings of a project."""
+    src_discover = SourceDiscoverConfig(
+        dir_path,
+        gitignore=src_discover_config.gitignore,
+        include=src_discover_config.include,
+        exclude=src_discover_config.exclude,
+        follow_links=src_discover_config.follow_links,
+        comment_type=src_discover_config.comment_type,
+    )
+    return SourceDiscover(src_discover).source_paths
+
+
+def get_analyse_config(
+    config_dir: Path,
+    src_trace_conf: CodeLinksProjectConfigType,
+    src_dir: Path,
+    src_files: list[Path],
+) -> SourceAnalyseConfig:
+    """Get the analyse config of a project for the given source files."""
+    # ``analyse_config`` is stored in the ``src_trace_projects`` config value,
+    # which is registered with ``rebuild="env"`` and therefore persisted into
+    # ``environment.pickle``. Mutating it in place would make Sphinx compare the
+    # build-populated object against the freshly generated (empty) config on the
+    # next build and report ``[config changed ('src_trace_projects')]`` every
+    # time, forcing a full re-read. Build a copy instead so the stored config
+    # value stays equal to what ``generate_project_configs`` yields.
+    base_analyse_config = src_trace_conf["analyse_config"]
+    # git_root shall be relative to the config file's location (if provided)
+    git_root = base_analyse_config.git_root
+    if git_root:
+        git_root = (config_dir / git_root).resolve()
+    return replace(
+        base_analyse_config,
+        src_dir=src_dir,
+        src_files=src_files,
+        git_root=git_root,
+    )
+
+
+def get_commit_rev(
+    config_dir: Path, src_trace_conf: CodeLinksProjectConfigType
+) -> str | None:
+    """Get the commit of the git repository of a project, as its analysis does."""
+    src_dir = (config_dir / src_trace_conf["source_discover_config"].src_dir).resolve()
+    git_root = get_analyse_config(config_dir, src_trace_conf, src_dir, []).git_root
+    if git_root is None:
+        git_root = utils.locate_git_root(src_dir)
+    return utils.get_current_rev(git_root) if git_root else None
+
+
+def analyse_project(
+    name: str,
+    analyse_config: SourceAnalyseConfig,
+    tree_cache: TreeCache | None = None,
+) -> ProjectAnalysis:
+    """Analyse the source files of a project and keep what src-trace renders."""
+    # the files are stated before they are read, so that a later change is found
+    stats = {src_file: src_file.stat() for src_file in analyse_config.src_files}
+    src_analyse = SourceAnalyse(analyse_config, name=name, tree_cache=tree_cache)
+    src_analyse.run()
+    needs: dict[Path, list[TracedNeed]] = {
+        src_file: [] for src_file in analyse_config.src_files
+    }
+    for oneline_need in src_analyse.oneline_needs:
+        needs.setdefault(oneline_need.filepath, []).append(
+            TracedNeed.from_oneline_need(oneline_need)
+        )
+    warnings: dict[Path, list[AnalyseWarning]] = {}
+    for warning in src_analyse.oneline_warnings:
+        warnings.setdefault(Path(warning.file_path), []).append(warning)
+    file_revs = src_analyse.git_file_revs
+    fingerprints = {
+        src_file: FileFingerprint(
+            stat.st_mtime_ns,
+            stat.st_size,
+            digest_needs(
+                needs[src_file], warnings.get(src_file, []), file_revs.get(src_file)
+            ),
+        )
+        for src_file, stat in stats.items()
+    }
+    revs_head = (
+        src_analyse.git_commit_rev
+        if analyse_config.remote_url_rev == RemoteUrlRev.last_change
+        else None
+    )
+    return ProjectAnalysis(
+        src_analyse.git_root, needs, warnings, fingerprints, file_revs, revs_head
+    )
+
+
+def _analyse_project_in_worker(
+    name: str, analyse_config: SourceAnalyseConfig
+) -> tuple[ProjectAnalysis, list[codelinks_logger.Record]]:
+    # the log records are emitted by the build process
+    with codelinks_logger.recording() as records:
+        analysis = analyse_project(name, analyse_config)
+    return analysis, records
+
+
+def find_traced_projects(env: BuildEnvironment, docnames: Iterable[str]) -> set[str]:
+    """Find the projects of the src-trace directives in the given documents.
+
+    The sources are only searched for the ``:project:`` option, the projects of
+    directives in included files or generated content are not found. This is good
+    enough to prefetch the analyses, the directives analyse the missing ones.
+    """
+    projects: set[str] = set()
+    for docname in docnames:
+        try:
+            text = Path(env.doc2path(docname)).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        if "src-trace" in text:
+            projects.update(PROJECT_OPTION.findall(text))
+    return projects
+
+
+def pre_analyse(app: Sphinx, env: BuildEnvironment, docnames: list[str]) -> None:
+    """Analyse the projects of the documents to read, concurrently if there are several."""
+    pre_analysed = get_pre_analysed(app)
+    pre_analysed.clear()
+    src_trace_sphinx_config = CodeLinksConfig.from_sphinx(app.config)
+    if not src_trace_sphinx_config.pre_analyse:
+        return
+    projects = src_trace_sphinx_config.projects
+    names = sorted(find_traced_projects(env, docnames) & projects.keys())
+    if not names:
+        return
+
+    config_dir = get_config_dir(Path(app.confdir), src_trace_sphinx_config)
+    analyse_configs = {}
+    for name in names:
+        src_trace_conf = projects[name]
+        src_discover_config = src_trace_conf["source_discover_config"]
+        src_dir = (config_dir / src_discover_config.src_dir).resolve()
+        src_files = discover_src_files(src_dir, src_discover_config)
+        analyse_configs[name] = get_analyse_config(
+            config_dir, src_trace_conf, src_dir, src_files
+        )
+
+    if len(names) == 1:
+        pre_analysed[names[0]] = analyse_project(
+            names[0], analyse_configs[names[0]], get_tree_cache(app)
+        )
+        return
+    max_workers = min(len(names), os.cpu_count() or 1)
+    # not forked from the build process, which may run threads
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers, mp_context=mp_context) as executor:
+        results = executor.map(
+            _analyse_project_in_worker, names, analyse_configs.values()
+        )
+        for name, (analysis, records) in zip(names, results, strict=True):
+            codelinks_logger.replay(records)
+            pre_analysed[name] = analysis
+
+
+def clear_pre_analysis(app: Sphinx, _env: BuildEnvironment) -> None:
+    """Release the analyses once all documents are read."""
+    get_pre_analysed(app).clear()
@@ -1,6 +1,7 @@
 from collections.abc import Iterator  # only in python 3.11 afterwards
 import contextlib
 from inspect import signature
+import os
 from pathlib import Path
 from timeit import default_timer as timer  # Used for timing measurements
 import tomllib
@@ -16,26 +17,45 @@ from sphinx_needs.api import (  # type: ignore[import-untyped]
     add_need_type,
 )
 
+from sphinx_codelinks.analyse import utils
 from sphinx_codelinks.analyse.projects import AnalyseProjects
 from sphinx_codelinks.config import (
     SRC_TRACE_CACHE,
     CodeLinksConfig,
     CodeLinksConfigType,
     CodeLinksProjectConfigType,
+    RemoteUrlRev,
     check_configuration,
     file_lineno_href,
     generate_project_configs,
 )
 from sphinx_codelinks.logger import configure_sphinx
 from sphinx_codelinks.sphinx_extension import debug
+from sphinx_codelinks.sphinx_extension.dependencies import (
+    find_outdated_docs,
+    get_traced_sources,
+    merge_traced_sources,
+    purge_traced_sources,
+    update_traced_sources,
+)
 from sphinx_codelinks.sphinx_extension.directives.src_trace import (
     SourceTracing,
     SourceTracingDirective,
+    get_analyse_warnings,
+    init_analyse_warnings,
+)
+from sphinx_codelinks.sphinx_extension.pre_analyse import (
+    clear_pre_analysis,
+    get_commit_rev,
+    get_config_dir,
+    pre_analyse,
 )
-from sphinx_codelinks.sphinx_extension.html_wrapper import html_wrapper
 
 logger = logging.getLogger(__name__)
 
+REMOTE_REVS_CONTEXT = "codelinks_remote_revs"
+"""The ``needs_render_context`` key of the last commits of the remote paths."""
+
 try:
     from sphinx_needs.api import add_field as _add_field
 except ImportError:  # sphinx-needs < 8 has no add_field
@@ -108,9 +128,20 @@ def setup(app: Sphinx) -> dict[str, Any]:  # type: ignore[explicit-any]
     app.connect("config-inited", check_sphinx_configuration)
 
     app.connect("env-before-read-docs", prepare_env)
+    # after prepare_env, so that the warnings of the analyses are limited
+    app.connect("env-before-read-docs", pre_analyse, priority=600)
+    app.connect("env-updated", clear_pre_analysis)
+    app.connect("env-updated", update_traced_sources)
+    app.connect("env-updated", update_remote_revs)
+    app.connect("env-get-outdated", find_outdated_docs)
+    app.connect("env-purge-doc", purge_traced_sources)
+    app.connect("env-merge-info", merge_traced_sources)
     app.connect("html-collect-pages", generate_code_page)
     app.connect("html-page-context", add_custom_css)
     app.connect("builder-inited", builder_inited)
+    # the git repositories of the projects are looked up once the env exists,
+    # which the locations of their warnings need
+    app.connect("builder-inited", update_sn_string_links)
     app.connect("build-finished", emit_warnings)
     app.connect("build-finished", debug.process_timing)
     return {
@@ -121,6 +152,9 @@ def setup(app: Sphinx) -> dict[str, Any]:  # type: ignore[explicit-any]
 
 
 def builder_inited(app: Sphinx) -> None:
+    # the git metadata is read again for each build of a long-running process
+    utils.clear_git_cache()
+    init_analyse_warnings(app)
     custom_css = Path(__file__).parent / "ub_sct.css"
     copy_asset(custom_css, Path(app.outdir) / "_static" / "source_tracing")
 
@@ -144,6 +178,11 @@ def add_custom_css(  # type: ignore[explicit-any]
 def generate_code_page(
     app: Sphinx,
 ) -> Iterator[tuple[str, dict[str, str], str]] | None:
+    # pygments is only needed when source code pages are generated
+    from sphinx_codelinks.sphinx_extension.html_wrapper import (  # noqa: PLC0415
+        html_wrapper,
+    )
+
     for file, lineno_href in file_lineno_href.mappings.items():
         file_path = Path(file)
         pagename = str((file_path.relative_to(app.outdir)).with_suffix(""))
@@ -227,6 +266,88 @@ def update_sn_extra_options(app: Sphinx, config: _SphinxConfig) -> None:
         )
 
 
+def update_sn_string_links(app: Sphinx) -> None:
+    """Register the ``needs_string_links`` of the URL fields once per build.
+
+    sphinx-needs renders a field with its first string link only, so the remote URLs of
+    all projects link with the pattern and commit of the first project with a pattern.
+    If the remote URLs link to the last commits which changed the files, the link
+    template looks them up in the ``needs_render_context``, see
+    :func:`update_remote_revs`, and the values stay the same.
+    """
+    # https://sphinx-needs.readthedocs.io/en/latest/configuration.html#needs-string-links
+    src_trace_sphinx_config = CodeLinksConfig.from_sphinx(app.config)
+    string_links: dict[str, dict[str, str | list[str]]] = {}
+    if src_trace_sphinx_config.set_local_url:
+        local_url_field = src_trace_sphinx_config.local_url_field
+        to_remove_str = f"{Path(app.outdir)!s}{os.sep}"
+        if os.name == "nt":
+            to_remove_str = to_remove_str.replace("\\", "\\\\")
+        string_links[local_url_field] = {
+            "regex": r"^(?P<value>.+?)\.[^\.]+#L(?P<lineno>\d+)",
+            "link_url": ("{{value}}.html#L-{{lineno}}"),
+            "link_name": f"{{{{value | replace('{to_remove_str}', '')}}}}#L{{{{lineno}}}}",
+            "options": [local_url_field],
+        }
+    if src_trace_sphinx_config.set_remote_url:
+        config_dir = get_config_dir(Path(app.confdir), src_trace_sphinx_config)
+        pins_revs = any(
+            src_trace_conf["analyse_config"].remote_url_rev == RemoteUrlRev.last_change
+            for src_trace_conf in src_trace_sphinx_config.projects.values()
+            if "analyse_config" in src_trace_conf
+        )
+        for src_trace_conf in src_trace_sphinx_config.projects.values():
+            if (
+                not src_trace_conf.get("remote_url_pattern")
+                or "analyse_config" not in src_trace_conf
+            ):
+                continue
+            remote_url_field = src_trace_sphinx_config.remote_url_field
+            commit = get_commit_rev(config_dir, src_trace_conf)
+            remote_url_pattern = src_trace_conf["remote_url_pattern"].format(
+                commit=(
+                    f"{{{{{REMOTE_REVS_CONTEXT}.get(value, '{commit}')}}}}"
+                    if pins_revs
+                    else commit
+                ),
+                path="{{value}}",
+                line="{{lineno}}",
+            )
+            string_links[remote_url_field] = {
+                "regex": r"^(?P<value>.+)#L(?P<lineno>.*)?",
+                "link_url": remote_url_pattern,
+                "link_name": "{{value}}#L{{lineno}}",
+                "options": [remote_url_field],
+            }
+            if pins_revs:
+                # filled once the documents are read
+                app.config.needs_render_context = {
+                    **app.config.needs_render_context,
+                    REMOTE_REVS_CONTEXT: {},
+                }
+            break
+    if string_links:
+        # rebind, the dict may be the one of conf.py
+        app.config.needs_string_links = {
+            **app.config.needs_string_links,
+            **string_links,
+        }
+
+
+def update_remote_revs(app: Sphinx, env: BuildEnvironment) -> None:
+    """Provide the last commits of the traced files to the string link of remote URLs.
+
+    They are kept per document, also for those which are not read again.
+    """
+    remote_revs = app.config.needs_render_context.get(REMOTE_REVS_CONTEXT)
+    if remote_revs is None:
+        return
+    remote_revs.clear()
+    for traced_sources in get_traced_sources(env).values():
+        for traced in traced_sources:
+            remote_revs.update(traced.remote_revs)
+
+
 def update_sn_types(app: Sphinx, _config: _SphinxConfig) -> None:
     add_need_type(app, "srctrace", "Src-Trace", "ST_", "#ffffff", "node")
 
@@ -256,14 +377,15 @@ def check_sphinx_configuration(app: Sphinx, _config: _SphinxConfig) -> None:
 
 def emit_warnings(
     app: Sphinx,
-    _env: BuildEnvironment,
+    _exception: Exception | None,
 ) -> None:
-    warnings = AnalyseProjects.load_warnings(Path(app.outdir) / SRC_TRACE_CACHE)
-    if not warnings:
-        return
-    for warning in warnings:
-        logger.warning(
-            f"{warning.file_path}:{warning.lineno}: {warning.msg}",
-            type=warning.type,
-            subtype=warning.sub_type,
-        )
+    """Emit the warnings of the cache and the summary of the suppressed warnings.
+
+    The warnings of the analyses in the build are already emitted as they occurred.
+    """
+    analyse_warnings = get_analyse_warnings(app.env)
+    for warning in AnalyseProjects.iter_warnings(Path(app.outdir) / SRC_TRACE_CACHE):
+        analyse_warnings(warning)
+    summary = analyse_warnings.summary()
+    if summary:
+        logger.warning(summary, type="codelinks", subtype="max_warnings")
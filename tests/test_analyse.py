@@ -1,11 +1,14 @@
 # @Test suite for source code analysis and marker extraction, TEST_ANA_1, test, [IMPL_LNK_1, IMPL_ONE_1, IMPL_MRST_1]
+import hashlib
+import io
 import json
 from pathlib import Path
 
 import pytest
 
+from sphinx_codelinks.analyse import utils
 from sphinx_codelinks.analyse.analyse import SourceAnalyse, _count
-from sphinx_codelinks.config import SourceAnalyseConfig
+from sphinx_codelinks.config import SourceAnalyseConfig, TaggedScopeFormat
 from sphinx_codelinks.source_discover.config import CommentType
 from tests.conftest import (
     ONELINE_COMMENT_STYLE,
@@ -71,7 +74,7 @@ def test_analyse(src_dir, src_paths, tmp_path, snapshot_marks):
                 "num_src_files": 4,
                 "num_uncached_files": 4,
                 "num_cached_files": 0,
-                "num_comments": 29,
+                "num_marked_comments": 12,
                 "num_oneline_warnings": 0,
             },
         ),
@@ -85,7 +88,7 @@ def test_analyse(src_dir, src_paths, tmp_path, snapshot_marks):
                 "num_src_files": 1,
                 "num_uncached_files": 1,
                 "num_cached_files": 0,
-                "num_comments": 14,
+                "num_marked_comments": 8,
                 "num_oneline_warnings": 0,
                 "warnings_path_exists": True,
             },
@@ -100,7 +103,7 @@ def test_analyse(src_dir, src_paths, tmp_path, snapshot_marks):
                 "num_src_files": 1,
                 "num_uncached_files": 1,
                 "num_cached_files": 0,
-                "num_comments": 5,
+                "num_marked_comments": 5,
                 "num_oneline_warnings": 1,
                 "warnings_path_exists": True,
             },
@@ -115,7 +118,7 @@ def test_analyse(src_dir, src_paths, tmp_path, snapshot_marks):
                 "num_src_files": 1,
                 "num_uncached_files": 1,
                 "num_cached_files": 0,
-                "num_comments": 6,
+                "num_marked_comments": 4,
                 "num_oneline_warnings": 0,
             },
         ),
@@ -129,7 +132,7 @@ def test_analyse(src_dir, src_paths, tmp_path, snapshot_marks):
                 "num_src_files": 1,
                 "num_uncached_files": 1,
                 "num_cached_files": 0,
-                "num_comments": 4,
+                "num_marked_comments": 3,
                 "num_oneline_warnings": 0,
                 "comment_type": CommentType.jsonc,
             },
@@ -157,7 +160,7 @@ def test_analyse_oneline_needs(
     cnt_comments = 0
     for src_file in src_analyse.src_files:
         cnt_comments += len(src_file.src_comments)
-    assert cnt_comments == result["num_comments"]
+    assert cnt_comments == result["num_marked_comments"]
 
 
 def test_explicit_git_root_configuration(tmp_path):
@@ -256,3 +259,220 @@ def test_count_pluralizes_nouns() -> None:
     assert _count(1, "file") == "1 file"
     assert _count(2, "marker") == "2 markers"
     assert _count(1, "marked-rst block") == "1 marked-rst block"
+
+
+def test_get_src_strings(tmp_path):
+    files = {
+        "lf.cpp": b"// @need-ids: REQ_1\nint a;\n",
+        "crlf.cpp": b"// @need-ids: REQ_1\r\nint a;\r\n",
+        "cr.cpp": b"// @need-ids: REQ_1\rint a;\r",
+        "binary.cpp": b"// @need-ids: REQ_1\x00\n",
+        "latin1.cpp": "// @need-ids: RÉQ_1\n".encode("latin-1"),
+    }
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+    src_analyse_config = SourceAnalyseConfig(
+        src_files=[tmp_path / name for name in files],
+        src_dir=tmp_path,
+    )
+
+    src_strings = dict(SourceAnalyse(src_analyse_config).get_src_strings())
+
+    assert src_strings == {
+        tmp_path / "lf.cpp": b"// @need-ids: REQ_1\nint a;\n",
+        tmp_path / "crlf.cpp": b"// @need-ids: REQ_1\nint a;\n",
+        tmp_path / "cr.cpp": b"// @need-ids: REQ_1\nint a;\n",
+    }
+
+
+def test_analyse_mapped_files(tmp_path):
+    src_paths = [
+        TEST_DATA_DIR / "oneline_comment_default" / "default_oneliners.c",
+        TEST_DATA_DIR / "need_id_refs" / "dummy_1.cpp",
+        TEST_DATA_DIR / "marked_rst" / "dummy_1.cpp",
+    ]
+    unmarked_path = tmp_path / "unmarked.cpp"
+    unmarked_path.write_text("// a comment without markers\nint a;\n")
+    results = []
+    for mmap_threshold in (1 << 20, 0):
+        src_analyse_config = SourceAnalyseConfig(
+            src_files=[*src_paths, unmarked_path],
+            src_dir=TEST_DATA_DIR,
+            get_need_id_refs=True,
+            get_oneline_needs=True,
+            get_rst=True,
+            mmap_threshold=mmap_threshold,
+        )
+        analyse = SourceAnalyse(src_analyse_config)
+        analyse.run()
+        results.append(
+            (
+                [obj.to_dict() for obj in analyse.all_marked_content],
+                [src_file.filepath.name for src_file in analyse.src_files],
+            )
+        )
+
+    read, mapped = results
+    assert read[0]
+    assert mapped == read
+    # the mapped file without markers is not parsed at all
+    assert unmarked_path not in dict(analyse.get_src_strings())
+
+
+def test_unmarked_comments_are_not_decoded(tmp_path, monkeypatch):
+    # the fallback query, which captures all comments
+    init_tree_sitter = utils.init_tree_sitter
+    monkeypatch.setattr(
+        utils,
+        "init_tree_sitter",
+        lambda comment_type, markers=(): init_tree_sitter(comment_type),
+    )
+    src_path = tmp_path / "src.cpp"
+    src_path.write_text(
+        "// a plain comment\n"
+        "void func() {\n"
+        "    // @need-ids: REQ_1\n"
+        "    // @need-ids: REQ_2\n"
+        "}\n"
+    )
+    src_analyse_config = SourceAnalyseConfig(src_files=[src_path], src_dir=tmp_path)
+    src_analyse = SourceAnalyse(src_analyse_config)
+    src_analyse.run()
+
+    plain_comment, *marked_comments = src_analyse.src_comments
+    assert "text" not in vars(plain_comment)
+    assert all("text" in vars(comment) for comment in marked_comments)
+    # both markers share the text of their tagged scope
+    scopes = {marker.to_dict()["tagged_scope"] for marker in src_analyse.need_id_refs}
+    assert len(scopes) == 1
+    src_file = src_analyse.src_files[0]
+    assert src_file.get_text(src_analyse.need_id_refs[0].tagged_scope) is next(
+        iter(scopes)
+    )
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_run_batches(batch_size):
+    src_paths = [
+        TEST_DATA_DIR / "need_id_refs" / "dummy_1.cpp",
+        TEST_DATA_DIR / "oneline_comment_default" / "default_oneliners.c",
+        TEST_DATA_DIR / "marked_rst" / "dummy_1.cpp",
+        TEST_DATA_DIR / "dcdc" / "supercharge.cpp",
+    ]
+    src_analyse_config = SourceAnalyseConfig(
+        src_files=src_paths,
+        src_dir=TEST_DATA_DIR,
+        get_need_id_refs=True,
+        get_oneline_needs=True,
+        get_rst=True,
+        batch_size=batch_size,
+    )
+    src_analyse = SourceAnalyse(src_analyse_config)
+    src_analyse.run()
+    expected = [marker.to_dict() for marker in src_analyse.all_marked_content]
+
+    batched_analyse = SourceAnalyse(src_analyse_config)
+    output = io.StringIO()
+    batched_analyse.run_batches(output)
+
+    assert expected
+    assert [json.loads(line) for line in output.getvalue().splitlines()] == expected
+    # the batches are analysed in the order of the file paths
+    assert sorted(
+        batched_analyse.oneline_warnings, key=lambda warning: warning.file_path
+    ) == sorted(src_analyse.oneline_warnings, key=lambda warning: warning.file_path)
+    # nothing but the warnings is kept from the batches
+    assert not batched_analyse.src_files
+    assert not batched_analyse.all_marked_content
+    assert batched_analyse.process_peak_rss
+
+
+def test_merge_marked_content_order(tmp_path):
+    (tmp_path / "a.b").mkdir()
+    (tmp_path / "a").mkdir()
+    same_row = "// @need-ids: REQ_1 @title, IMPL_1\nvoid func() {}\n"
+    (tmp_path / "a.b" / "src.cpp").write_text(same_row)
+    (tmp_path / "a" / "src.cpp").write_text(same_row)
+    src_paths = [
+        tmp_path / "a.b" / "src.cpp",
+        TEST_DATA_DIR / "marked_rst" / "dummy_1.cpp",
+        tmp_path / "a" / "src.cpp",
+        TEST_DATA_DIR / "oneline_comment_default" / "default_oneliners.c",
+        TEST_DATA_DIR / "need_id_refs" / "dummy_1.cpp",
+        # a file given twice is merged with itself
+        TEST_DATA_DIR / "marked_rst" / "dummy_1.cpp",
+    ]
+    src_analyse = SourceAnalyse(
+        SourceAnalyseConfig(
+            src_files=src_paths,
+            src_dir=TEST_DATA_DIR,
+            get_need_id_refs=True,
+            get_oneline_needs=True,
+            get_rst=True,
+        )
+    )
+    src_analyse.create_src_objects()
+    src_analyse.extract_marked_content()
+
+    def get_row(marker):
+        return marker.source_map["start"]["row"]
+
+    # stable sort of all markers by their path and row
+    expected = sorted(
+        [
+            *src_analyse.need_id_refs,
+            *sorted(src_analyse.oneline_needs, key=get_row),
+            *src_analyse.marked_rst,
+        ],
+        key=lambda marker: (marker.filepath, get_row(marker)),
+    )
+    expected_oneline_needs = sorted(src_analyse.oneline_needs, key=get_row)
+    src_analyse.merge_marked_content()
+
+    assert len({marker.type for marker in expected}) == 3
+    assert [id(marker) for marker in src_analyse.all_marked_content] == [
+        id(marker) for marker in expected
+    ]
+    assert src_analyse.oneline_needs == expected_oneline_needs
+
+
+@pytest.mark.parametrize(
+    ("tagged_scope_format", "with_hash"),
+    [(TaggedScopeFormat.summary, False), (TaggedScopeFormat.summary_hash, True)],
+)
+def test_tagged_scope_summary(tmp_path, tagged_scope_format, with_hash):
+    src_path = tmp_path / "src.cpp"
+    src_path.write_text(
+        "namespace A {\n"
+        "// @need-ids: REQ_1\n"
+        "int *f(int a) {\n"
+        "    return &a;\n"
+        "}\n"
+        "}\n"
+        "// @need-ids: REQ_2\n"
+    )
+    src_analyse_config = SourceAnalyseConfig(
+        src_files=[src_path],
+        src_dir=tmp_path,
+        tagged_scope_format=tagged_scope_format,
+    )
+    text_analyse = SourceAnalyse(
+        SourceAnalyseConfig(src_files=[src_path], src_dir=tmp_path)
+    )
+    text_analyse.run()
+    src_analyse = SourceAnalyse(src_analyse_config)
+    src_analyse.run()
+
+    scope_text = text_analyse.need_id_refs[0].to_dict()["tagged_scope"]
+    summary = src_analyse.need_id_refs[0].to_dict()["tagged_scope"]
+    expected = {
+        "type": "function_definition",
+        "name": "f",
+        "start": {"row": 2, "column": 0},
+        "end": {"row": 4, "column": 1},
+    }
+    if with_hash:
+        expected["hash"] = hashlib.sha256(scope_text.encode()).hexdigest()
+    assert summary == expected
+    # a marker without a scope has no summary
+    assert src_analyse.need_id_refs[1].to_dict()["tagged_scope"] is None
@@ -2,6 +2,7 @@
 import pytest
 
 from sphinx_codelinks.config import OneLineCommentStyle, SourceAnalyseConfig
+from sphinx_codelinks.schema import get_fields_validator
 
 from .conftest import TEST_DIR
 
@@ -32,6 +33,35 @@ from .conftest import TEST_DIR
                 "Schema validation error in field 'src_files': None is not of type 'array'",
             ],
         ),
+        (
+            SourceAnalyseConfig(
+                src_dir=TEST_DIR / "data" / "dcdc",
+                mmap_threshold=-1,
+                batch_size=-1,
+            ),
+            [
+                "Schema validation error in field 'mmap_threshold': -1 is less than the minimum of 0",
+                "Schema validation error in field 'batch_size': -1 is less than the minimum of 0",
+            ],
+        ),
+        (
+            SourceAnalyseConfig(
+                src_dir=TEST_DIR / "data" / "dcdc",
+                tagged_scope_format="full",
+            ),
+            [
+                "Schema validation error in field 'tagged_scope_format': 'full' is not one of ['text', 'summary', 'summary_hash']",
+            ],
+        ),
+        (
+            SourceAnalyseConfig(
+                src_dir=TEST_DIR / "data" / "dcdc",
+                remote_url_rev="tag",
+            ),
+            [
+                "Schema validation error in field 'remote_url_rev': 'tag' is not one of ['head', 'last_change']",
+            ],
+        ),
     ],
 )
 def test_config_schema_validator_negative(analyse_config, result):
@@ -209,3 +239,14 @@ def test_oneline_schema_validator_negative(oneline_config, result):
 )
 def test_oneline_schema_validator_positive(oneline_config):
     assert len(oneline_config.check_fields_configuration()) == 0
+
+
+def test_config_schema_validator_compiled_once():
+    analyse_config = SourceAnalyseConfig(src_dir=TEST_DIR, comment_type=123)
+    analyse_config.check_schema()
+    validator = get_fields_validator(SourceAnalyseConfig)
+
+    assert analyse_config.check_schema() == [
+        "Schema validation error in field 'comment_type': 123 is not of type 'string'"
+    ]
+    assert get_fields_validator(SourceAnalyseConfig) is validator
@@ -1,7 +1,11 @@
 # @Test suite for tree-sitter parsing utilities and language support, TEST_LANG_1, test, [IMPL_LANG_1, IMPL_EXTR_1, IMPL_RST_1]
+from concurrent.futures import ThreadPoolExecutor
+import mmap
 from pathlib import Path
 import shutil
 import subprocess
+import sys
+from unittest import mock
 
 import pytest
 from tree_sitter import Language, Parser, Query
@@ -18,6 +22,8 @@ from sphinx_codelinks.analyse import utils
 from sphinx_codelinks.config import UNIX_NEWLINE
 from sphinx_codelinks.source_discover.config import CommentType
 
+from .conftest import DATA_DIR
+
 
 @pytest.fixture(scope="session")
 def init_cpp_tree_sitter() -> tuple[Parser, Query]:
@@ -1102,6 +1108,72 @@ def init_git_repo(repo_path: Path, remote_url: str) -> Path:
     return git_dir
 
 
+@pytest.mark.parametrize(
+    ("src_bytes", "result"),
+    [
+        (b"int a;\n", True),
+        (b"", True),
+        ("// ünïcödé\n".encode(), True),
+        (b"int a;\x00", False),
+        (b"\xff\xfe", False),
+        # a multi-byte character cut at the end of the sample
+        (b"a" * 2047 + "é".encode(), True),
+        # only the sample is checked
+        (b"a" * 2048 + b"\x00", True),
+    ],
+)
+def test_is_text(src_bytes: bytes, result: bool) -> None:
+    assert utils.is_text(src_bytes) is result
+
+
+@pytest.mark.parametrize(
+    ("src_bytes", "result"),
+    [
+        (b"a\nb\n", b"a\nb\n"),
+        (b"a\r\nb\r\n", b"a\nb\n"),
+        (b"a\rb\r", b"a\nb\n"),
+        (b"a\r\r\nb\n\r", b"a\n\nb\n\n"),
+    ],
+)
+def test_normalize_line_endings(src_bytes: bytes, result: bytes) -> None:
+    normalized = utils.normalize_line_endings(src_bytes)
+    assert normalized == result
+    assert normalized == src_bytes.decode().replace("\r\n", "\n").replace(
+        "\r", "\n"
+    ).encode("utf-8")
+    if b"\r" not in src_bytes:
+        # no copy is made
+        assert normalized is src_bytes
+
+
+def test_load_src_buffer(tmp_path: Path) -> None:
+    src_path = tmp_path / "src.cpp"
+    src_path.write_bytes(b"// @need-ids: REQ_1\r\nint a;\r\n")
+
+    assert utils.load_src_buffer(src_path, mmap_threshold=1024) == src_path.read_bytes()
+    src_buffer = utils.load_src_buffer(src_path, mmap_threshold=0)
+    assert isinstance(src_buffer, mmap.mmap)
+    assert src_buffer[:] == src_path.read_bytes()
+    assert utils.is_text(src_buffer)
+    assert utils.contains_any(src_buffer, [b"@rst", b"@need-ids:"])
+    assert not utils.contains_any(src_buffer, [b"@rst"])
+    assert utils.normalize_line_endings(src_buffer) == b"// @need-ids: REQ_1\nint a;\n"
+
+
+def test_extract_comments_mapped() -> None:
+    src_path = DATA_DIR / "dcdc" / "supercharge.cpp"
+    parser, query = utils.init_tree_sitter(CommentType.cpp)
+
+    mapped = utils.extract_comments(
+        utils.load_src_buffer(src_path, mmap_threshold=0), parser, query
+    )
+    read = utils.extract_comments(src_path.read_bytes(), parser, query)
+
+    assert mapped
+    assert read
+    assert [node.text for node in mapped] == [node.text for node in read]
+
+
 @pytest.fixture(
     params=[
         ("test_repo_git", "git@github.com:test-user/test-repo.git"),
@@ -1160,6 +1232,83 @@ def test_get_current_rev_detached_head(tmp_path: Path) -> None:
     assert utils.get_current_rev(git_root) == sha
 
 
+def test_get_current_rev_packed_refs(git_repo: tuple[Path, str]) -> None:
+    repo_path, _ = git_repo
+    current_rev = get_current_commit_hash(repo_path)
+    subprocess.run(  # noqa: S603
+        [get_git_path(), "pack-refs", "--all"], cwd=repo_path, check=True
+    )
+    assert not any((repo_path / ".git" / "refs" / "heads").iterdir())
+
+    assert utils.get_current_rev(repo_path) == current_rev
+
+
+def test_git_metadata_of_linked_worktree(git_repo: tuple[Path, str]) -> None:
+    repo_path, remote_url = git_repo
+    worktree_path = repo_path.parent / "worktree"
+    subprocess.run(  # noqa: S603
+        [get_git_path(), "worktree", "add", "-b", "feature", str(worktree_path)],
+        cwd=repo_path,
+        check=True,
+        capture_output=True,
+    )
+
+    git_root = utils.locate_git_root(worktree_path / "src")
+    assert git_root == worktree_path.resolve()
+    assert utils.get_remote_url(git_root) == remote_url
+    assert utils.get_current_rev(git_root) == get_current_commit_hash(worktree_path)
+
+
+def test_git_metadata_is_read_once(git_repo: tuple[Path, str]) -> None:
+    repo_path, remote_url = git_repo
+    utils.clear_git_cache()
+    current_rev = get_current_commit_hash(repo_path)
+    assert utils.locate_git_root(repo_path / "src") == repo_path.resolve()
+    assert utils.get_current_rev(repo_path) == current_rev
+    assert utils.get_remote_url(repo_path) == remote_url
+
+    # the cached metadata is used until the cache is cleared
+    (repo_path / ".git" / "HEAD").write_text("0123456789abcdef\n")
+    with mock.patch.object(Path, "read_text") as read_text:
+        assert utils.locate_git_root(repo_path / "src") == repo_path.resolve()
+        assert utils.get_current_rev(repo_path) == current_rev
+        assert utils.get_remote_url(repo_path) == remote_url
+    read_text.assert_not_called()
+
+    utils.clear_git_cache()
+    assert utils.get_current_rev(repo_path) == "0123456789abcdef"
+
+
+def test_get_last_change_revs(git_repo: tuple[Path, str]) -> None:
+    repo_path, _ = git_repo
+    git_path = get_git_path()
+    first_rev = get_current_commit_hash(repo_path)
+    changed_file = repo_path / "src" / "changed.py"
+    changed_file.write_text("print('changed')\n")
+    subprocess.run([git_path, "add", "."], cwd=repo_path, check=True)  # noqa: S603
+    subprocess.run(  # noqa: S603
+        [git_path, "commit", "-m", "Change"], cwd=repo_path, check=True
+    )
+    untracked_file = repo_path / "src" / "untracked.py"
+    untracked_file.write_text("print('untracked')\n")
+    src_files = [repo_path / "src" / "test_file.py", changed_file, untracked_file]
+
+    with mock.patch.object(
+        utils.subprocess, "Popen", wraps=utils.subprocess.Popen
+    ) as popen:
+        revs = utils.get_last_change_revs(repo_path, src_files)
+        # the commits are kept with the repository
+        assert utils.get_last_change_revs(repo_path, src_files[:1]) == {
+            src_files[0]: first_rev
+        }
+
+    assert revs == {
+        src_files[0]: first_rev,
+        changed_file: get_current_commit_hash(repo_path),
+    }
+    popen.assert_called_once()
+
+
 @pytest.mark.parametrize(
     ("text", "leading_sequences", "result"),
     [
@@ -1686,3 +1835,102 @@ def test_yaml_inline_comments_comprehensive(
         assert expected_associations[i] in structure_text, (
             f"Comment {i} '{comment.text.decode('utf-8')}' -> Expected '{expected_associations[i]}' in '{structure_text}'"
         )
+
+
+@pytest.mark.parametrize("comment_type", list(CommentType))
+def test_init_tree_sitter_cached(comment_type: CommentType) -> None:
+    parser, query = utils.init_tree_sitter(comment_type)
+
+    # the same parser and query are reused within a thread
+    assert utils.init_tree_sitter(comment_type) == (parser, query)
+
+    # other threads share the query, but get their own parser
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        thread_parser, thread_query = executor.submit(
+            utils.init_tree_sitter, comment_type
+        ).result()
+    assert thread_query is query
+    assert thread_parser is not parser
+
+
+MARKERS = ("@need-ids:", "@", "[[", "@rst", 'quote"back\\slash')
+
+
+@pytest.mark.parametrize(
+    ("comment_type", "src_path"),
+    [
+        (CommentType.cpp, DATA_DIR / "dcdc" / "supercharge.cpp"),
+        (CommentType.cpp, DATA_DIR / "oneline_comment_basic" / "basic_oneliners.c"),
+        (CommentType.rust, DATA_DIR / "rust" / "demo.rs"),
+        (CommentType.jsonc, DATA_DIR / "jsonc" / "demo.jsonc"),
+        (CommentType.python, Path(utils.__file__)),
+    ],
+)
+def test_marker_query(comment_type: CommentType, src_path: Path) -> None:
+    src_string = src_path.read_bytes()
+    parser, query = utils.init_tree_sitter(comment_type)
+    _, marker_query = utils.init_tree_sitter(comment_type, MARKERS)
+
+    assert marker_query is not query
+    comments = utils.extract_comments(src_string, parser, query) or []
+    marked = utils.extract_comments(src_string, parser, marker_query) or []
+    # tree-sitter returns the same comments as filtering all of them afterwards
+    assert marked
+    assert [node.text for node in marked] == [
+        node.text
+        for node in comments
+        if any(marker.encode() in (node.text or b"") for marker in MARKERS)
+    ]
+
+
+@pytest.mark.parametrize("comment_type", list(CommentType))
+def test_marker_query_compiles(comment_type: CommentType) -> None:
+    _, query = utils.get_language_query(comment_type)
+    marker_query = utils.get_marker_query(comment_type, MARKERS)
+
+    assert marker_query is not query
+    assert marker_query.pattern_count == query.pattern_count
+    # without markers, all comments are captured
+    assert utils.get_marker_query(comment_type, ()) is query
+
+
+def test_marker_query_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        utils, "add_marker_predicate", lambda patterns, markers: "(invalid"
+    )
+    _, query = utils.get_language_query(CommentType.cpp)
+
+    assert utils.get_marker_query(CommentType.cpp, ("@fallback",)) is query
+
+
+def test_add_marker_predicate() -> None:
+    # the patterns are wrapped as they are, e.g. with parentheses in their strings
+    patterns = ['((comment) @comment (#not-match? @comment "^(;|\\\\()"))']
+    query_source = utils.add_marker_predicate(patterns, ["@need-ids:"])
+
+    assert query_source == f'({patterns[0]} (#match? @comment "@need\\\\-ids:"))'
+    Query(Language(tree_sitter_cpp.language()), query_source)
+
+
+PEAK_RSS_SCRIPT = """
+from sphinx_codelinks.analyse import utils
+
+data = b"x" * (256 << 20)
+del data
+print(utils.get_process_peak_rss())
+"""
+
+
+def test_get_process_peak_rss() -> None:
+    if utils.get_process_peak_rss() is None:
+        pytest.skip("the peak RSS cannot be measured on this platform")
+    # a fresh process, whose peak is not that of the tests run before
+    result = subprocess.run(  # noqa: S603  # the script is fixed
+        [sys.executable, "-c", PEAK_RSS_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # the memory released before the measurement is included
+    assert int(result.stdout) >= 256 << 20
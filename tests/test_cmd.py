@@ -7,7 +7,11 @@ import pytest
 import toml
 from typer.testing import CliRunner
 
+from sphinx_codelinks import serialize
+from sphinx_codelinks.analyse.projects import AnalyseProjects
 from sphinx_codelinks.cmd import app
+from sphinx_codelinks.config import CodeLinksConfig
+from sphinx_codelinks.marked_content import load_marked_objs
 from sphinx_codelinks.source_discover.config import CommentType
 
 from .conftest import DATA_DIR, TEST_DIR
@@ -116,6 +120,56 @@ def test_analyse_outputs_warnings(tmp_path: Path) -> None:
     assert "too_many_fields" in result.output
 
 
+def test_analyse_max_warnings(tmp_path: Path) -> None:
+    src_dir = tmp_path / "src"
+    src_dir.mkdir()
+    (src_dir / "many_fields.c").write_text(
+        "".join(
+            f"// @Function {idx}, IMPL_{idx}, impl, [], open, high\nvoid f{idx}() {{}}\n"
+            for idx in range(5)
+        )
+    )
+    config_dict = {
+        "codelinks": {
+            "outdir": str(tmp_path / "output"),
+            "max_warnings": 2,
+            "projects": {
+                "test_project": {
+                    "source_discover": {"src_dir": str(src_dir), "gitignore": False},
+                    "analyse": {"get_oneline_needs": True},
+                }
+            },
+        }
+    }
+    config_file = tmp_path / "test_config.toml"
+    with config_file.open("w", encoding="utf-8") as f:
+        toml.dump(config_dict, f)
+
+    result = runner.invoke(app, ["analyse", str(config_file)])
+
+    assert result.exit_code == 0, result.output
+    output = " ".join(result.output.split())
+    assert output.count("Oneline parser warning") == 2
+    assert "3 more warnings not shown (too_many_fields: 3)" in output
+    # all warnings are written, one per line
+    warnings = AnalyseProjects.load_warnings(tmp_path / "output")
+    assert warnings is not None
+    assert [warning.lineno for warning in warnings] == [1, 3, 5, 7, 9]
+    assert {warning.sub_type for warning in warnings} == {"too_many_fields"}
+
+    # the deprecated API writes the JSON list of the warnings of before
+    analyse_projects = AnalyseProjects(
+        CodeLinksConfig(outdir=tmp_path / "output", projects={})
+    )
+    with pytest.deprecated_call():
+        analyse_projects.update_warnings()
+    (tmp_path / "output" / AnalyseProjects.warning_filepath).unlink()
+    assert AnalyseProjects.load_warnings(tmp_path / "output") == warnings
+    with pytest.deprecated_call():
+        analyse_projects.dump_warnings(warnings[:1])
+    assert AnalyseProjects.load_warnings(tmp_path / "output") == warnings[:1]
+
+
 def test_analyse_logs_per_project_summary_and_gates_detail(tmp_path: Path) -> None:
     """Each project gets a default-visible ``codelinks [<project>]`` summary with
     counts; the per-type breakdown is gated behind --verbose; --quiet silences it."""
@@ -343,7 +397,7 @@ def test_write_rst_invalid_json(tmp_path: Path) -> None:
 )
 def test_write_rst_negative(json_objs: list[dict], output_lines, tmp_path) -> None:
     to_dump = {"project_1": json_objs}
-    jsonpath = Path("invalid_objs.json")
+    jsonpath = tmp_path / "invalid_objs.json"
     with jsonpath.open("w") as f:
         json.dump(to_dump, f)
     outpath = tmp_path / "needextend.rst"
@@ -467,3 +521,174 @@ git_root = "{fake_git_root.as_posix()}"
         marked_content = json.load(f)
     # Verify the content was analysed using the correct git_root
     assert len(marked_content["test_project"]) > 0
+
+
+def test_analyse_batches(tmp_path: Path) -> None:
+    outputs = []
+    for batch_size in (0, 2):
+        config_dict = {
+            "codelinks": {
+                "projects": {
+                    project: {
+                        "source_discover": {
+                            "src_dir": str(DATA_DIR),
+                            "gitignore": False,
+                            "comment_type": comment_type,
+                        },
+                        "analyse": {"get_rst": True, "batch_size": batch_size},
+                    }
+                    for project, comment_type in (("cpp", "cpp"), ("python", "python"))
+                }
+            }
+        }
+        config_file = tmp_path / f"config_{batch_size}.toml"
+        with config_file.open("w", encoding="utf-8") as f:
+            toml.dump(config_dict, f)
+        outdir = tmp_path / f"out_{batch_size}"
+        outdir.mkdir()
+
+        result = runner.invoke(
+            app, ["analyse", str(config_file), "--outdir", str(outdir), "--index"]
+        )
+
+        assert result.exit_code == 0
+        assert "process peak RSS" in result.output
+        outputs.append((outdir / "marked_content.json").read_text())
+
+    unbounded, batched = outputs
+    assert json.loads(unbounded)["cpp"]
+    # the streamed output is the same as dumping all markers at once
+    assert unbounded == serialize.dumps(json.loads(unbounded))
+    assert batched == unbounded
+
+
+def _write_shard_config(tmp_path: Path, batch_size: int) -> Path:
+    config_dict = {
+        "codelinks": {
+            "projects": {
+                project: {
+                    "source_discover": {
+                        "src_dir": str(DATA_DIR),
+                        "gitignore": False,
+                        "comment_type": comment_type,
+                    },
+                    "analyse": {
+                        "get_rst": True,
+                        "get_oneline_needs": True,
+                        "batch_size": batch_size,
+                    },
+                }
+                for project, comment_type in (("cpp", "cpp"), ("python", "python"))
+            }
+        }
+    }
+    config_file = tmp_path / "config.toml"
+    with config_file.open("w", encoding="utf-8") as f:
+        toml.dump(config_dict, f)
+    return config_file
+
+
+@pytest.mark.parametrize(
+    ("shard_by", "layout", "batch_size"),
+    [("hash", 1, 0), ("size", 1, 2), ("hash", 2, 2), ("size", 2, 0)],
+)
+def test_analyse_shards_merge(
+    shard_by: str, layout: int, batch_size: int, tmp_path: Path
+) -> None:
+    config_file = _write_shard_config(tmp_path, batch_size)
+    single_dir = tmp_path / "single"
+    single_dir.mkdir()
+    result = runner.invoke(
+        app,
+        ["analyse", str(config_file), "-o", str(single_dir), "--layout", str(layout)],
+    )
+    assert result.exit_code == 0
+
+    shard_dirs = []
+    for idx in (1, 2, 3):
+        shard_dir = tmp_path / f"shard_{idx}"
+        shard_dir.mkdir()
+        # the layout of the shards does not matter to the merge
+        options = ["analyse", str(config_file), "-o", str(shard_dir)]
+        options += ["--shard", f"{idx}/3", "--shard-by", shard_by]
+        options += ["--layout", str(3 - layout)]
+        result = runner.invoke(app, options)
+        assert result.exit_code == 0
+        shard_dirs.append(shard_dir)
+
+    merged_dir = tmp_path / "merged"
+    result = runner.invoke(
+        app,
+        [
+            "merge",
+            *map(str, reversed(shard_dirs)),
+            "-o",
+            str(merged_dir),
+            "--layout",
+            str(layout),
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert "Merged 3 shards" in result.output
+    # the markers of several shards are merged
+    marked_shards = [
+        shard_dir
+        for shard_dir in shard_dirs
+        if next(load_marked_objs(shard_dir / "marked_content.json"), None)
+    ]
+    assert len(marked_shards) > 1
+    for path in (
+        Path("marked_content.json"),
+        Path("marked_content.json.sha256"),
+        AnalyseProjects.warning_filepath,
+    ):
+        assert (merged_dir / path).read_bytes() == (single_dir / path).read_bytes()
+    assert (single_dir / AnalyseProjects.warning_filepath).read_text()
+
+
+@pytest.mark.parametrize(
+    ("options", "message"),
+    [
+        (["--shard", "3"], "is not of the form I/N"),
+        (["--shard", "a/3"], "is not of the form I/N"),
+        (["--shard", "0/3"], "is not between 1 and 3"),
+        (["--shard", "4/3"], "is not between 1 and 3"),
+        (["--shard", "1/2", "--index"], "--index cannot be used with --shard"),
+    ],
+)
+def test_analyse_shard_negative(
+    options: list[str], message: str, tmp_path: Path
+) -> None:
+    config_file = _write_shard_config(tmp_path, 0)
+    result = runner.invoke(
+        app, ["analyse", str(config_file), "-o", str(tmp_path), *options]
+    )
+
+    assert result.exit_code != 0
+    assert message in _normalize_output(result.output)
+
+
+def test_merge_negative(tmp_path: Path) -> None:
+    config_file = _write_shard_config(tmp_path, 0)
+    shard_dirs = []
+    for shard in ("1/3", "3/3", "1/2"):
+        shard_dir = tmp_path / f"shard_{len(shard_dirs)}"
+        shard_dir.mkdir()
+        result = runner.invoke(
+            app, ["analyse", str(config_file), "-o", str(shard_dir), "--shard", shard]
+        )
+        assert result.exit_code == 0
+        shard_dirs.append(str(shard_dir))
+
+    result = runner.invoke(app, ["merge", *shard_dirs[:2], "-o", str(tmp_path)])
+    assert result.exit_code != 0
+    assert "Missing shards: 2" in _normalize_output(result.output)
+
+    result = runner.invoke(app, ["merge", *shard_dirs, "-o", str(tmp_path)])
+    assert result.exit_code != 0
+    assert "different counts" in _normalize_output(result.output)
+
+    result = runner.invoke(app, ["merge", str(tmp_path), "-o", str(tmp_path)])
+    assert result.exit_code != 0
+    assert "Invalid shard manifest" in _normalize_output(result.output)
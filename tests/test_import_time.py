@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("sphinx", "sphinx_needs", "docutils", "jsonschema", "pygments")
+
+IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+print(json.dumps({{"duration": duration, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _import_in_subprocess(module: str) -> tuple[float, set[str]]:
+    result = subprocess.run(  # noqa: S603  # the script is fixed
+        [sys.executable, "-c", IMPORT_SCRIPT.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    output = json.loads(result.stdout)
+    return output["duration"], set(output["modules"])
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "sphinx_codelinks",
+        "sphinx_codelinks.cmd",
+        "sphinx_codelinks.analyse.projects",
+        "sphinx_codelinks.source_discover.source_discover",
+    ],
+)
+def test_no_heavy_imports(module: str) -> None:
+    _, modules = _import_in_subprocess(module)
+
+    loaded = {
+        name
+        for name in modules
+        if name.split(".")[0] in HEAVY_MODULES or name.startswith("tree_sitter_")
+    }
+    assert not loaded
+
+
+def test_cli_does_not_import_tree_sitter() -> None:
+    # the parsers are only needed once a command analyses the sources
+    _, modules = _import_in_subprocess("sphinx_codelinks.cmd")
+
+    assert not {name for name in modules if name.split(".")[0] == "tree_sitter"}
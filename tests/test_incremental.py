@@ -0,0 +1,178 @@
+import random
+
+import pytest
+from tree_sitter import Node as TreeSitterNode
+
+from sphinx_codelinks.analyse import utils
+from sphinx_codelinks.analyse.analyse import SourceAnalyse
+from sphinx_codelinks.analyse.incremental import TreeCache, compute_edit
+from sphinx_codelinks.config import SourceAnalyseConfig
+from sphinx_codelinks.source_discover.config import CommentType
+
+from .conftest import DATA_DIR
+
+PYTHON_SRC = b'''"""Module docstring @need-ids: REQ_1"""
+
+
+def func_1():
+    """Docstring of func_1"""
+    # @need-ids: REQ_2
+    return 1
+
+
+class Class_1:
+    """Docstring of Class_1"""
+
+    # comment in class
+    def method(self):
+        return "string, not a comment"
+'''
+
+INSERTIONS = [
+    b"// @need-ids: NEW_1\n",
+    b"# @need-ids: NEW_2\n",
+    b'"""new docstring"""\n',
+    b"/* block\n comment */",
+    b"\n",
+    b"x = 1\n",
+    b'"',
+    b"/*",
+    b"#",
+]
+
+
+@pytest.mark.parametrize(
+    ("old", "new", "expected"),
+    [
+        (b"abc", b"abc", (3, 3, 3)),
+        (b"abc", b"abXc", (2, 2, 3)),
+        (b"abXc", b"abc", (2, 3, 2)),
+        (b"abc", b"", (0, 3, 0)),
+        (b"", b"abc", (0, 0, 3)),
+        (b"aaaa", b"aaaaaa", (4, 4, 6)),
+        (b"one two three", b"one 2 three", (4, 7, 5)),
+    ],
+)
+def test_compute_edit(old: bytes, new: bytes, expected: tuple[int, int, int]) -> None:
+    edit = compute_edit(old, new)
+
+    assert (edit.start_byte, edit.old_end_byte, edit.new_end_byte) == expected
+    assert (
+        old[: edit.start_byte]
+        + new[edit.start_byte : edit.new_end_byte]
+        + old[edit.old_end_byte :]
+        == new
+    )
+
+
+def _spans(nodes: list[TreeSitterNode] | None) -> list[tuple[int, int, str]]:
+    return [(node.start_byte, node.end_byte, node.type) for node in nodes or []]
+
+
+def _random_edit(rnd: random.Random, src: bytes) -> bytes:
+    lines = src.splitlines(keepends=True)
+    idx = rnd.randrange(len(lines) + 1)
+    action = rnd.choice(("insert", "delete", "replace", "inline"))
+    if action == "insert" or not lines:
+        lines.insert(idx, rnd.choice(INSERTIONS))
+    elif action == "delete":
+        del lines[min(idx, len(lines) - 1)]
+    elif action == "replace":
+        lines[min(idx, len(lines) - 1)] = rnd.choice(INSERTIONS)
+    else:
+        line = lines[min(idx, len(lines) - 1)]
+        pos = rnd.randrange(len(line) + 1)
+        lines[min(idx, len(lines) - 1)] = (
+            line[:pos] + rnd.choice(INSERTIONS).rstrip(b"\n") + line[pos:]
+        )
+    return b"".join(lines)
+
+
+@pytest.mark.parametrize(
+    ("comment_type", "src_string"),
+    [
+        (CommentType.cpp, (DATA_DIR / "dcdc" / "supercharge.cpp").read_bytes()),
+        (CommentType.cpp, (DATA_DIR / "marked_rst" / "dummy_1.cpp").read_bytes()),
+        (CommentType.python, PYTHON_SRC),
+    ],
+)
+def test_tree_cache_matches_full_parse(
+    comment_type: CommentType, src_string: bytes
+) -> None:
+    rnd = random.Random(42)  # noqa: S311  # reproducible edits
+    parser, query = utils.init_tree_sitter(comment_type)
+    tree_cache = TreeCache(max_files=10)
+    filepath = DATA_DIR / "edited"
+
+    for _ in range(200):
+        comments = tree_cache.extract_comments(filepath, src_string, parser, query)
+        full_parse = utils.extract_comments(src_string, parser, query)
+        assert _spans(comments) == _spans(full_parse)
+        # the cached nodes are part of the new tree
+        for node in comments or []:
+            assert src_string[node.start_byte : node.end_byte] == node.text
+        src_string = _random_edit(rnd, src_string)
+
+
+CPP_UNIT = "// @need-ids: REQ_{0}\nint func_{0}(int a) {{\n    /* block {0} */\n    return a;\n}}\n"
+
+
+def test_tree_cache_valid_edits() -> None:
+    rnd = random.Random(7)  # noqa: S311  # reproducible edits
+    parser, query = utils.init_tree_sitter(CommentType.cpp)
+    tree_cache = TreeCache(max_files=10)
+    lines = "".join(CPP_UNIT.format(idx) for idx in range(50)).splitlines(keepends=True)
+
+    for step in range(200):
+        src_string = "".join(lines).encode()
+        comments = tree_cache.extract_comments(
+            DATA_DIR / "edited", src_string, parser, query
+        )
+        assert _spans(comments) == _spans(
+            utils.extract_comments(src_string, parser, query)
+        )
+        idx = rnd.randrange(len(lines))
+        action = rnd.choice(("insert", "append", "delete", "modify"))
+        if action == "insert" and lines[idx].startswith(("//", "int")):
+            lines.insert(idx, f"// @need-ids: NEW_{step}\n")
+        elif action == "append" and lines[idx].startswith("//"):
+            lines[idx] = lines[idx].rstrip("\n") + f", NEW_{step}\n"
+        elif action == "delete" and lines[idx].startswith("//"):
+            del lines[idx]
+        elif action == "modify" and lines[idx].startswith("    return"):
+            lines[idx] = f"    return a + {step};\n"
+
+
+def test_tree_cache_in_source_analyse() -> None:
+    src_path = DATA_DIR / "need_id_refs" / "dummy_1.cpp"
+    analyse_config = SourceAnalyseConfig(
+        src_files=[src_path],
+        src_dir=src_path.parent,
+        get_need_id_refs=True,
+        get_oneline_needs=False,
+        get_rst=False,
+    )
+    tree_cache = TreeCache(max_files=10)
+    results = []
+    for _ in range(2):
+        src_analyse = SourceAnalyse(analyse_config, tree_cache=tree_cache)
+        src_analyse.run()
+        results.append([marker.to_dict() for marker in src_analyse.need_id_refs])
+
+    assert results[0]
+    assert results[0] == results[1]
+    assert src_path.absolute() in tree_cache.trees or src_path in tree_cache.trees
+
+
+def test_tree_cache_evicts_least_recently_used() -> None:
+    parser, query = utils.init_tree_sitter(CommentType.python)
+    tree_cache = TreeCache(max_files=2)
+    paths = [DATA_DIR / f"edited_{idx}.py" for idx in range(3)]
+
+    tree_cache.extract_comments(paths[0], PYTHON_SRC, parser, query)
+    tree_cache.extract_comments(paths[1], PYTHON_SRC, parser, query)
+    # used again, so the second file is the least recently used one
+    tree_cache.extract_comments(paths[0], PYTHON_SRC, parser, query)
+    tree_cache.extract_comments(paths[2], PYTHON_SRC, parser, query)
+
+    assert list(tree_cache.trees) == [paths[0], paths[2]]
@@ -70,6 +70,35 @@ def test_cli_backend_debug_is_gated_by_verbose(capsys):
     assert "breakdown detail" in capsys.readouterr().out
 
 
+def test_recording_keeps_records_for_replay(capsys):
+    """Records kept while recording, e.g. in a worker process, are emitted later
+    through the backend active at replay."""
+    logmod.configure_cli(verbose=True, quiet=False)
+    log = logmod.get_logger("sphinx_codelinks.analyse.sample")
+
+    with logmod.recording() as records:
+        log.info("files loaded: 3")
+        log.warning("git root not found", subtype="git_root")
+    captured = capsys.readouterr()
+    assert not captured.out
+    assert not captured.err
+    assert records == [
+        ("info", "sphinx_codelinks.analyse.sample", "files loaded: 3", "", None),
+        (
+            "warning",
+            "sphinx_codelinks.analyse.sample",
+            "git root not found",
+            "git_root",
+            None,
+        ),
+    ]
+
+    logmod.replay(records)
+    captured = capsys.readouterr()
+    assert "files loaded: 3" in captured.out
+    assert "git root not found" in captured.err
+
+
 class _ListHandler(logging.Handler):
     def __init__(self) -> None:
         super().__init__()
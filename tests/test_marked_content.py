@@ -0,0 +1,290 @@
+import io
+import json
+from pathlib import Path
+import re
+import shutil
+
+import pytest
+from typer.testing import CliRunner
+
+from sphinx_codelinks.cmd import app
+from sphinx_codelinks.marked_content import (
+    dump_layout_2,
+    is_written_by_analyse,
+    iter_marked_content,
+    load_marked_objs,
+    write_digest,
+)
+from sphinx_codelinks.needextend_write import convert_marked_content
+
+from .conftest import DATA_DIR
+
+MARKED_CONTENT = {
+    "project_1": [
+        {
+            "filepath": "/src/dummy_1.cpp",
+            "remote_url": "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_1.cpp#L3",
+            "source_map": {
+                "start": {"row": 2, "column": 13},
+                "end": {"row": 2, "column": 51},
+            },
+            "tagged_scope": "void dummy_func1(){\n     //...\n }",
+            "need_ids": ["NEED_001", "NEED_002"],
+            "marker": "@need-ids:",
+            "type": "need-id-refs",
+        },
+        {
+            "filepath": "/src/dummy_1.cpp",
+            "remote_url": None,
+            "source_map": {
+                "start": {"row": 7, "column": 3},
+                "end": {"row": 7, "column": 30},
+            },
+            "tagged_scope": None,
+            "need": {"title": "Function Bar", "id": "IMPL_4", "type": "impl"},
+            "type": "need",
+        },
+    ],
+    "project_2": [],
+    "project_3": [
+        {
+            "filepath": "/src/dummy_2.cpp",
+            "remote_url": "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_2.cpp#L5",
+            "source_map": {
+                "start": {"row": 4, "column": 8},
+                "end": {"row": 4, "column": 61},
+            },
+            "tagged_scope": None,
+            "need_ids": ["NEED_001"],
+            "marker": "@need-ids:",
+            "type": "need-id-refs",
+        },
+    ],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_marked_content(chunk_size: int, indent: int | None) -> None:
+    text = json.dumps(MARKED_CONTENT, indent=indent)
+
+    objs = list(iter_marked_content(io.StringIO(text), chunk_size))
+
+    assert objs == [
+        (project, obj) for project, objs in MARKED_CONTENT.items() for obj in objs
+    ]
+
+
+@pytest.mark.parametrize(
+    ("text", "message"),
+    [
+        ("", "Expecting '{': line 1 column 1 (char 0)"),
+        ('{"whatever": "json" "not": "expected"}', "Expecting '['"),
+        ('{"project": [{"a": 1}\n{"b": 2}]}', "Expecting ',' or ']': line 2 column 1"),
+        ('{"project": [{"a" 1}]}', "Expecting ':' delimiter: line 1 column 19"),
+        ("{1: []}", "Expecting property name enclosed in double quotes"),
+        ('{"project": [{"a": 1}]', "Expecting ',' or '}'"),
+        ('{"project": []} []', "Extra data: line 1 column 17 (char 16)"),
+    ],
+)
+def test_iter_marked_content_negative(text: str, message: str) -> None:
+    with pytest.raises(ValueError, match=re.escape(message)):
+        list(iter_marked_content(io.StringIO(text), chunk_size=4))
+
+
+def _layout_2_text(marked_content: dict[str, list[dict[str, object]]]) -> str:
+    output = io.StringIO()
+    dump_layout_2(output, marked_content.items())  # type: ignore[arg-type]
+    return output.getvalue()
+
+
+MARKED_CONTENT_SHARED = {
+    **MARKED_CONTENT,
+    "project_1": [
+        *MARKED_CONTENT["project_1"],
+        # same file and scope with a remote url of the same prefix
+        {
+            **MARKED_CONTENT["project_1"][0],
+            "remote_url": "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_1.cpp#L12",
+            "source_map": {
+                "start": {"row": 11, "column": 3},
+                "end": {"row": 11, "column": 30},
+            },
+        },
+        # a remote url without the line number
+        {
+            **MARKED_CONTENT["project_3"][0],
+            "remote_url": "git@github.com:useblocks/sphinx-codelinks.git",
+            "tagged_scope": {
+                "type": "function_definition",
+                "name": "dummy_func2",
+                "start": {"row": 5, "column": 0},
+                "end": {"row": 7, "column": 1},
+            },
+        },
+    ],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_iter_marked_content_layout_2(chunk_size: int) -> None:
+    text = _layout_2_text(MARKED_CONTENT_SHARED)
+
+    objs = list(iter_marked_content(io.StringIO(text), chunk_size))
+
+    expected = [
+        (project, obj)
+        for project, objs in MARKED_CONTENT_SHARED.items()
+        for obj in objs
+    ]
+    assert objs == expected
+    # the expanded objects have the keys in the order of layout 1
+    assert [list(obj) for _, obj in objs] == [list(obj) for _, obj in expected]
+
+
+def test_layout_2_tables() -> None:
+    layout = json.loads(_layout_2_text(MARKED_CONTENT_SHARED))
+
+    assert layout["layout"] == 2
+    project = layout["projects"]["project_1"]
+    assert project["files"] == ["/src/dummy_1.cpp", "/src/dummy_2.cpp"]
+    assert project["url_prefixes"] == [
+        "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_1.cpp#L",
+        None,
+    ]
+    assert len(project["scopes"]) == 2
+    # only the remote urls which are not derived from the url prefix are kept
+    assert [marker.get("remote_url", "derived") for marker in project["markers"]] == [
+        "derived",
+        None,
+        "derived",
+        "git@github.com:useblocks/sphinx-codelinks.git",
+    ]
+    assert [marker["scope"] for marker in project["markers"]] == [0, None, 0, 1]
+
+
+def test_iter_marked_content_project_named_layout() -> None:
+    text = json.dumps({"layout": MARKED_CONTENT["project_3"]})
+
+    objs = list(iter_marked_content(io.StringIO(text)))
+
+    assert objs == [("layout", MARKED_CONTENT["project_3"][0])]
+
+
+@pytest.mark.parametrize(
+    ("text", "message"),
+    [
+        ('{"layout": 3, "projects": {}}', "Unsupported layout 3"),
+        ('{"layout": 2, "files": []}', "Unexpected key 'files'"),
+        ('{"layout": 2, "projects": {"p": {"tables": []}}}', "Unexpected key 'tables'"),
+        (
+            '{"layout": 2, "projects": {"p": {"markers": [{"file": 0, "scope": null}]}}}',
+            "Invalid marker {'file': 0, 'scope': None} of project 'p'",
+        ),
+    ],
+)
+def test_iter_marked_content_layout_2_negative(text: str, message: str) -> None:
+    with pytest.raises(ValueError, match=re.escape(message)):
+        list(iter_marked_content(io.StringIO(text), chunk_size=4))
+
+
+def test_analyse_layout_2(tmp_path: Path) -> None:
+    # a repository with a remote, so that the markers have remote urls
+    repo = tmp_path / "repo"
+    (repo / ".git" / "refs" / "heads").mkdir(parents=True)
+    (repo / ".git" / "config").write_text(
+        '[remote "origin"]\n    url = https://github.com/test/repo.git\n'
+    )
+    (repo / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    (repo / ".git" / "refs" / "heads" / "main").write_text("abc123def456\n")
+    for data_dir in ("need_id_refs", "dcdc"):
+        shutil.copytree(DATA_DIR / data_dir, repo / "src" / data_dir)
+    config_path = repo / "codelinks.toml"
+    config_path.write_text(
+        "[codelinks.projects.repo.source_discover]\n"
+        'src_dir = "src"\n'
+        "gitignore = false\n"
+        "[codelinks.projects.repo.analyse]\n"
+        'git_root = "."\n'
+        "get_oneline_needs = true\n"
+        "get_rst = true\n"
+    )
+
+    outputs = []
+    for layout in ("1", "2"):
+        outdir = tmp_path / layout
+        outdir.mkdir()
+        result = CliRunner().invoke(
+            app,
+            ["analyse", str(config_path), "--outdir", str(outdir), "--layout", layout],
+        )
+        assert result.exit_code == 0, result.output
+        outpath = outdir / "needextend.rst"
+        result = CliRunner().invoke(
+            app,
+            ["write", "rst", str(outdir / "marked_content.json"), "-o", str(outpath)],
+        )
+        assert result.exit_code == 0, result.output
+        outputs.append(outdir)
+
+    layout_1, layout_2 = (outdir / "marked_content.json" for outdir in outputs)
+    objs = list(load_marked_objs(layout_1))
+    assert objs[0][1]["remote_url"].startswith("https://github.com/test/repo/")
+    assert list(load_marked_objs(layout_2)) == objs
+    assert layout_2.stat().st_size < layout_1.stat().st_size
+    assert is_written_by_analyse(layout_2)
+    rst_1, rst_2 = ((outdir / "needextend.rst").read_text() for outdir in outputs)
+    assert rst_1.count(".. needextend::")
+    assert rst_2 == rst_1
+
+
+def test_write_rst_streamed_identical(tmp_path: Path) -> None:
+    jsonpath = tmp_path / "marked_content.json"
+    jsonpath.write_text(json.dumps(MARKED_CONTENT))
+    outpath = tmp_path / "needextend.rst"
+
+    result = CliRunner().invoke(
+        app,
+        ["write", "rst", str(jsonpath), "-o", str(outpath), "-t", "Links"],
+    )
+
+    assert result.exit_code == 0, result.output
+    texts, errors = convert_marked_content(
+        [obj for objs in MARKED_CONTENT.values() for obj in objs],  # type: ignore[misc]
+        "remote_url",
+        "Links",
+    )
+    assert not errors
+    assert outpath.read_text() == "".join(texts)
+    assert outpath.read_text().count(".. needextend::") == 2
+
+
+def test_iter_marked_content_analyse_output() -> None:
+    jsonpath = DATA_DIR / "analyse" / "marked_content.json"
+    with jsonpath.open() as f:
+        expected = json.load(f)
+    with jsonpath.open() as f:
+        objs = list(iter_marked_content(f, chunk_size=100))
+    assert objs == [
+        (project, obj) for project, objs in expected.items() for obj in objs
+    ]
+
+
+def test_is_written_by_analyse(tmp_path: Path) -> None:
+    config_path = DATA_DIR / "configs" / "minimum_config.toml"
+    result = CliRunner().invoke(
+        app, ["analyse", str(config_path), "--outdir", str(tmp_path)]
+    )
+    assert result.exit_code == 0, result.output
+    jsonpath = tmp_path / "marked_content.json"
+    assert (tmp_path / "marked_content.json.sha256").exists()
+    assert is_written_by_analyse(jsonpath)
+
+    # once modified, the file has to be validated again
+    marked_content = json.loads(jsonpath.read_text())
+    next(iter(marked_content.values()))[0]["filepath"] = 123
+    jsonpath.write_text(json.dumps(marked_content))
+    assert not is_written_by_analyse(jsonpath)
+
+    write_digest(jsonpath)
+    assert is_written_by_analyse(jsonpath)
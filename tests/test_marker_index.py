@@ -0,0 +1,200 @@
+from copy import deepcopy
+import json
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from sphinx_codelinks.cmd import app
+from sphinx_codelinks.marker_index import (
+    INDEX_FILENAME,
+    MarkerIndex,
+    get_related_need_ids,
+)
+from sphinx_codelinks.needextend_write import MarkedObjType
+
+from .conftest import DATA_DIR
+
+NEED_ID_REFS: MarkedObjType = {
+    "filepath": "/src/dummy_1.cpp",
+    "remote_url": "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_1.cpp#L3",
+    "source_map": {"start": {"row": 2, "column": 13}, "end": {"row": 2, "column": 51}},
+    "tagged_scope": "void dummy_func1(){\n     //...\n }",
+    "need_ids": ["NEED_001", "NEED_002"],
+    "marker": "@need-ids:",
+    "type": "need-id-refs",
+}
+ONELINE_NEED: MarkedObjType = {
+    "filepath": "/src/dummy_1.cpp",
+    "remote_url": None,
+    "source_map": {"start": {"row": 7, "column": 3}, "end": {"row": 7, "column": 30}},
+    "tagged_scope": "void dummy_func1(){\n     //...\n }",
+    "need": {"title": "Function Bar", "id": "IMPL_4", "links": ["NEED_001"]},
+    "type": "need",
+}
+MARKED_RST: MarkedObjType = {
+    "filepath": "/src/dummy_2.cpp",
+    "remote_url": None,
+    "source_map": {"start": {"row": 4, "column": 8}, "end": {"row": 4, "column": 61}},
+    "tagged_scope": None,
+    "rst": ".. impl:: implement dummy function 1\n",
+    "type": "rst",
+}
+
+
+def test_get_related_need_ids() -> None:
+    assert get_related_need_ids(NEED_ID_REFS) == [
+        ("NEED_001", "ref"),
+        ("NEED_002", "ref"),
+    ]
+    assert get_related_need_ids(ONELINE_NEED) == [
+        ("IMPL_4", "id"),
+        ("NEED_001", "links"),
+    ]
+    assert get_related_need_ids(MARKED_RST) == []
+
+
+def test_query(tmp_path: Path) -> None:
+    with MarkerIndex(tmp_path / INDEX_FILENAME) as index:
+        index.update_project(
+            "project_1",
+            ["/src/dummy_1.cpp", "/src/dummy_2.cpp"],
+            [NEED_ID_REFS, ONELINE_NEED, MARKED_RST],
+        )
+
+        markers = index.query(need_id="NEED_001")
+        assert [(m.type, m.start_row) for m in markers] == [
+            ("need-id-refs", 2),
+            ("need", 7),
+        ]
+        assert markers[0].need_ids == ["NEED_001", "NEED_002"]
+        assert markers[0].tagged_scope == NEED_ID_REFS["tagged_scope"]
+        assert markers[0].remote_url == NEED_ID_REFS["remote_url"]
+
+        markers = index.query(filepath="/src/dummy_2.cpp")
+        assert [(m.type, m.need_ids) for m in markers] == [("rst", [])]
+
+        assert index.query(need_id="IMPL_4", filepath="/src/dummy_2.cpp") == []
+        assert len(index.query()) == 3
+
+
+def test_query_need_ids_at_once(tmp_path: Path) -> None:
+    with MarkerIndex(tmp_path / INDEX_FILENAME) as index:
+        index.update_project(
+            "project_1",
+            ["/src/dummy_1.cpp", "/src/dummy_2.cpp"],
+            [NEED_ID_REFS, ONELINE_NEED, MARKED_RST],
+        )
+        statements: list[str] = []
+        index.connection.set_trace_callback(statements.append)
+
+        markers = index.query()
+
+        assert [m.need_ids for m in markers] == [
+            ["NEED_001", "NEED_002"],
+            ["IMPL_4", "NEED_001"],
+            [],
+        ]
+        # one query for the markers and one for their need ids
+        assert len(statements) == 2
+
+
+def test_query_resolved_paths(tmp_path: Path) -> None:
+    src_dir = tmp_path / "src"
+    (src_dir / "sub").mkdir(parents=True)
+    (src_dir / "dummy_1.cpp").touch()
+    (tmp_path / "link").symlink_to(src_dir, target_is_directory=True)
+    marker = deepcopy(NEED_ID_REFS)
+    # analysed through the symbolic link
+    marker["filepath"] = str(tmp_path / "link" / "dummy_1.cpp")
+    with MarkerIndex(tmp_path / INDEX_FILENAME) as index:
+        index.update_project("project_1", [marker["filepath"]], [marker])
+
+        for filepath in (
+            src_dir / "dummy_1.cpp",
+            src_dir / "sub" / ".." / "dummy_1.cpp",
+            tmp_path / "link" / "dummy_1.cpp",
+        ):
+            (indexed,) = index.query(filepath=str(filepath))
+            assert indexed.filepath == str(src_dir.resolve() / "dummy_1.cpp")
+
+
+def test_query_scope_summary(tmp_path: Path) -> None:
+    summary = {
+        "type": "function_definition",
+        "name": "dummy_func1",
+        "start": {"row": 3, "column": 0},
+        "end": {"row": 5, "column": 2},
+    }
+    marker = deepcopy(NEED_ID_REFS)
+    marker["tagged_scope"] = summary
+    with MarkerIndex(tmp_path / INDEX_FILENAME) as index:
+        index.update_project("project_1", ["/src/dummy_1.cpp"], [marker])
+
+        (indexed,) = index.query(need_id="NEED_001")
+        assert indexed.tagged_scope is not None
+        assert json.loads(indexed.tagged_scope) == summary
+
+
+def test_update_project_incremental(tmp_path: Path) -> None:
+    with MarkerIndex(tmp_path / INDEX_FILENAME) as index:
+        assert (
+            index.update_project(
+                "project_1",
+                ["/src/dummy_1.cpp", "/src/dummy_2.cpp"],
+                [NEED_ID_REFS, ONELINE_NEED, MARKED_RST],
+            )
+            == 2
+        )
+        # nothing changed, nothing is rewritten
+        assert (
+            index.update_project(
+                "project_1",
+                ["/src/dummy_1.cpp", "/src/dummy_2.cpp"],
+                [NEED_ID_REFS, ONELINE_NEED, MARKED_RST],
+            )
+            == 0
+        )
+
+        moved_rst = deepcopy(MARKED_RST)
+        moved_rst["source_map"]["start"]["row"] = 10
+        assert (
+            index.update_project(
+                "project_1",
+                ["/src/dummy_1.cpp", "/src/dummy_2.cpp"],
+                [NEED_ID_REFS, ONELINE_NEED, moved_rst],
+            )
+            == 1
+        )
+        assert [m.start_row for m in index.query(filepath="/src/dummy_2.cpp")] == [10]
+
+        # files which are no longer analysed are removed
+        index.update_project("project_1", ["/src/dummy_2.cpp"], [moved_rst])
+        assert index.query(need_id="NEED_001") == []
+        assert len(index.query()) == 1
+
+
+def test_cli_query(tmp_path: Path) -> None:
+    runner = CliRunner()
+    config_path = DATA_DIR / "configs" / "minimum_config.toml"
+    result = runner.invoke(
+        app, ["analyse", str(config_path), "--outdir", str(tmp_path), "--index"]
+    )
+    assert result.exit_code == 0, result.output
+    index_path = tmp_path / INDEX_FILENAME
+    assert index_path.exists()
+
+    result = runner.invoke(
+        app, ["query", "--need-id", "NEED_001", "-i", str(index_path)]
+    )
+    assert result.exit_code == 0, result.output
+    assert "need_id_refs/dummy_1.cpp:3:13" in result.output
+    assert "need-id-refs NEED_001" in result.output
+
+    result = runner.invoke(
+        app, ["query", "--need-id", "NOT_EXISTING", "-i", str(index_path)]
+    )
+    assert result.exit_code == 1
+
+    result = runner.invoke(app, ["query", "-i", str(index_path)])
+    assert result.exit_code != 0
+    assert "Either --need-id or --file must be given" in result.output
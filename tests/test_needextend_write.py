@@ -1,7 +1,14 @@
 # @Test suite for needextend RST generation from extracted markers, TEST_WRITE_1, test, [IMPL_CLI_WRITE]
+from dataclasses import fields
+
+from jsonschema import ValidationError, validate
 import pytest
 
-from sphinx_codelinks.needextend_write import convert_marked_content
+from sphinx_codelinks.needextend_write import (
+    MarkedContentSchema,
+    collect_need_id_urls,
+    convert_marked_content,
+)
 
 
 @pytest.mark.parametrize(
@@ -70,3 +77,76 @@ def test_convert_marked_content(markers, texts):
     assert not errors
 
     assert needextend_texts == texts
+
+
+NEED_ID_REFS = {
+    "filepath": "/src/dummy_1.cpp",
+    "remote_url": "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_1.cpp#L3",
+    "source_map": {"start": {"row": 2, "column": 13}, "end": {"row": 2, "column": 51}},
+    "tagged_scope": "void dummy_func1(){\n     //...\n }",
+    "need_ids": ["NEED_001"],
+    "marker": "@need-ids:",
+    "type": "need-id-refs",
+}
+
+
+def _check_per_field(obj: dict) -> list[str]:
+    """Reference validation with one jsonschema.validate call per field."""
+    errors = []
+    schema = MarkedContentSchema(**obj)
+    for _field in fields(MarkedContentSchema):
+        try:
+            validate(getattr(schema, _field.name), _field.metadata["schema"])
+        except ValidationError as e:
+            errors.append(
+                f"Schema validation error in field '{_field.name}': {e.message}"
+            )
+    return errors + schema.check_conditional_required_fields()
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {},
+        {"filepath": 123},
+        {"remote_url": None, "tagged_scope": 5},
+        {"source_map": {"start": {"row": "2", "column": 13}}},
+        {"source_map": {"start": {"row": 2}, "end": {}, "middle": 1}},
+        {"type": "unknown"},
+        {"need_ids": ["NEED_001", 2], "marker": None},
+        {"need_ids": []},
+        {"type": "rst", "rst": None},
+        {"type": "need", "need": {"title": "title only"}},
+    ],
+)
+def test_check_obj(changes: dict) -> None:
+    obj = {**NEED_ID_REFS, **changes}
+
+    assert MarkedContentSchema.check_obj(obj) == _check_per_field(obj)
+    assert MarkedContentSchema(**obj).check_loaded_objs() == _check_per_field(obj)
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        {key: value for key, value in NEED_ID_REFS.items() if key != "filepath"},
+        {**NEED_ID_REFS, "unknown": 1},
+    ],
+)
+def test_check_obj_type_error(obj: dict) -> None:
+    with pytest.raises(TypeError) as check_error:
+        MarkedContentSchema.check_obj(obj)
+    with pytest.raises(TypeError) as init_error:
+        MarkedContentSchema(**obj)
+    assert str(check_error.value) == str(init_error.value)
+
+
+def test_collect_need_id_urls_without_validation() -> None:
+    invalid_obj = {**NEED_ID_REFS, "filepath": 123}
+
+    _, errors = collect_need_id_urls([invalid_obj])
+    assert errors
+
+    id_urls, errors = collect_need_id_urls([invalid_obj], validate=False)
+    assert not errors
+    assert id_urls == {"NEED_001": [NEED_ID_REFS["remote_url"]]}
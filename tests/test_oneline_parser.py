@@ -1,9 +1,12 @@
 # @Test suite for one-line comment parser functionality, TEST_OLP_1, test, [IMPL_OLP_1]
+import random
+
 import pytest
 
 from sphinx_codelinks.analyse.oneline_parser import (
     OnelineParserInvalidWarning,
     WarningSubTypeEnum,
+    custom_split,
     oneline_parser,
 )
 from sphinx_codelinks.config import ESCAPE, UNIX_NEWLINE, OneLineCommentStyle
@@ -527,3 +530,88 @@ def test_oneline_parser_default_config_negative(
 def test_oneline_schema_validator_negative(oneline_config, result):
     errors = oneline_config.check_fields_configuration()
     assert sorted(errors) == sorted(result)
+
+
+def reference_custom_split(
+    string: str, delimiter: str, positions_list_str: list[int] | None = None
+) -> list[str]:
+    """The char by char implementation of custom_split, as the reference of its fast paths."""
+    if positions_list_str is None:
+        positions_list_str = []
+    escape_chars = [delimiter, "[", "]", ESCAPE]
+    field = []
+    fields: list[str] = []
+    leading_escape = False
+    expect_closing_bracket = False
+
+    for char in string:
+        current_field_idx = len(fields) + 1
+        is_list_str_field = current_field_idx in positions_list_str
+
+        if leading_escape:
+            if char not in escape_chars:
+                field.append(ESCAPE)
+            field.append(char)
+            leading_escape = False
+            continue
+
+        if char == ESCAPE and not is_list_str_field:
+            leading_escape = True
+            continue
+
+        if char == delimiter:
+            if is_list_str_field and expect_closing_bracket:
+                field.append(char)
+            else:
+                fields.append("".join(field))
+                field = []
+            continue
+
+        if is_list_str_field:
+            if char == "[":
+                expect_closing_bracket = True
+            if char == "]":
+                expect_closing_bracket = False
+
+        field.append(char)
+
+    fields.append("".join(field))
+    return fields
+
+
+@pytest.mark.parametrize(
+    ("string", "delimiter", "positions_list_str"),
+    [
+        ("", ",", None),
+        ("title 1, IMPL_1, impl", ",", None),
+        ("title 1, IMPL_1, impl, [SPEC_1, SPEC_2]", ",", [4]),
+        ("title\\, 1, IMPL_1", ",", None),
+        ("title \\[1\\], IMPL_1, [SPEC\\,1]", ",", [3]),
+        ("title \\a, IMPL_1\\", ",", None),
+        ("title 1 IMPL_1 impl", " ", [3]),
+        ("title 1,, IMPL_1", ",,", None),
+        ("[A, B], [C, D", ",", [1, 2, 3]),
+        ("a]b[c,d]e,f", "]", [1, 2]),
+        ("a\\b\\\\c,d", "\\", [2]),
+    ],
+)
+def test_custom_split(
+    string: str, delimiter: str, positions_list_str: list[int] | None
+) -> None:
+    assert custom_split(string, delimiter, positions_list_str) == (
+        reference_custom_split(string, delimiter, positions_list_str)
+    )
+
+
+def test_custom_split_random() -> None:
+    rnd = random.Random(39)  # noqa: S311  # reproducible strings
+    alphabet = ["a", "b", " ", ",", ";", "[", "]", ESCAPE, UNIX_NEWLINE, "ä"]
+    for _ in range(20000):
+        string = "".join(rnd.choices(alphabet, k=rnd.randrange(12)))
+        delimiter = rnd.choice([",", ";", " ", "[", "]", ESCAPE, ",;", ""])
+        positions_list_str = rnd.choice(
+            [None, [], [1], [2], [1, 3], sorted(rnd.sample(range(1, 5), 2))]
+        )
+        assert custom_split(string, delimiter, positions_list_str) == (
+            reference_custom_split(string, delimiter, positions_list_str)
+        ), (string, delimiter, positions_list_str)
@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from sphinx_codelinks.cmd import app
+from sphinx_codelinks.marked_content import dump_layout_2
+from sphinx_codelinks.parquet_write import PARQUET_COLUMNS, convert_to_columns
+
+MARKED_CONTENT = {
+    "project_1": [
+        {
+            "filepath": "/src/dummy_1.cpp",
+            "remote_url": "https://github.com/useblocks/sphinx-codelinks/blob/main/dummy_1.cpp#L3",
+            "source_map": {
+                "start": {"row": 2, "column": 13},
+                "end": {"row": 2, "column": 51},
+            },
+            "tagged_scope": "void dummy_func1(){\n     //...\n }",
+            "need_ids": ["NEED_001", "NEED_002"],
+            "marker": "@need-ids:",
+            "type": "need-id-refs",
+        },
+        {
+            "filepath": "/src/dummy_1.cpp",
+            "remote_url": None,
+            "source_map": {
+                "start": {"row": 7, "column": 3},
+                "end": {"row": 7, "column": 30},
+            },
+            "tagged_scope": None,
+            "need": {"title": "Function Bar", "id": "IMPL_4", "type": "impl"},
+            "type": "need",
+        },
+    ],
+    "project_2": [
+        {
+            "filepath": "/src/dummy_2.cpp",
+            "remote_url": None,
+            "source_map": {
+                "start": {"row": 4, "column": 8},
+                "end": {"row": 4, "column": 61},
+            },
+            "tagged_scope": None,
+            "rst": ".. impl:: implement dummy function 1\n",
+            "type": "rst",
+        },
+    ],
+}
+
+
+def test_convert_to_columns():
+    columns = convert_to_columns(MARKED_CONTENT)
+
+    assert tuple(columns) == PARQUET_COLUMNS
+    # need ids are exploded into rows, markers without ids keep one row
+    assert columns["project"] == ["project_1", "project_1", "project_1", "project_2"]
+    assert columns["need_id"] == ["NEED_001", "NEED_002", "IMPL_4", None]
+    assert columns["type"] == ["need-id-refs", "need-id-refs", "need", "rst"]
+    assert columns["start_row"] == [2, 2, 7, 4]
+    assert columns["end_column"] == [51, 51, 30, 61]
+    assert columns["tagged_scope"][:2] == [
+        "void dummy_func1(){\n     //...\n }",
+        "void dummy_func1(){\n     //...\n }",
+    ]
+
+
+@pytest.mark.parametrize("layout", [1, 2])
+def test_write_parquet(tmp_path: Path, layout: int) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    jsonpath = tmp_path / "marked_content.json"
+    if layout == 1:
+        jsonpath.write_text(json.dumps(MARKED_CONTENT))
+    else:
+        with jsonpath.open("w") as f:
+            dump_layout_2(f, MARKED_CONTENT.items())
+    outpath = tmp_path / "marked_content.parquet"
+
+    result = CliRunner().invoke(
+        app, ["write", "parquet", str(jsonpath), "--outpath", str(outpath)]
+    )
+
+    assert result.exit_code == 0, result.output
+    table = pq.read_table(outpath)
+    assert table.column_names == list(PARQUET_COLUMNS)
+    assert table.num_rows == 4
+    assert table.column("need_id").to_pylist() == [
+        "NEED_001",
+        "NEED_002",
+        "IMPL_4",
+        None,
+    ]
+    assert table.column("project").to_pylist() == [
+        "project_1",
+        "project_1",
+        "project_1",
+        "project_2",
+    ]
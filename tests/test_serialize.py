@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from sphinx_codelinks import serialize
+from sphinx_codelinks.analyse.analyse import AnalyseWarning
+from sphinx_codelinks.analyse.models import MarkedContentType
+
+OBJS = [
+    {
+        "filepath": "/src/dümmy_1.cpp",
+        "remote_url": None,
+        "source_map": {
+            "start": {"row": 2, "column": 13},
+            "end": {"row": 2, "column": 51},
+        },
+        "tagged_scope": 'void f() {\n    // "quoted" \\ \t 中文 😀\n}',
+        "need_ids": ["NEED_001", "NEED_002"],
+        "marker": "@need-ids:",
+        "type": MarkedContentType.need_id_refs,
+    },
+    [],
+    {},
+    [1, -2, True, False, None, "\x00\x1f\x7f\u2028"],
+    [AnalyseWarning("/src/a.c", 3, "too many fields", "oneline", "too_many_fields")],
+]
+
+
+@pytest.fixture(params=["json", "orjson"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(serialize, "orjson", None)
+    elif serialize.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert serialize.get_backend() == request.param
+    return request.param
+
+
+@pytest.mark.parametrize("obj", OBJS)
+def test_dumps(backend, obj):
+    text = serialize.dumps(obj)
+
+    expected = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=vars)
+    assert text == expected
+    assert serialize.loads(text) == serialize.loads(text.encode()) == json.loads(text)
+
+
+def test_dumps_unserializable(backend):
+    with pytest.raises(TypeError):
+        serialize.dumps({"path": object()})
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from sphinx_codelinks.analyse.shard import Shard, ShardSelector, ShardStrategy
+
+
+def _write_files(src_dir: Path, sizes: list[int]) -> list[Path]:
+    src_files = []
+    for idx, size in enumerate(sizes):
+        src_file = src_dir / f"dir_{idx % 3}" / f"src_{idx}.c"
+        src_file.parent.mkdir(parents=True, exist_ok=True)
+        src_file.write_text("x" * size)
+        src_files.append(src_file)
+    return sorted(src_files)
+
+
+@pytest.mark.parametrize("strategy", list(ShardStrategy))
+def test_shards_partition_files(strategy: ShardStrategy, tmp_path: Path) -> None:
+    sizes = [(idx * 37) % 101 + 1 for idx in range(40)]
+    checkouts = [tmp_path / "node_1", tmp_path / "node_2"]
+    partitions = []
+    for checkout in checkouts:
+        src_files = _write_files(checkout, sizes)
+        selectors = [ShardSelector(Shard(idx, 4, strategy)) for idx in range(1, 5)]
+        partitions.append(
+            [
+                [
+                    src_file.relative_to(checkout)
+                    for src_file in selector.select(src_files, checkout)
+                ]
+                for selector in selectors
+            ]
+        )
+        # disjoint, complete and in the order of the discovered files
+        selected = [
+            src_file for shard_files in partitions[-1] for src_file in shard_files
+        ]
+        assert sorted(selected) == [f.relative_to(checkout) for f in src_files]
+        assert all(shard_files == sorted(shard_files) for shard_files in partitions[-1])
+        assert all(partitions[-1])
+
+    # the same partition on every node, wherever the checkout is
+    assert partitions[0] == partitions[1]
+
+
+def test_shards_balance_sizes(tmp_path: Path) -> None:
+    sizes = [1000, 600, 500, 400, 300, 200, 100, 100]
+    src_files = _write_files(tmp_path, sizes)
+    selectors = [ShardSelector(Shard(idx, 2, ShardStrategy.size)) for idx in (1, 2)]
+    loads = [
+        sum(
+            src_file.stat().st_size for src_file in selector.select(src_files, tmp_path)
+        )
+        for selector in selectors
+    ]
+
+    assert loads == [1600, 1600]
+
+
+@pytest.mark.parametrize(
+    ("text", "shard"),
+    [("1/1", Shard(1, 1)), ("2/4", Shard(2, 4)), (" 3 / 3 ", Shard(3, 3))],
+)
+def test_parse_shard(text: str, shard: Shard) -> None:
+    assert Shard.parse(text) == shard
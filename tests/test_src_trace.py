@@ -2,10 +2,12 @@
 from collections.abc import Callable
 from pathlib import Path
 import shutil
+import subprocess
 
 import pytest
 from sphinx.environment import CONFIG_OK
 from sphinx.testing.util import SphinxTestApp
+from sphinx_needs.data import SphinxNeedsData  # type: ignore[import-untyped]
 
 from sphinx_codelinks.analyse.projects import AnalyseProjects
 from sphinx_codelinks.config import (
@@ -13,6 +15,11 @@ from sphinx_codelinks.config import (
     CodeLinksConfig,
     check_configuration,
 )
+from sphinx_codelinks.sphinx_extension.dependencies import get_traced_sources
+from sphinx_codelinks.sphinx_extension.pre_analyse import (
+    get_pre_analysed,
+    get_tree_cache,
+)
 from sphinx_codelinks.sphinx_extension.source_tracing import set_config_to_sphinx
 
 
@@ -284,3 +291,332 @@ def test_incremental_build_keeps_src_trace_projects_unchanged(
         f"incremental build wrongly invalidated the environment: "
         f"config changed{captured.get('extra')}"
     )
+
+
+@pytest.mark.parametrize("set_local_url", [False, True])
+def test_incremental_build_reads_docs_of_changed_markers(
+    tmpdir: Path,
+    make_app: Callable[..., SphinxTestApp],
+    set_local_url: bool,
+) -> None:
+    srcdir = Path(tmpdir) / "doc"
+    (srcdir / "src" / "sub").mkdir(parents=True)
+    src_file = srcdir / "src" / "a.c"
+    src_file.write_text("// @Function A, IMPL_A, impl\nvoid a() {}\n")
+    (srcdir / "src" / "sub" / "b.c").write_text(
+        "// @Function B, IMPL_B, impl\nvoid b() {}\n"
+    )
+    (srcdir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+    )
+    (srcdir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        f"set_local_url = {str(set_local_url).lower()}\n"
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "src"\n'
+        "gitignore = false\n"
+    )
+    (srcdir / "index.rst").write_text(
+        "Index\n=====\n\n.. toctree::\n\n   file\n   dir\n"
+    )
+    (srcdir / "file.rst").write_text(
+        "File\n====\n\n.. src-trace::\n   :project: src\n   :file: a.c\n"
+    )
+    (srcdir / "dir.rst").write_text(
+        "Dir\n===\n\n.. src-trace::\n   :project: src\n   :directory: sub\n"
+    )
+
+    def build() -> list[str]:
+        app = make_app(srcdir=srcdir, freshenv=False)
+        read: list[str] = []
+
+        def capture_docnames(_app, _env, docnames):  # type: ignore[no-untyped-def]
+            read.extend(docnames)
+
+        app.connect("env-before-read-docs", capture_docnames)
+        app.build()
+        return sorted(read)
+
+    assert build() == ["dir", "file", "index"]
+
+    # the code and comments without markers out of the tagged scopes are not rendered
+    src_file.write_text(
+        "// @Function A, IMPL_A, impl\nvoid a() {}\n// a plain comment\nvoid d() {}\n"
+    )
+    assert build() == (["file"] if set_local_url else [])
+    # the new fingerprint is kept in the pickled environment
+    env = make_app(srcdir=srcdir, freshenv=False).env
+    (traced,) = get_traced_sources(env)["file"]
+    assert traced.fingerprints[str(src_file)].size == src_file.stat().st_size
+    assert build() == []
+
+    # the text of a tagged scope is part of the marked content
+    src_file.write_text(
+        "// @Function A, IMPL_A, impl\nvoid a() {\n    // a plain comment\n}\n"
+    )
+    assert build() == ["file"]
+
+    src_file.write_text("// @Function Changed A, IMPL_A, impl\nvoid a() {}\n")
+    assert build() == ["file"]
+
+    (srcdir / "src" / "sub" / "c.c").write_text("void c() {}\n")
+    assert build() == ["dir"]
+
+
+def test_build_emits_analyse_warnings(
+    tmpdir: Path,
+    make_app: Callable[..., SphinxTestApp],
+) -> None:
+    srcdir = Path(tmpdir) / "doc"
+    srcdir.mkdir()
+    (srcdir / "many_fields.c").write_text(
+        "".join(
+            f"// @Function {idx}, IMPL_{idx}, impl, [], open, high\nvoid f{idx}() {{}}\n"
+            for idx in range(5)
+        )
+    )
+    (srcdir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+    )
+    (srcdir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        "max_warnings = 2\n"
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "."\n'
+        "gitignore = false\n"
+    )
+    (srcdir / "index.rst").write_text(
+        "Index\n=====\n\n.. src-trace::\n   :project: src\n   :file: many_fields.c\n"
+    )
+
+    # the limit is per build, not per process
+    for _ in range(2):
+        app = make_app(srcdir=srcdir, freshenv=True)
+        app.build()
+
+        warnings = app.warning.getvalue()
+        assert warnings.count("many_fields.c:") == 2
+        assert "3 more warnings not shown (too_many_fields: 3)" in warnings
+
+
+@pytest.mark.parametrize("tree_cache_size", [0, 1])
+def test_build_keeps_parsed_trees(
+    tmpdir: Path,
+    make_app: Callable[..., SphinxTestApp],
+    tree_cache_size: int,
+) -> None:
+    srcdir = Path(tmpdir) / "doc"
+    srcdir.mkdir()
+    for name in ("a", "b"):
+        (srcdir / f"{name}.c").write_text(
+            f"// @Function {name}, IMPL_{name}, impl\nvoid {name}() {{}}\n"
+        )
+    (srcdir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+    )
+    (srcdir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        f"tree_cache_size = {tree_cache_size}\n"
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "."\n'
+        "gitignore = false\n"
+    )
+    (srcdir / "index.rst").write_text(
+        "Index\n=====\n\n.. src-trace::\n   :project: src\n"
+    )
+
+    app = make_app(srcdir=srcdir, freshenv=True)
+    app.build()
+
+    tree_cache = get_tree_cache(app)
+    if tree_cache_size:
+        assert tree_cache is not None
+        # the least recently parsed file is evicted
+        assert list(tree_cache.trees) == [srcdir / "b.c"]
+    else:
+        assert tree_cache is None
+
+
+@pytest.mark.parametrize("pre_analyse", [True, False])
+def test_build_pre_analyse(
+    tmpdir: Path,
+    make_app: Callable[..., SphinxTestApp],
+    pre_analyse: bool,
+) -> None:
+    srcdir = Path(tmpdir) / "doc"
+    for name, src_file, func in (
+        ("cs", "dummy_src.cs", "void {0}() {{}}\n"),
+        ("go", "dummy_src.go", "func {0}() {{}}\n"),
+    ):
+        (srcdir / name).mkdir(parents=True)
+        (srcdir / name / src_file).write_text(
+            "".join(
+                f"// @ title {idx}, {name.upper()}_IMPL_{idx}, impl\n"
+                + func.format(f"f{idx}")
+                for idx in (1, 2)
+            )
+        )
+    (srcdir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+    )
+    (srcdir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        f"pre_analyse = {str(pre_analyse).lower()}\n"
+        "[codelinks.projects.cs.source_discover]\n"
+        'src_dir = "cs"\n'
+        'comment_type = "cs"\n'
+        "[codelinks.projects.go.source_discover]\n"
+        'src_dir = "go"\n'
+        'comment_type = "go"\n'
+        "[codelinks.projects.unused.source_discover]\n"
+        'src_dir = "."\n'
+    )
+    (srcdir / "index.rst").write_text(
+        "Index\n=====\n\n"
+        ".. src-trace::\n   :project: cs\n\n"
+        ".. src-trace::\n   :project: go\n   :file: dummy_src.go\n"
+    )
+
+    app = make_app(srcdir=srcdir, freshenv=True)
+    analysed: dict[str, list[str]] = {}
+
+    def capture_pre_analysed(app, _env, _docnames):  # type: ignore[no-untyped-def]
+        analysed["projects"] = sorted(get_pre_analysed(app))
+
+    # after the projects are analysed
+    app.connect("env-before-read-docs", capture_pre_analysed, priority=900)
+    app.build()
+
+    assert analysed["projects"] == (["cs", "go"] if pre_analyse else [])
+    assert not get_pre_analysed(app)
+    # the warnings of the workers are emitted by the build
+    assert app.warning.getvalue().count("git root is not found") == 2
+    # the same needs are rendered either way
+    assert list(SphinxNeedsData(app.env).get_needs_view()) == [
+        "CS_IMPL_1",
+        "CS_IMPL_2",
+        "GO_IMPL_1",
+        "GO_IMPL_2",
+    ]
+
+
+def git(repo: Path, *args: str) -> str:
+    git_path = shutil.which("git")
+    if git_path is None:
+        pytest.skip("git is not installed")
+    result = subprocess.run(  # noqa: S603
+        [
+            git_path,
+            "-c",
+            "user.name=Test User",
+            "-c",
+            "user.email=test@example.com",
+            *args,
+        ],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def test_remote_urls_link_to_last_change(
+    tmpdir: Path,
+    make_app: Callable[..., SphinxTestApp],
+) -> None:
+    repo = Path(tmpdir)
+    srcdir = repo / "doc"
+    (srcdir / "src").mkdir(parents=True)
+    src_a = srcdir / "src" / "a.c"
+    src_a.write_text("// @Function A, IMPL_A, impl\nvoid a() {}\n")
+    (srcdir / "conf.py").write_text(
+        'extensions = ["sphinx_needs", "sphinx_codelinks"]\n'
+        'src_trace_config_from_toml = "src_trace.toml"\n'
+    )
+    (srcdir / "src_trace.toml").write_text(
+        "[codelinks]\n"
+        "set_remote_url = true\n"
+        "[codelinks.projects.src]\n"
+        'remote_url_pattern = "https://example.com/blob/{commit}/{path}#L{line}"\n'
+        "[codelinks.projects.src.source_discover]\n"
+        'src_dir = "src"\n'
+        "[codelinks.projects.src.analyse]\n"
+        'remote_url_rev = "last_change"\n'
+    )
+    (srcdir / "index.rst").write_text(
+        "Index\n=====\n\n.. src-trace::\n   :project: src\n"
+    )
+    git(repo, "init", "-q")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "Add a")
+    rev_a = git(repo, "rev-parse", "HEAD")
+    (srcdir / "src" / "b.c").write_text("// @Function B, IMPL_B, impl\nvoid b() {}\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "Add b")
+    rev_b = git(repo, "rev-parse", "HEAD")
+
+    def build() -> tuple[list[str], str]:
+        app = make_app(srcdir=srcdir, freshenv=False)
+        read: list[str] = []
+
+        def capture_docnames(_app, _env, docnames):  # type: ignore[no-untyped-def]
+            read.extend(docnames)
+
+        app.connect("env-before-read-docs", capture_docnames)
+        app.build()
+        return read, Path(app.outdir, "index.html").read_text()
+
+    _, html = build()
+    assert f"https://example.com/blob/{rev_a}/doc/src/a.c#L1" in html
+    assert f"https://example.com/blob/{rev_b}/doc/src/b.c#L1" in html
+    # the commit is neither part of the value nor of the link name
+    assert f"doc/src/a.c#L1@{rev_a}" not in html
+    needs = SphinxNeedsData(make_app(srcdir=srcdir, freshenv=False).env)
+    assert needs.get_needs_view()["IMPL_A"]["remote-url"] == "doc/src/a.c#L1"
+
+    # a commit which changes the file without its markers changes its link
+    src_a.write_text("// @Function A, IMPL_A, impl\nvoid a() {}\nvoid e() {}\n")
+    assert build()[0] == []
+    git(repo, "commit", "-q", "-am", "Change a")
+    read, html = build()
+    assert read == ["index"]
+    rev_change = git(repo, "rev-parse", "HEAD")
+    assert f"https://example.com/blob/{rev_change}/doc/src/a.c#L1" in html
+    assert f"https://example.com/blob/{rev_b}/doc/src/b.c#L1" in html
+
+
+def test_string_links_registered_once_per_build(
+    tmpdir: Path,
+    make_app: Callable[..., SphinxTestApp],
+) -> None:
+    this_file_dir = Path(__file__).parent
+    repo = Path(tmpdir)
+    (repo / ".git" / "refs" / "heads").mkdir(parents=True)
+    (repo / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    (repo / ".git" / "refs" / "heads" / "main").write_text("abc123def456\n")
+    sphinx_src_dir = repo / "data" / "sphinx"
+    shutil.copytree(this_file_dir / "data" / "sphinx", sphinx_src_dir)
+    shutil.copytree(this_file_dir / "data" / "dcdc", repo / "data" / "dcdc")
+
+    app = make_app(srcdir=sphinx_src_dir, freshenv=True)
+
+    # registered before any document is read
+    string_links = app.config.needs_string_links
+    assert list(string_links) == ["local-url", "remote-url"]
+    assert string_links["remote-url"]["link_url"] == (
+        "https://github.com/useblocks/sphinx-codelinks/blob/abc123def456/"
+        "{{value}}#L{{lineno}}"
+    )
+
+    app.build()
+    assert app.config.needs_string_links == string_links
+    html = Path(app.outdir, "index.html").read_text()
+    assert (
+        "https://github.com/useblocks/sphinx-codelinks/blob/abc123def456/"
+        "data/dcdc/charge/demo_1.cpp#L" in html
+    )